@@ -2,7 +2,16 @@ CHAT_CONFIG = {
     "default_settings": {
         "welcome_message": "I am a helpful AI writing assistant. How can I help you today?",
         "system_role": "assistant",
-        "display_welcome": True
+        "display_welcome": True,
+        "stream_responses": True  # Show replies as they are generated
+    },
+    "history": {
+        "initial_messages": 50,  # Rendered when the chat is opened
+        "page_size": 50  # Loaded each time the user scrolls to the top
+    },
+    "search": {
+        "debounce_ms": 200,  # Pause in typing before the search runs
+        "max_results": 50
     },
     "message_types": {
         "welcome": {
@@ -0,0 +1,65 @@
+"""Configuration for the Chat Storage Service."""
+
+CHAT_STORAGE_CONFIG = {
+    "base_dir": "~/.aiwritingassistant/chats",
+    # "journal" (one append-only file per session) or "sqlite".
+    "backend": "journal",
+    # Session titles are the first line of the first user message.
+    "title_length": 60,
+    "journal": {
+        "extension": ".jsonl",
+        "legacy_extension": ".json",
+        # Rewrite a journal (metadata folded into a fresh header, torn records
+        # dropped) once the metadata records this process appended to it are
+        # at least this share of the file and at least compact_min_bytes.
+        "compact_dead_ratio": 0.5,
+        "compact_min_bytes": 64 * 1024,
+    },
+    "manifest": {
+        "file_name": "sessions.manifest",
+        # Rewrite the manifest once it holds this many records and at least
+        # twice as many records as sessions.
+        "compact_min_records": 200,
+    },
+    # Deserialized sessions kept in memory, least recently used evicted first.
+    "cache": {
+        "max_sessions": 16,
+        "max_bytes": 32 * 1024 * 1024,
+    },
+    # New messages are written from a background thread.
+    "write_behind": {
+        "enabled": True,
+        # Seconds to wait for more messages before writing a burst.
+        "flush_delay": 0.05,
+        # Seconds between fsyncs of written journals; 0 syncs after every
+        # write, None leaves it to the OS (flush() always syncs).
+        "fsync_interval": 1.0,
+        # Seconds before retrying a failed write, doubled after each further
+        # failure up to max_retry_delay.
+        "retry_delay": 1.0,
+        "max_retry_delay": 30.0,
+    },
+    "sqlite": {
+        "file_name": "chats.db",
+    },
+    # Journal sessions not updated for ``after_days`` are moved into one
+    # compressed archive per month (archive/<YYYY-MM>.zip) at startup.
+    "archive": {
+        "enabled": True,
+        "dir_name": "archive",
+        "member_extension": ".jsonl",
+        "after_days": 90,
+    },
+    # Full-text index of every stored message (SQLite FTS5), kept in its own
+    # directory so its files never touch the session directory.
+    "search": {
+        "enabled": True,
+        "dir_name": "index",
+        "file_name": "search.db",
+        "max_results": 50,
+        # Matches ranked per query, newest first; bounds the cost of broad queries.
+        "rank_window": 5000,
+        # Tokens of context shown around a match.
+        "snippet_tokens": 12,
+    },
+}
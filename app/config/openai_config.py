@@ -7,6 +7,103 @@ OPENAI_CONFIG = {
         "frequency_penalty": 0.0,
         "presence_penalty": 0.0
     },
+    # The HTTP client shared by every service (see OpenAIClientProvider).
+    "client": {
+        "max_connections": 10,
+        "max_keepalive_connections": 5,
+        "keepalive_expiry": 120,  # Seconds an idle connection is kept open
+        "timeouts": {  # Seconds
+            "connect": 10,
+            "read": 120,  # Between bytes; streamed replies keep it alive
+            "write": 30,
+            "pool": 30  # Waiting for a free connection
+        },
+        "max_retries": 0  # RequestScheduler retries instead
+    },
+    "requests": {
+        "max_concurrent": 4,  # API requests running at once, off the GUI thread
+        "shutdown_timeout_ms": 3000  # How long closing the window waits for them to stop
+    },
+    # Client-side pacing and retries (see RequestScheduler). Set the limits
+    # to those of your account's usage tier; 0 turns a limit off.
+    "rate_limits": {
+        "max_attempts": 5,
+        "base_delay": 1.0,  # Seconds; doubles with every failed attempt
+        "max_delay": 60.0,
+        # Reply tokens reserved per request (at most its max_tokens) until the
+        # response reports the actual usage.
+        "completion_reservation": 500,
+        "default": {"requests_per_minute": 500, "tokens_per_minute": 30000},
+        "models": {  # Longest matching model-name prefix wins
+            "gpt-3.5-turbo": {"requests_per_minute": 3500, "tokens_per_minute": 200000},
+            "gpt-4": {"requests_per_minute": 500, "tokens_per_minute": 10000},
+            "gpt-4-turbo": {"requests_per_minute": 500, "tokens_per_minute": 30000},
+            "gpt-4o": {"requests_per_minute": 500, "tokens_per_minute": 30000},
+            "o1": {"requests_per_minute": 500, "tokens_per_minute": 30000}
+        }
+    },
+    # Per-request telemetry (see LLMMetricsService and the Settings tab).
+    "metrics": {
+        "enabled": True,
+        "file": "~/.aiwritingassistant/llm_metrics.jsonl",
+        "window": 500,  # Recent requests per model the aggregates cover
+        "max_file_records": 10000
+    },
+    # Feedback responses cached on disk, keyed by the exact request.
+    "response_cache": {
+        "enabled": True,
+        "dir": "~/.aiwritingassistant/response_cache",
+        "ttl_seconds": 7 * 24 * 3600,
+        "max_entries": 500,
+        "max_bytes": 20 * 1024 * 1024,
+        # Also cache requests with temperature > 0, whose responses vary.
+        "cache_sampled": False
+    },
+    # How much of a chat session is sent with each request.
+    "context": {
+        "strategy": "summary",  # "recent", "pinned" or "summary"
+        # The prompt budget is the model's context window (see "model_catalog")
+        # minus the tokens reserved for the completion (its max_tokens setting).
+        "default_completion_tokens": 4000,  # Reserve when max_tokens is unknown
+        "max_prompt_tokens": None,  # Optional cap on the prompt, e.g. to limit cost
+        "recent_messages": 40,  # Upper bound for the "recent" and "pinned" strategies
+        "page_size": 50,  # Messages read from storage at a time, newest first
+        "pin_welcome": True,
+        # After summarizing, recent messages fill this share of the budget.
+        "keep_fraction": 0.5,
+        "summary_input_budget": 8000,  # Tokens of old messages per summary request
+        "summary_prefix": "Summary of the earlier conversation:\n",
+        "summary_instructions": (
+            "Summarize the conversation below between a writer and their writing "
+            "assistant in at most 200 words. Keep the writer's goals, decisions, "
+            "preferences and any open questions. If a previous summary is given, "
+            "fold it into the new one."
+        ),
+        "tokens_per_message": 4,  # Role and formatting overhead
+        "fallback_encoding": "cl100k_base",
+        "cached_counts": 100000
+    },
+    # Models offered in the Settings tab, fetched from the API and cached.
+    "model_catalog": {
+        "file": "~/.aiwritingassistant/model_catalog.json",
+        "ttl_seconds": 24 * 3600,  # Refreshed in the background at startup once older
+        "include_prefixes": ["gpt-3.5", "gpt-4", "o1"],
+        "excluded_terms": ["realtime", "audio", "vision"],
+        "default_description": "Standard model for general use",
+        # Capabilities by longest matching model-name prefix; "family" picks
+        # the parameter rules in "model_specific_settings".
+        "capabilities": {
+            "gpt-3.5-turbo": {"family": "gpt", "context_window": 16385},
+            "gpt-4": {"family": "gpt", "context_window": 8192},
+            "gpt-4-32k": {"family": "gpt", "context_window": 32768},
+            "gpt-4-turbo": {"family": "gpt", "context_window": 128000},
+            "gpt-4-1106": {"family": "gpt", "context_window": 128000},
+            "gpt-4-0125": {"family": "gpt", "context_window": 128000},
+            "gpt-4o": {"family": "gpt", "context_window": 128000},
+            "o1": {"family": "o1", "context_window": 128000}
+        },
+        "default_capabilities": {"family": "gpt", "context_window": 8192}
+    },
     "model_specific_settings": {
         "o1": {
             "supported_params": ["max_completion_tokens"],
@@ -15,7 +112,9 @@ OPENAI_CONFIG = {
             },
             "param_mapping": {
                 "max_tokens": "max_completion_tokens"
-            }
+            },
+            "streaming": False,  # Responses arrive in one piece
+            "system_role": False  # System messages are sent as assistant messages
         },
         "gpt": {
             "supported_params": [
@@ -0,0 +1,87 @@
+"""JSON Schema of settings.json, checked by the SettingsManager on load.
+
+A property's "default" is what the typed settings hold while the file
+leaves it unset or empty, or holds an invalid value. Other keys are
+allowed and kept as they are.
+"""
+from app.config.openai_config import OPENAI_CONFIG
+from app.config.chat_config import CHAT_CONFIG
+
+_OPENAI_DEFAULTS = OPENAI_CONFIG["default_settings"]
+_CHAT_DEFAULTS = CHAT_CONFIG["default_settings"]
+
+def _optional_string():
+    return {"type": ["string", "null"], "default": None}
+
+SETTINGS_SCHEMA = {
+    "$schema": "http://json-schema.org/draft-07/schema#",
+    "type": "object",
+    "properties": {
+        "app": {
+            "type": "object",
+            "properties": {
+                "theme": {"type": "string"},
+                "panel_sizes": {"type": "array", "items": {"type": "integer"}},
+                "window": {
+                    "type": "object",
+                    "properties": {
+                        "size": {"type": "array", "items": {"type": "integer"},
+                                 "minItems": 2, "maxItems": 2},
+                        "pos": {"type": "array", "items": {"type": "integer"},
+                                "minItems": 2, "maxItems": 2},
+                        "maximized": {"type": "boolean"}
+                    }
+                }
+            }
+        },
+        "openai": {
+            "type": "object",
+            "properties": {
+                "model": {"type": "string", "default": _OPENAI_DEFAULTS["model"]},
+                "base_url": {"type": ["string", "null"], "default": ""},
+                "temperature": {"type": "number", "minimum": 0, "maximum": 2,
+                                "default": _OPENAI_DEFAULTS["temperature"]},
+                "max_tokens": {"type": "integer", "minimum": 1,
+                               "default": _OPENAI_DEFAULTS["max_tokens"]},
+                "top_p": {"type": "number", "minimum": 0, "maximum": 1,
+                          "default": _OPENAI_DEFAULTS["top_p"]},
+                "frequency_penalty": {"type": "number", "minimum": -2, "maximum": 2,
+                                      "default": _OPENAI_DEFAULTS["frequency_penalty"]},
+                "presence_penalty": {"type": "number", "minimum": -2, "maximum": 2,
+                                     "default": _OPENAI_DEFAULTS["presence_penalty"]},
+                "available_models": {"type": "array"}
+            }
+        },
+        "chat": {
+            "type": "object",
+            "properties": {
+                "welcome_style": {"enum": ["formal", "casual", "minimal", "custom"],
+                                  "default": "formal"},
+                "welcome_message": {"type": "string",
+                                    "default": _CHAT_DEFAULTS["welcome_message"]},
+                "display_welcome": {"type": "boolean",
+                                    "default": _CHAT_DEFAULTS["display_welcome"]},
+                "stream_responses": {"type": "boolean",
+                                     "default": _CHAT_DEFAULTS["stream_responses"]},
+                "context_strategy": _optional_string(),
+                "storage_backend": {"enum": ["journal", "sqlite", None], "default": None}
+            }
+        },
+        "folders": {
+            "type": "object",
+            "properties": {
+                "writing_prompts": _optional_string(),
+                "criteria": _optional_string(),
+                "save_location": _optional_string()
+            }
+        },
+        "criteria": {
+            "type": "object",
+            "properties": {
+                "last_type": {"type": ["string", "null"]},
+                "last_set": {"type": ["object", "null"]},
+                "types": {"type": "object"}
+            }
+        }
+    }
+}
@@ -1,5 +1,6 @@
 from app.views.tabs.writing_prompts_tab import WritingPromptsTab
 from app.services.content_combiner_service import ContentCombinerService
+from app.services.model_catalog_service import ModelCatalogService
 
 class MainController:
     def __init__(self, app, view, settings_manager):
@@ -11,8 +12,11 @@ class MainController:
 
     def initialize(self):
         """Initialize the main window with settings."""
-        # Additional initialization logic can be added here if needed
-        pass
+        # Refresh the cached model list in the background once it is stale.
+        ModelCatalogService.shared().refresh_if_stale(
+            self.settings_manager.get("openai.api_key"),
+            self.settings_manager.typed.openai.base_url or None
+        )
 
     def _handle_prompt_selected(self, prompt: str):
         if prompt:
@@ -1,6 +1,6 @@
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from datetime import datetime
-from typing import List
+from typing import Any, Dict, List, Optional
 from enum import Enum
 
 class Role(Enum):
@@ -8,17 +8,50 @@ class Role(Enum):
     ASSISTANT = "assistant"
     SYSTEM = "system"
 
-@dataclass
+# Decoders look roles up here instead of constructing Role(value) per message.
+ROLE_BY_VALUE = {role.value: role for role in Role}
+
+@dataclass(slots=True, frozen=True)
 class ChatMessage:
+    """A single chat message.
+
+    ``created`` is a POSIX timestamp; the owning session is implied by the
+    session that holds the message. Messages are shared with the session
+    cache, so they are immutable.
+    """
     id: str
     role: Role
     content: str
-    timestamp: datetime
-    session_id: str
+    created: float
 
-@dataclass
+    @property
+    def timestamp(self) -> datetime:
+        return datetime.fromtimestamp(self.created)
+
+@dataclass(slots=True)
 class ChatSession:
     id: str
     messages: List[ChatMessage]
     created_at: datetime
     updated_at: datetime
+    # Small JSON-serializable values kept with the session (e.g. the
+    # rolling summary used to build prompts).
+    metadata: Dict[str, Any] = field(default_factory=dict)
+
+@dataclass
+class SessionSummary:
+    id: str
+    created_at: datetime
+    updated_at: datetime
+    message_count: int
+    title: str
+    # Month of the compressed archive holding the session, if archived.
+    archive: Optional[str] = None
+
+@dataclass
+class SearchHit:
+    session_id: str
+    message_id: str
+    snippet: str
+    # bm25 score; lower is more relevant.
+    rank: float
@@ -0,0 +1,33 @@
+from dataclasses import dataclass
+from typing import Optional
+
+@dataclass(slots=True)
+class RequestMetric:
+    """Timings and token usage of one completion request.
+
+    Durations are in seconds. ``queue_seconds`` is the time spent waiting
+    for the rate limiter and for earlier failed attempts before the request
+    that produced the response was sent; ``ttft_seconds`` is only measured
+    for streamed requests.
+    """
+    started: float  # POSIX timestamp
+    model: str
+    streamed: bool
+    outcome: str = "ok"  # "ok", "error", "rate_limited" or "cancelled"
+    attempts: int = 0
+    queue_seconds: Optional[float] = None
+    ttft_seconds: Optional[float] = None
+    latency_seconds: Optional[float] = None
+    prompt_tokens: Optional[int] = None
+    completion_tokens: Optional[int] = None
+    error: Optional[str] = None
+
+    @property
+    def tokens_per_second(self) -> Optional[float]:
+        """Completion tokens per second of generation, after the first token when streamed."""
+        if not self.completion_tokens or not self.latency_seconds:
+            return None
+        generating = self.latency_seconds - (self.queue_seconds or 0.0)
+        if self.ttft_seconds is not None:
+            generating = self.latency_seconds - self.ttft_seconds
+        return self.completion_tokens / generating if generating > 0 else None
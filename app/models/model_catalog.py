@@ -0,0 +1,16 @@
+from dataclasses import dataclass, field
+from typing import Any, Dict, List
+
+@dataclass(frozen=True)
+class ModelCapabilities:
+    """What a model accepts, resolved once per model from OPENAI_CONFIG."""
+    model: str
+    family: str  # Key of the parameter rules in "model_specific_settings"
+    context_window: int  # Prompt plus completion tokens
+    supported_params: List[str]
+    # Parameters the model requires, overriding the user's settings.
+    fixed_params: Dict[str, Any] = field(default_factory=dict)
+    # Our parameter names mapped to the names this model expects.
+    param_mapping: Dict[str, str] = field(default_factory=dict)
+    streaming: bool = True
+    system_role: bool = True
@@ -0,0 +1,38 @@
+from dataclasses import dataclass
+from typing import Optional
+
+@dataclass(frozen=True)
+class OpenAISettings:
+    model: str
+    base_url: str  # Empty for the OpenAI API itself
+    temperature: float
+    max_tokens: int
+    top_p: float
+    frequency_penalty: float
+    presence_penalty: float
+
+@dataclass(frozen=True)
+class ChatSettings:
+    welcome_style: str
+    welcome_message: str
+    display_welcome: bool
+    stream_responses: bool
+    context_strategy: Optional[str]  # None for CHAT_CONFIG's default
+    storage_backend: Optional[str]  # None for CHAT_STORAGE_CONFIG's default
+
+@dataclass(frozen=True)
+class FolderSettings:
+    writing_prompts: Optional[str]
+    criteria: Optional[str]
+    save_location: Optional[str]
+
+@dataclass(frozen=True)
+class Settings:
+    """The settings read on every request, validated and with defaults filled in.
+
+    Built by the SettingsManager from settings.json and replaced whenever
+    one of its sections changes, so reading it needs no lock.
+    """
+    openai: OpenAISettings
+    chat: ChatSettings
+    folders: FolderSettings
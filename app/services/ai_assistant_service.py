@@ -1,19 +1,30 @@
+from typing import Dict, Iterator, List, Optional
 from app.services.chat_storage_service import ChatStorageService
 from app.services.openai_service import OpenAIService
 from app.services.settings_manager import SettingsManager
-from app.models.chat import Role
+from app.services.request_executor import RequestExecutor, RequestJob
+from app.services.request_control import CancelToken, RequestCancelled
+from app.services.chat_context_builder import ChatContextBuilder
+from app.models.chat import ChatMessage, Role
 from app.config.chat_config import CHAT_CONFIG
+from app.config.openai_config import OPENAI_CONFIG
 
 class AIAssistantService:
     """Service class for AI Assistant interactions."""
 
-    def __init__(self, settings_manager: SettingsManager):
+    def __init__(self, settings_manager: SettingsManager,
+                 executor: Optional[RequestExecutor] = None):
         """Initialize the AI Assistant service."""
         self.settings_manager = settings_manager
-        self.chat_storage = ChatStorageService()
+        self.executor = executor or RequestExecutor.shared()
+        self.chat_storage = ChatStorageService(
+            backend=settings_manager.typed.chat.storage_backend
+        )
         self.openai_service = OpenAIService(settings_manager)
+        self.context_builder = ChatContextBuilder(self.chat_storage, self._summarize_history)
         self._initialize_openai()
         self._load_chat_settings()
+        settings_manager.subscribe("chat", lambda key: self._load_chat_settings())
 
     def _initialize_openai(self):
         """Initialize the OpenAI API with stored API key."""
@@ -27,26 +38,16 @@ class AIAssistantService:
 
     def _load_chat_settings(self):
         """Load chat-related settings with defaults."""
-        # Get the current style setting
-        style = self.settings_manager.get(
-            "chat.welcome_style",
-            "formal"  # default style
-        )
-        
+        chat_settings = self.settings_manager.typed.chat
+        style = chat_settings.welcome_style
+
         # If style is not custom, get the predefined message
         if style != "custom":
             self.welcome_message = CHAT_CONFIG["message_types"]["welcome"][style]
         else:
             # If custom, get the user's custom message
-            self.welcome_message = self.settings_manager.get(
-                "chat.welcome_message",
-                CHAT_CONFIG["default_settings"]["welcome_message"]
-            )
-        
-        self.display_welcome = self.settings_manager.get(
-            "chat.display_welcome",
-            CHAT_CONFIG["default_settings"]["display_welcome"]
-        )
+            self.welcome_message = chat_settings.welcome_message
+        self.display_welcome = chat_settings.display_welcome
 
     def initialize_chat(self) -> str:
         """Initialize or load existing chat session."""
@@ -75,48 +76,130 @@ class AIAssistantService:
         
         return session_id
 
-    def get_chat_messages(self, session_id: str):
-        """Get messages from a chat session."""
-        return self.chat_storage.get_session_messages(session_id)
+    def get_chat_messages(self, session_id: str, offset: int = 0, limit: int = None):
+        """Get messages from a chat session, optionally a page of them."""
+        return self.chat_storage.get_session_messages(session_id, offset, limit)
 
-    def send_message(self, message: str, session_id: str) -> str:
-        """Send a message and get AI response."""
-        if not self.is_initialized():
-            raise ValueError("OpenAI API key not set")
+    def get_recent_chat_messages(self, session_id: str, limit: int):
+        """Get the last messages of a chat session."""
+        return self.chat_storage.get_session_tail(session_id, limit)
 
-        # Save user message
-        self.chat_storage.add_message(session_id, Role.USER, message)
+    def get_chat_message_count(self, session_id: str) -> int:
+        """Get the number of messages in a chat session."""
+        return self.chat_storage.get_message_count(session_id)
 
-        # Get chat history
-        messages = self.chat_storage.get_session_messages(session_id)
-        
-        # Format messages
-        formatted_messages = []
-        for msg in messages:
-            role = msg.role.value
-            # For unsupported models, convert system to assistant
-            if role == "system":
-                model = self.settings_manager.get("openai.model", "gpt-3.5-turbo")
-                if model not in ["gpt-4", "gpt-4-turbo-preview", "gpt-3.5-turbo"]:
-                    role = "assistant"
-            formatted_messages.append({"role": role, "content": msg.content})
+    def get_chat_message_position(self, session_id: str, message_id: str) -> Optional[int]:
+        """Index of a message in its chat session, or None if it was removed."""
+        return self.chat_storage.get_message_position(session_id, message_id)
+
+    def search_chats(self, query: str, limit: int = None):
+        """Search all chat sessions; returns hits ranked by relevance."""
+        return self.chat_storage.search(query, limit)
+
+    def send_message(self, message: str, session_id: str,
+                     cancel_token: Optional[CancelToken] = None) -> str:
+        """Send a message and get AI response."""
+        formatted_messages = self._prepare_messages(message, session_id)
 
         try:
-            model = self.settings_manager.get("openai.model", "gpt-3.5-turbo")
+            model = self.openai_service.model
             response = self.openai_service.get_chat_completion(
                 messages=formatted_messages,
-                model=model
+                model=model,
+                cancel_token=cancel_token
             )
             
             if response:
                 self.chat_storage.add_message(session_id, Role.ASSISTANT, response)
                 return response
+        except RequestCancelled:
+            raise
         except Exception as e:
             print(f"Error getting chat completion: {str(e)}")
             return "I'm sorry, I couldn't process your request."
 
         return "I'm sorry, I couldn't process your request."
 
+    def stream_message(self, message: str, session_id: str,
+                       cancel_token: Optional[CancelToken] = None) -> Iterator[str]:
+        """Send a message and yield the AI response as it is generated.
+
+        The complete response is saved once, after the last piece arrives;
+        a stream that fails or is cancelled part-way saves nothing and raises.
+        """
+        formatted_messages = self._prepare_messages(message, session_id)
+        model = self.openai_service.model
+        parts = []
+        for delta in self.openai_service.stream_chat_completion(formatted_messages, model,
+                                                                cancel_token):
+            parts.append(delta)
+            yield delta
+
+        response = "".join(parts)
+        if response:
+            self.chat_storage.add_message(session_id, Role.ASSISTANT, response)
+
+    def send_message_async(self, message: str, session_id: str) -> RequestJob:
+        """Run ``send_message`` on the request executor; the reply arrives as ``result``.
+
+        ``job.cancel()`` abandons the request.
+        """
+        return self.executor.submit(self.send_message, message, session_id, cancellable=True)
+
+    def stream_message_async(self, message: str, session_id: str) -> RequestJob:
+        """Run ``stream_message`` on the request executor.
+
+        Each piece of the reply arrives as ``progress``; ``result`` carries
+        the list of all pieces. ``job.cancel()`` closes the stream.
+        """
+        return self.executor.submit(self.stream_message, message, session_id,
+                                    stream=True, cancellable=True)
+
+    def stream_responses(self) -> bool:
+        """Whether replies should be shown as they are generated."""
+        return self.settings_manager.typed.chat.stream_responses
+
+    def _prepare_messages(self, message: str, session_id: str) -> List[Dict[str, str]]:
+        """Save the user's message and format the session for the API."""
+        if not self.is_initialized():
+            raise ValueError("OpenAI API key not set")
+
+        # Save user message
+        self.chat_storage.add_message(session_id, Role.USER, message)
+
+        # Get the part of the chat history that fits the model's budget
+        model = self.openai_service.model
+        messages = self.context_builder.build(
+            session_id,
+            model,
+            self.settings_manager.typed.chat.context_strategy,
+            self.settings_manager.typed.openai.max_tokens
+        )
+        
+        # Format messages
+        system_role = self.openai_service.catalog.capabilities(model).system_role
+        formatted_messages = []
+        for msg in messages:
+            role = msg.role.value
+            # For models without a system role, convert system to assistant
+            if role == "system" and not system_role:
+                role = "assistant"
+            formatted_messages.append({"role": role, "content": msg.content})
+        return formatted_messages
+
+    def _summarize_history(self, previous_summary: str, messages: List[ChatMessage]) -> str:
+        """Ask the model for a summary of older messages, used to build prompts."""
+        transcript = "\n\n".join(f"{msg.role.value}: {msg.content}" for msg in messages)
+        if previous_summary:
+            transcript = f"Previous summary:\n{previous_summary}\n\nConversation:\n{transcript}"
+        return self.openai_service.get_chat_completion(
+            messages=[
+                {"role": "user", "content": OPENAI_CONFIG["context"]["summary_instructions"]},
+                {"role": "user", "content": transcript}
+            ],
+            model=self.openai_service.model
+        )
+
     def remove_session(self, session_id: str) -> bool:
         """Remove a chat session."""
         try:
@@ -132,3 +215,10 @@ class AIAssistantService:
         except Exception as e:
             print(f"Error clearing all sessions: {str(e)}")
             return False
+
+    def shutdown(self):
+        """Write any queued chat messages to disk and release storage."""
+        try:
+            self.chat_storage.close()
+        except Exception as e:
+            print(f"Error closing chat storage: {str(e)}")
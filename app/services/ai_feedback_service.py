@@ -1,14 +1,22 @@
 from app.services.openai_service import OpenAIService
 from app.services.content_combiner_service import ContentCombinerService
 from app.services.settings_manager import SettingsManager
+from app.services.request_executor import RequestExecutor, RequestJob
+from app.services.response_cache_service import ResponseCacheService
+from app.services.request_control import CancelToken, RequestCancelled
+from app.config.openai_config import OPENAI_CONFIG
+from typing import Optional
 
 class AIFeedbackService:
     """Service for getting AI feedback on writing."""
 
-    def __init__(self):
-        self.settings_manager = SettingsManager()
+    def __init__(self, settings_manager: Optional[SettingsManager] = None,
+                 executor: Optional[RequestExecutor] = None):
+        self.settings_manager = settings_manager or SettingsManager.shared()
+        self.executor = executor or RequestExecutor.shared()
         self.openai_service = OpenAIService(self.settings_manager)
         self.content_combiner = ContentCombinerService()
+        self.response_cache = ResponseCacheService(OPENAI_CONFIG["response_cache"])
         self._initialize_openai()
 
     def _initialize_openai(self):
@@ -16,8 +24,14 @@ class AIFeedbackService:
         if api_key:
             self.openai_service.initialize(api_key)
 
-    def get_feedback(self, submission: str, criteria: str, prompt: str = "") -> str:
-        """Get AI feedback on a writing submission."""
+    def get_feedback(self, submission: str, criteria: str, prompt: str = "",
+                     refresh: bool = False, cancel_token: Optional[CancelToken] = None) -> str:
+        """Get AI feedback on a writing submission.
+
+        Identical requests are answered from the response cache unless
+        ``refresh`` is set; the fresh response then replaces the cached one.
+        A cancelled request raises ``RequestCancelled``.
+        """
         try:
             # Set the prompt if provided
             if prompt:
@@ -33,8 +47,34 @@ class AIFeedbackService:
                 {"role": "user", "content": combined_content}
             ]
             
-            model = self.settings_manager.get("openai.model", "gpt-3.5-turbo")
-            return self.openai_service.get_chat_completion(messages=messages, model=model)
+            model = self.openai_service.model
+            settings = self.openai_service.request_settings(model)
+            cacheable = self.response_cache.is_cacheable(
+                settings, self.openai_service.catalog.capabilities(model)
+            )
+            cache_key = ResponseCacheService.make_key(messages, settings)
+            if cacheable and not refresh:
+                cached = self.response_cache.get(cache_key)
+                if cached:
+                    return cached
+
+            feedback = self.openai_service.get_chat_completion(
+                messages=messages, model=model, cancel_token=cancel_token
+            )
+            if feedback and cacheable:
+                self.response_cache.put(cache_key, feedback)
+            return feedback
+        except RequestCancelled:
+            raise
         except Exception as e:
             print(f"Error getting feedback: {str(e)}")
             return ""
+
+    def get_feedback_async(self, submission: str, criteria: str, prompt: str = "",
+                           refresh: bool = False) -> RequestJob:
+        """Run ``get_feedback`` on the request executor; the feedback arrives as ``result``.
+
+        ``job.cancel()`` abandons the request.
+        """
+        return self.executor.submit(self.get_feedback, submission, criteria, prompt, refresh,
+                                    cancellable=True)
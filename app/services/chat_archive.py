@@ -0,0 +1,82 @@
+import os
+import shutil
+import zipfile
+from typing import Dict, Iterator, List, Optional, Set, Tuple
+
+class ChatArchive:
+    """Compressed monthly archives of old chat sessions.
+
+    Each month is one zip file (``archive/<YYYY-MM>.zip``) holding the
+    journals of the sessions last updated in that month. Archives are
+    never modified in place: a rewrite builds a new zip next to the old
+    one and renames it over it, so a crash leaves the previous archive
+    intact.
+    """
+
+    def __init__(self, base_dir: str, config: dict):
+        self.dir = os.path.join(base_dir, config['dir_name'])
+        self.member_ext = config['member_extension']
+
+    def path(self, month: str) -> str:
+        return os.path.join(self.dir, f"{month}.zip")
+
+    def months(self) -> List[str]:
+        if not os.path.isdir(self.dir):
+            return []
+        return sorted(os.path.splitext(f)[0] for f in os.listdir(self.dir) if f.endswith('.zip'))
+
+    def stamp(self, month: str) -> Optional[tuple]:
+        try:
+            stat = os.stat(self.path(month))
+        except FileNotFoundError:
+            return None
+        return (self.path(month), stat.st_mtime_ns, stat.st_size)
+
+    def read(self, month: str, session_id: str) -> Optional[bytes]:
+        try:
+            with zipfile.ZipFile(self.path(month)) as archive:
+                return archive.read(f"{session_id}{self.member_ext}")
+        except (FileNotFoundError, KeyError):
+            return None
+
+    def members(self) -> Iterator[Tuple[str, str, bytes]]:
+        """Yield ``(month, session_id, data)`` for every archived session."""
+        for month in self.months():
+            with zipfile.ZipFile(self.path(month)) as archive:
+                for name in archive.namelist():
+                    yield month, os.path.splitext(name)[0], archive.read(name)
+
+    def rewrite(self, month: str, add: Dict[str, bytes], keep: Set[str]):
+        """Replace a month's archive with the kept members plus ``add``.
+
+        Existing members whose session id is not in ``keep`` (or is being
+        replaced by ``add``) are dropped.
+        """
+        os.makedirs(self.dir, exist_ok=True)
+        path = self.path(month)
+        tmp_path = f"{path}.tmp"
+        member_count = 0
+        with zipfile.ZipFile(tmp_path, 'w', compression=zipfile.ZIP_DEFLATED) as new_archive:
+            if os.path.exists(path):
+                with zipfile.ZipFile(path) as old_archive:
+                    for info in old_archive.infolist():
+                        session_id = os.path.splitext(info.filename)[0]
+                        if session_id in keep and session_id not in add:
+                            new_archive.writestr(info, old_archive.read(info))
+                            member_count += 1
+            for session_id, data in add.items():
+                new_archive.writestr(f"{session_id}{self.member_ext}", data)
+                member_count += 1
+
+        if member_count == 0:
+            os.remove(tmp_path)
+            if os.path.exists(path):
+                os.remove(path)
+            return
+
+        with open(tmp_path, 'rb') as f:
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+
+    def clear(self):
+        shutil.rmtree(self.dir, ignore_errors=True)
@@ -0,0 +1,58 @@
+"""Encoding of chat messages for the storage layer.
+
+Messages are written as compact JSON arrays, ``["m", id, role, content,
+created]``, one per line. Arrays skip the per-record key strings, and a
+run of lines can be decoded with a single ``json.loads`` call by joining
+them into one array, which keeps the per-message cost inside the C
+decoder. Records written by earlier versions (``{"type": "message", ...}``
+objects with ISO timestamps) are still understood.
+"""
+
+import json
+from datetime import datetime
+from typing import List, Union
+from app.models.chat import ChatMessage, ROLE_BY_VALUE
+
+MESSAGE_TAG = "m"
+# Lines are recognised by prefix so that skipped records never need decoding.
+MESSAGE_LINE_PREFIXES = (b'["m",', b'{"type": "message"')
+MESSAGE_LINE_SUFFIXES = (b']', b'}')
+# Lines decoded per json.loads call; bounds the transient decoded records.
+DECODE_BATCH_SIZE = 1024
+
+def encode_message(message: ChatMessage) -> bytes:
+    """Encode a message as a single newline-terminated journal line."""
+    record = [MESSAGE_TAG, message.id, message.role.value, message.content, message.created]
+    return json.dumps(record, separators=(',', ':')).encode('utf-8') + b'\n'
+
+def is_message_line(line: bytes) -> bool:
+    """Whether a journal line (without its newline) holds a complete message."""
+    return line.startswith(MESSAGE_LINE_PREFIXES) and line.endswith(MESSAGE_LINE_SUFFIXES)
+
+def decode_record(record: Union[list, dict]) -> ChatMessage:
+    if isinstance(record, list):
+        return ChatMessage(record[1], ROLE_BY_VALUE[record[2]], record[3], record[4])
+    return ChatMessage(
+        record['id'],
+        ROLE_BY_VALUE[record['role']],
+        record['content'],
+        datetime.fromisoformat(record['timestamp']).timestamp()
+    )
+
+def decode_message_lines(lines: List[bytes]) -> List[ChatMessage]:
+    """Decode message lines, skipping any that are damaged."""
+    messages = []
+    for start in range(0, len(lines), DECODE_BATCH_SIZE):
+        batch = lines[start:start + DECODE_BATCH_SIZE]
+        try:
+            records = json.loads(b'[' + b','.join(batch) + b']')
+            messages.extend([decode_record(record) for record in records])
+            continue
+        except (ValueError, KeyError, IndexError):
+            pass
+        for line in batch:
+            try:
+                messages.append(decode_record(json.loads(line)))
+            except (ValueError, KeyError, IndexError):
+                continue
+    return messages
@@ -0,0 +1,281 @@
+from collections import OrderedDict
+from dataclasses import replace
+from typing import Callable, List, Optional, Tuple
+from app.models.chat import ChatMessage, Role
+from app.services.model_catalog_service import ModelCatalogService
+from app.config.openai_config import OPENAI_CONFIG
+
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+# Metadata key of the rolling summary checkpoint stored with a session.
+SUMMARY_KEY = "context_summary"
+
+class TokenCounter:
+    """Counts the prompt tokens of messages, remembering each message's count.
+
+    Uses the model's tiktoken encoding when tiktoken is installed and
+    otherwise estimates four characters per token.
+    """
+
+    def __init__(self, model: str, config: dict):
+        self.config = config
+        self._encoding = None
+        if tiktoken is not None:
+            try:
+                self._encoding = tiktoken.encoding_for_model(model)
+            except KeyError:
+                self._encoding = tiktoken.get_encoding(config["fallback_encoding"])
+        self._counts = OrderedDict()
+
+    def count_text(self, text: str) -> int:
+        if self._encoding is not None:
+            return len(self._encoding.encode(text, disallowed_special=()))
+        return (len(text) + 3) // 4
+
+    def truncate_text(self, text: str, tokens: int) -> str:
+        """The start of ``text``, at most ``tokens`` tokens long."""
+        tokens = max(tokens, 0)
+        if self._encoding is not None:
+            return self._encoding.decode(self._encoding.encode(text, disallowed_special=())[:tokens])
+        return text[:tokens * 4]
+
+    def truncate(self, message: ChatMessage, budget: int) -> ChatMessage:
+        """A copy of ``message`` cut to fit ``budget`` tokens."""
+        content = self.truncate_text(message.content, budget - self.config["tokens_per_message"])
+        # A new id, so the cached count of the whole message is not reused.
+        return replace(message, id=f"{message.id}:truncated", content=content)
+
+    def count(self, message: ChatMessage) -> int:
+        count = self._counts.get(message.id)
+        if count is None:
+            count = self.count_text(message.content) + self.config["tokens_per_message"]
+            self._counts[message.id] = count
+            if len(self._counts) > self.config["cached_counts"]:
+                self._counts.popitem(last=False)
+        return count
+
+    def total(self, messages: List[ChatMessage]) -> int:
+        return sum(self.count(message) for message in messages)
+
+def fit_recent(messages: List[ChatMessage], budget: int, counter: TokenCounter,
+               max_messages: Optional[int] = None) -> List[ChatMessage]:
+    """The longest run of most recent messages that fits in ``budget`` tokens.
+
+    The newest message is always included, cut to ``budget`` if it is
+    larger on its own.
+    """
+    if not messages:
+        return []
+    newest = messages[-1]
+    if counter.count(newest) > budget:
+        return [counter.truncate(newest, budget)]
+    selected = [newest]
+    used = counter.count(newest)
+    for message in reversed(messages[:-1]):
+        if max_messages is not None and len(selected) >= max_messages:
+            break
+        used += counter.count(message)
+        if used > budget:
+            break
+        selected.append(message)
+    selected.reverse()
+    return selected
+
+def fit_around_newest(extra: List[ChatMessage], messages: List[ChatMessage], budget: int,
+                      counter: TokenCounter, max_messages: Optional[int] = None) -> List[ChatMessage]:
+    """``extra`` (pinned messages, a summary) followed by the recent messages that fit.
+
+    ``extra`` is left out when the newest message would otherwise not fit
+    whole: the user's latest message always comes first.
+    """
+    if extra and messages and counter.count(messages[-1]) > budget - counter.total(extra):
+        extra = []
+    return extra + fit_recent(messages, budget - counter.total(extra), counter, max_messages)
+
+class RecentStrategy:
+    """Send the most recent messages that fit, at most ``recent_messages``."""
+
+    def __init__(self, config: dict):
+        self.config = config
+
+    def build(self, session_id: str, budget: int, counter: TokenCounter,
+              context) -> List[ChatMessage]:
+        _, messages = context.read_recent(session_id, budget, counter,
+                                          max_messages=self.config["recent_messages"])
+        return fit_recent(messages, budget, counter, self.config["recent_messages"])
+
+class PinnedStrategy(RecentStrategy):
+    """Like ``RecentStrategy``, but system messages and the welcome message are always sent.
+
+    Only the system messages among the recent messages read are pinned.
+    """
+
+    def pinned(self, session_id: str, offset: int, messages: List[ChatMessage],
+               context) -> List[ChatMessage]:
+        pinned = [message for message in messages if message.role == Role.SYSTEM]
+        if self.config["pin_welcome"]:
+            first = messages[0] if offset == 0 and messages else context.first_message(session_id)
+            if first and first.role == Role.ASSISTANT:
+                pinned.insert(0, first)
+        return pinned
+
+    def build(self, session_id: str, budget: int, counter: TokenCounter,
+              context) -> List[ChatMessage]:
+        offset, messages = context.read_recent(session_id, budget, counter,
+                                               max_messages=self.config["recent_messages"])
+        pinned = self.pinned(session_id, offset, messages, context)
+        pinned_ids = {message.id for message in pinned}
+        rest = [message for message in messages if message.id not in pinned_ids]
+        return fit_around_newest(pinned, rest, budget, counter, self.config["recent_messages"])
+
+class SummaryStrategy(PinnedStrategy):
+    """Pinned messages, a rolling summary of older turns, then recent messages.
+
+    The summary is a checkpoint stored in the session's metadata: the text
+    and how many messages it covers. When the messages after the checkpoint
+    no longer fit, the older ones are folded into the summary so that the
+    recent part fills only ``keep_fraction`` of the budget again; the
+    summary is therefore refreshed every few turns, not on every one. The
+    newest message is never folded into the summary. Only the messages
+    that could be sent or summarized are read.
+    """
+
+    def build(self, session_id: str, budget: int, counter: TokenCounter,
+              context) -> List[ChatMessage]:
+        checkpoint = context.get_summary(session_id)
+        start = checkpoint["through"] if checkpoint else 0
+        offset, messages = context.read_recent(
+            session_id, budget + self.config["summary_input_budget"], counter, start
+        )
+        pinned = self.pinned(session_id, offset, messages, context)
+        pinned_ids = {message.id for message in pinned}
+        rest = [message for message in messages if message.id not in pinned_ids]
+
+        summary = self._summary_message(checkpoint)
+        available = budget - counter.total(pinned)
+        if summary:
+            available -= counter.count_text(summary.content) + counter.config["tokens_per_message"]
+
+        if counter.total(rest) > available and len(rest) > 1:
+            # The newest message is kept whole whenever it fits at all.
+            keep_budget = max(int(available * self.config["keep_fraction"]),
+                              min(counter.count(rest[-1]), available))
+            kept = rest[len(rest) - len(fit_recent(rest, keep_budget, counter)):]
+            first_kept = next(index for index, message in enumerate(messages)
+                              if message.id == kept[0].id)
+            folded = [message for message in messages[:first_kept]
+                      if message.id not in pinned_ids]
+            # A very long backlog is summarized from its most recent part.
+            folded = fit_recent(folded, self.config["summary_input_budget"], counter)
+            text = context.summarize(checkpoint["text"] if checkpoint else "", folded)
+            if text:
+                checkpoint = {"text": text, "through": offset + first_kept}
+                context.save_summary(session_id, checkpoint)
+                summary = self._summary_message(checkpoint)
+                rest = kept
+
+        return fit_around_newest(pinned + ([summary] if summary else []), rest, budget, counter)
+
+    def _summary_message(self, checkpoint: Optional[dict]) -> Optional[ChatMessage]:
+        if not checkpoint:
+            return None
+        return ChatMessage(
+            id=f"{SUMMARY_KEY}:{checkpoint['through']}",
+            role=Role.SYSTEM,
+            content=self.config["summary_prefix"] + checkpoint["text"],
+            created=0.0
+        )
+
+class ChatContextBuilder:
+    """Chooses which messages of a session are sent with the next request.
+
+    The prompt is kept within the model's context window, as given by the
+    model catalog, less the tokens reserved for the completion, by a
+    pluggable strategy: ``"recent"``, ``"pinned"`` or ``"summary"``.
+    ``summarize(previous_summary, messages)`` produces rolling summaries;
+    without it the summary strategy behaves like ``"pinned"``. Messages are
+    read from ``chat_storage`` a page at a time from the end, only as far
+    back as the strategy needs.
+    """
+
+    STRATEGIES = {
+        'recent': RecentStrategy,
+        'pinned': PinnedStrategy,
+        'summary': SummaryStrategy,
+    }
+
+    def __init__(self, chat_storage, summarize: Optional[Callable[[str, List[ChatMessage]], str]] = None,
+                 catalog: Optional[ModelCatalogService] = None):
+        self.config = OPENAI_CONFIG["context"]
+        self.chat_storage = chat_storage
+        self._summarize = summarize
+        self.catalog = catalog or ModelCatalogService.shared()
+        self._counters = {}
+
+    def budget_for(self, model: str, completion_tokens: Optional[int] = None) -> int:
+        """Prompt tokens for ``model`` when ``completion_tokens`` are reserved for the reply."""
+        window = self.catalog.capabilities(model).context_window
+        if completion_tokens is None:
+            completion_tokens = self.config["default_completion_tokens"]
+        # A reply limit as large as the window still leaves room for a prompt.
+        budget = window - min(completion_tokens, window // 2)
+        if self.config["max_prompt_tokens"]:
+            budget = min(budget, self.config["max_prompt_tokens"])
+        return budget
+
+    def counter_for(self, model: str) -> TokenCounter:
+        counter = self._counters.get(model)
+        if counter is None:
+            counter = self._counters[model] = TokenCounter(model, self.config)
+        return counter
+
+    def build(self, session_id: str, model: str, strategy: Optional[str] = None,
+              completion_tokens: Optional[int] = None) -> List[ChatMessage]:
+        strategy_class = self.STRATEGIES.get(strategy or self.config["strategy"], SummaryStrategy)
+        return strategy_class(self.config).build(
+            session_id, self.budget_for(model, completion_tokens), self.counter_for(model), self
+        )
+
+    def read_recent(self, session_id: str, tokens: int, counter: TokenCounter, start: int = 0,
+                    max_messages: Optional[int] = None) -> Tuple[int, List[ChatMessage]]:
+        """The offset and messages of the shortest tail holding more than ``tokens`` tokens.
+
+        The tail holds at most ``max_messages`` messages and none before
+        ``start``; it is the whole session from ``start`` if that fits.
+        """
+        end = offset = self.chat_storage.get_message_count(session_id)
+        messages: List[ChatMessage] = []
+        used = 0
+        while offset > start and used <= tokens and (max_messages is None
+                                                      or len(messages) < max_messages):
+            page_start = max(start, offset - self.config["page_size"])
+            page = self.chat_storage.get_session_messages(session_id, page_start, offset - page_start)
+            used += counter.total(page)
+            messages = page + messages
+            offset = page_start
+        if max_messages is not None and len(messages) > max_messages:
+            offset += len(messages) - max_messages
+            messages = messages[-max_messages:]
+        return offset if messages else end, messages
+
+    def first_message(self, session_id: str) -> Optional[ChatMessage]:
+        messages = self.chat_storage.get_session_messages(session_id, 0, 1)
+        return messages[0] if messages else None
+
+    def get_summary(self, session_id: str) -> Optional[dict]:
+        return self.chat_storage.get_session_metadata(session_id).get(SUMMARY_KEY)
+
+    def save_summary(self, session_id: str, checkpoint: dict):
+        self.chat_storage.update_session_metadata(session_id, {SUMMARY_KEY: checkpoint})
+
+    def summarize(self, previous: str, messages: List[ChatMessage]) -> Optional[str]:
+        if not self._summarize or not messages:
+            return None
+        try:
+            return self._summarize(previous, messages)
+        except Exception as e:
+            print(f"Error summarizing chat history: {str(e)}")
+            return None
@@ -0,0 +1,122 @@
+import os
+import re
+import sqlite3
+import threading
+from typing import Iterable, List, Optional, Tuple
+from app.models.chat import ChatMessage, SearchHit
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS messages (
+    rowid INTEGER PRIMARY KEY,
+    message_id TEXT NOT NULL UNIQUE,
+    session_id TEXT NOT NULL,
+    content TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_messages_session_id ON messages (session_id);
+
+CREATE VIRTUAL TABLE IF NOT EXISTS messages_fts USING fts5 (
+    content,
+    content = 'messages',
+    content_rowid = 'rowid',
+    tokenize = 'unicode61 remove_diacritics 2',
+    prefix = '2 3'
+);
+
+CREATE TRIGGER IF NOT EXISTS messages_ai AFTER INSERT ON messages BEGIN
+    INSERT INTO messages_fts (rowid, content) VALUES (new.rowid, new.content);
+END;
+CREATE TRIGGER IF NOT EXISTS messages_ad AFTER DELETE ON messages BEGIN
+    INSERT INTO messages_fts (messages_fts, rowid, content)
+    VALUES ('delete', old.rowid, old.content);
+END;
+"""
+
+WORD_PATTERN = re.compile(r'\w+', re.UNICODE)
+
+def match_expression(query: str) -> str:
+    """Turn free text into an FTS5 query matching every word.
+
+    Words are quoted so punctuation and FTS operators typed by the user
+    are taken literally; the last word matches as a prefix so results
+    appear while it is still being typed.
+    """
+    words = WORD_PATTERN.findall(query)
+    if not words:
+        return ""
+    terms = [f'"{word}"' for word in words]
+    terms[-1] += '*'
+    return ' '.join(terms)
+
+class ChatSearchIndex:
+    """Full-text index of chat messages in an SQLite FTS5 database.
+
+    The message text lives in a plain table that the FTS table indexes
+    through triggers, so a message is indexed at most once (re-adding it
+    is a no-op) and removing a session is a single indexed delete.
+    """
+
+    def __init__(self, base_dir: str, config: dict):
+        index_dir = os.path.join(base_dir, config['dir_name'])
+        os.makedirs(index_dir, exist_ok=True)
+        self.db_path = os.path.join(index_dir, config['file_name'])
+        self.config = config
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+
+    def add_messages(self, session_id: str, messages: Iterable[ChatMessage]):
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO messages (message_id, session_id, content) VALUES (?, ?, ?)",
+                [(msg.id, session_id, msg.content) for msg in messages]
+            )
+
+    def search(self, query: str, limit: Optional[int] = None,
+               highlight: Tuple[str, str] = ('', '')) -> List[SearchHit]:
+        """Messages matching every word of ``query``, most relevant first.
+
+        Only the ``rank_window`` most recently indexed matches are ranked:
+        scoring is linear in the number of matches, and a query broad
+        enough to match more than that (a short prefix) would otherwise
+        stop being interactive. Matched words in the snippets are wrapped
+        in ``highlight``.
+        """
+        expression = match_expression(query)
+        if not expression:
+            return []
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT m.session_id, m.message_id, "
+                "snippet(messages_fts, 0, ?, ?, '...', ?), bm25(messages_fts) AS score "
+                "FROM messages_fts JOIN messages m ON m.rowid = messages_fts.rowid "
+                "WHERE messages_fts MATCH ? AND messages_fts.rowid >= ("
+                "    SELECT coalesce(min(rowid), 0) FROM ("
+                "        SELECT rowid FROM messages_fts WHERE messages_fts MATCH ? "
+                "        ORDER BY rowid DESC LIMIT ?"
+                "    )"
+                ") ORDER BY score LIMIT ?",
+                (highlight[0], highlight[1], self.config['snippet_tokens'], expression,
+                 expression, self.config['rank_window'], limit or self.config['max_results'])
+            ).fetchall()
+        return [SearchHit(*row) for row in rows]
+
+    def is_empty(self) -> bool:
+        with self._lock:
+            return self._conn.execute("SELECT 1 FROM messages LIMIT 1").fetchone() is None
+
+    def remove_session(self, session_id: str):
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM messages WHERE session_id = ?", (session_id,))
+
+    def clear(self):
+        # Dropping the tables skips the per-row delete trigger.
+        with self._lock:
+            self._conn.executescript(
+                "DROP TABLE IF EXISTS messages_fts; DROP TABLE IF EXISTS messages;" + SCHEMA
+            )
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
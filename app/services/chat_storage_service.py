@@ -1,16 +1,173 @@
 import os
-import json
-from datetime import datetime
-from typing import List, Optional
-from app.models.chat import ChatMessage, ChatSession, Role
+import threading
+import time
+from dataclasses import replace
+from datetime import datetime, timedelta
+from typing import Callable, List, Optional
+from app.models.chat import ChatMessage, ChatSession, Role, SearchHit, SessionSummary
+from app.config.chat_storage_config import CHAT_STORAGE_CONFIG
+from app.services.journal_chat_store import JournalChatStore
+from app.services.sqlite_chat_store import SQLiteChatStore
+from app.services.session_cache import SessionCache
+from app.services.chat_write_queue import ChatWriteQueue
+from app.services.chat_search_index import ChatSearchIndex
+from app.services.session_manifest import make_title
+from app.services.file_watcher import FileWatcher
 import uuid
 
 class ChatStorageService:
-    """Service for storing and retrieving chat messages."""
+    """Service for storing and retrieving chat messages.
 
-    def __init__(self):
-        self.base_dir = os.path.expanduser('~/.aiwritingassistant/chats')
-        os.makedirs(self.base_dir, exist_ok=True)
+    Persistence is delegated to a store selected by ``backend``: ``"journal"``
+    keeps one append-only file per session, ``"sqlite"`` keeps everything in
+    an indexed SQLite database. When a new SQLite database is created, the
+    journal sessions already in the directory are imported into it. Recently used sessions are kept in a
+    ``SessionCache`` and revalidated against the store's stamp on every read.
+
+    New messages go through a ``ChatWriteQueue`` and reach the store from a
+    background thread; reads overlay the queued messages on what the store
+    holds, so callers never see the difference. Call ``flush()`` (or
+    ``close()``) to wait until everything is on disk. Messages that cannot
+    be written are kept and retried; ``subscribe_errors`` callbacks are
+    told when writing starts to fail.
+
+    Messages are added to a full-text ``ChatSearchIndex`` as they are
+    written. Startup housekeeping runs on a background thread: the index
+    is rebuilt if it is empty, and when archiving is enabled, sessions not
+    updated for a while are moved into compressed monthly archives, from
+    which they are read back on demand.
+
+    Other instances of the application may use the same directory. Their
+    changes are seen by the next read, and callbacks registered with
+    ``subscribe`` are told which sessions they changed as soon as the
+    ``FileWatcher`` notices.
+    """
+
+    STORES = {
+        'journal': JournalChatStore,
+        'sqlite': SQLiteChatStore,
+    }
+
+    def __init__(self, base_dir: Optional[str] = None, backend: Optional[str] = None):
+        self.config = CHAT_STORAGE_CONFIG
+        self.base_dir = os.path.expanduser(base_dir or self.config['base_dir'])
+        self.backend = backend or self.config['backend']
+        if self.backend not in self.STORES:
+            raise ValueError(f"Unknown chat storage backend: {self.backend}")
+        # Created before the store so the index directory does not make the
+        # session directory look newer than the store's manifest.
+        self.search_index = None
+        if self.config['search']['enabled']:
+            self.search_index = ChatSearchIndex(self.base_dir, self.config['search'])
+        self.store = self.STORES[self.backend](self.base_dir, self.config)
+        if self.backend == 'sqlite':
+            self.store.import_once(self._open_journals)
+        self.cache = SessionCache(
+            max_sessions=self.config['cache']['max_sessions'],
+            max_bytes=self.config['cache']['max_bytes']
+        )
+        self._lock = threading.RLock()
+        self._listeners: List[Callable[[str], None]] = []
+        self._error_listeners: List[Callable[[str], None]] = []
+        self.writer = ChatWriteQueue(
+            self.store, self._lock, self.config['write_behind'], self._on_messages_written,
+            self._on_write_error
+        )
+        self._unwatch = None
+        if self.store.watched_file:
+            self._unwatch = FileWatcher.shared().watch(os.path.dirname(self.store.watched_file),
+                                                       self._on_file_changed)
+        threading.Thread(target=self._maintain, name="chat-maintenance", daemon=True).start()
+
+    def _open_journals(self) -> Optional[JournalChatStore]:
+        """The journal store of the directory, if it has any sessions to import."""
+        extensions = (self.config['journal']['extension'], self.config['journal']['legacy_extension'])
+        archive_dir = os.path.join(self.base_dir, self.config['archive']['dir_name'])
+        if (not any(name.endswith(extensions) for name in os.listdir(self.base_dir))
+                and not os.path.isdir(archive_dir)):
+            return None
+        return JournalChatStore(self.base_dir, self.config)
+
+    def subscribe(self, callback: Callable[[str], None]) -> Callable[[], None]:
+        """Call ``callback(session_id)`` when another process changes a session.
+
+        Called on the file watcher's thread. Returns a function that unsubscribes.
+        """
+        return self._add_listener(self._listeners, callback)
+
+    def subscribe_errors(self, callback: Callable[[str], None]) -> Callable[[], None]:
+        """Call ``callback(message)`` when queued messages cannot be written.
+
+        Called on the writer's thread with the storage lock held, so it
+        must not block; the messages stay queued and are retried. Returns
+        a function that unsubscribes.
+        """
+        return self._add_listener(self._error_listeners, callback)
+
+    def _add_listener(self, listeners: list, callback) -> Callable[[], None]:
+        with self._lock:
+            listeners.append(callback)
+
+        def unsubscribe():
+            with self._lock:
+                if callback in listeners:
+                    listeners.remove(callback)
+        return unsubscribe
+
+    def _on_write_error(self, message: str):
+        listeners = list(self._error_listeners)
+        if not listeners:
+            print(message)
+        for listener in listeners:
+            try:
+                listener(message)
+            except Exception as e:
+                print(f"Error reporting chat storage error: {str(e)}")
+
+    def _on_file_changed(self, path: str):
+        if os.path.realpath(path) != os.path.realpath(self.store.watched_file):
+            return
+        with self._lock:
+            # Only records other processes appended are read; our own are skipped.
+            changes = self.store.external_changes()
+            for session_id in changes:
+                self.cache.invalidate(session_id)
+            listeners = list(self._listeners)
+        if self.search_index:
+            self._index_external_changes(changes)
+        for session_id in changes:
+            for listener in listeners:
+                try:
+                    listener(session_id)
+                except Exception as e:
+                    print(f"Error handling change of chat session {session_id}: {str(e)}")
+
+    def _index_external_changes(self, changes: dict):
+        """Bring the search index up to date with sessions other processes changed.
+
+        Only the messages added since the earlier summary are read; the
+        index ignores any it already has.
+        """
+        for session_id, previous in changes.items():
+            try:
+                with self._lock:
+                    count = self.store.message_count(session_id)
+                    if count is None:
+                        self.search_index.remove_session(session_id)
+                        continue
+                    start = previous.message_count if previous else 0
+                    if start > count:
+                        start = 0  # Rewritten with fewer messages; re-read all.
+                    messages = self.store.read_messages(session_id, start, count - start)
+                self.search_index.add_messages(session_id, messages)
+            except Exception as e:
+                print(f"Error indexing chat session {session_id}: {str(e)}")
+
+    def _maintain(self):
+        if self.search_index and self.search_index.is_empty():
+            self.rebuild_search_index()
+        if self.config['archive']['enabled']:
+            self.archive_stale_sessions()
 
     def create_session(self) -> ChatSession:
         session_id = str(uuid.uuid4())
@@ -20,106 +177,299 @@ class ChatStorageService:
             created_at=datetime.now(),
             updated_at=datetime.now()
         )
-        self._save_session(session)
+        with self._lock:
+            self.store.create_session(session)
+            self.cache.put(self._copy(session), self.store.session_stamp(session_id))
         return session
 
     def add_message(self, session_id: str, role: Role, content: str):
-        session = self._load_session(session_id)
-        if session:
-            message = ChatMessage(
-                id=str(uuid.uuid4()),
-                role=role,
-                content=content,
-                timestamp=datetime.now(),
-                session_id=session_id
+        message = ChatMessage(
+            id=str(uuid.uuid4()),
+            role=role,
+            content=content,
+            created=time.time()
+        )
+        with self._lock:
+            if self.store.session_stamp(session_id) is None:
+                raise ValueError(f"Session not found: {session_id}")
+        # Without write-behind the writer appends and fsyncs on this thread;
+        # it takes the lock only for the append.
+        self.writer.enqueue(session_id, message)
+
+    def get_session_messages(self, session_id: str, offset: int = 0,
+                             limit: Optional[int] = None) -> List[ChatMessage]:
+        """Messages of a session, optionally only ``limit`` of them from ``offset``."""
+        with self._lock:
+            if limit is None and offset == 0:
+                session = self._load_session(session_id)
+                return list(session.messages) if session else []
+
+            pending = self.writer.pending(session_id)
+            session = self._cached_session(session_id)
+            stored_count = len(session.messages) if session else self.store.message_count(session_id) or 0
+            end = stored_count + len(pending) if limit is None else offset + limit
+
+            stored_end = min(end, stored_count)
+            if offset >= stored_end:
+                stored = []
+            elif session:
+                stored = session.messages[offset:stored_end]
+            else:
+                stored = self.store.read_messages(session_id, offset, stored_end - offset)
+            return stored + pending[max(offset - stored_count, 0):max(end - stored_count, 0)]
+
+    def get_session_metadata(self, session_id: str) -> dict:
+        with self._lock:
+            session = self._cached_session(session_id)
+            if session:
+                return dict(session.metadata)
+            return self.store.read_metadata(session_id) or {}
+
+    def update_session_metadata(self, session_id: str, values: dict) -> bool:
+        """Merge ``values`` into a session's metadata, writing them immediately."""
+        with self._lock:
+            self.cache.invalidate(session_id)
+            updated = self.store.update_metadata(session_id, values)
+        # The rewrite keeps the content, so readers need not wait for it.
+        if updated and self.store.compaction_due(session_id):
+            self.store.compact_session(session_id)
+        return updated
+
+    def get_session_tail(self, session_id: str, limit: int) -> List[ChatMessage]:
+        """The last ``limit`` messages of a session, oldest first."""
+        if limit <= 0:
+            return []
+        with self._lock:
+            pending = self.writer.pending(session_id)
+            if len(pending) >= limit:
+                return pending[-limit:]
+            stored_limit = limit - len(pending)
+            session = self._cached_session(session_id)
+            if session:
+                stored = session.messages[-stored_limit:]
+            else:
+                stored = self.store.read_tail(session_id, stored_limit)
+            return stored + pending
+
+    def get_message_position(self, session_id: str, message_id: str) -> Optional[int]:
+        """Index of a message in its session, or None if it is not there."""
+        with self._lock:
+            session = self._cached_session(session_id)
+            if session:
+                stored_count = len(session.messages)
+                position = next((index for index, message in enumerate(session.messages)
+                                 if message.id == message_id), None)
+            else:
+                stored_count = self.store.message_count(session_id) or 0
+                position = self.store.message_position(session_id, message_id)
+            if position is not None:
+                return position
+            pending = self.writer.pending(session_id)
+            return next((stored_count + index for index, message in enumerate(pending)
+                         if message.id == message_id), None)
+
+    def get_message_count(self, session_id: str) -> int:
+        with self._lock:
+            pending = len(self.writer.pending(session_id))
+            session = self._cached_session(session_id)
+            if session:
+                return len(session.messages) + pending
+            return (self.store.message_count(session_id) or 0) + pending
+
+    def get_last_session(self) -> Optional[ChatSession]:
+        with self._lock:
+            # Queued messages are this process's most recent writes.
+            pending_sessions = self.writer.pending_sessions()
+            session_id = pending_sessions[-1] if pending_sessions else self.store.latest_session_id()
+            if not session_id:
+                return None
+            session = self._load_session(session_id)
+            return self._copy(session) if session else None
+
+    def list_sessions(self) -> List[SessionSummary]:
+        """Summaries of all sessions, most recently updated first."""
+        with self._lock:
+            summaries = self.store.list_sessions()
+            if not self.writer.pending_sessions():
+                return summaries
+            return sorted(
+                (self._with_pending(summary) for summary in summaries),
+                key=lambda summary: summary.updated_at,
+                reverse=True
             )
-            session.messages.append(message)
-            session.updated_at = datetime.now()
-            self._save_session(session)
+
+    def _with_pending(self, summary: SessionSummary) -> SessionSummary:
+        pending = self.writer.pending(summary.id)
+        if not pending:
+            return summary
+        title = summary.title or next(
+            (make_title(msg.content, self.config['title_length'])
+             for msg in pending if msg.role == Role.USER),
+            ""
+        )
+        return replace(
+            summary,
+            message_count=summary.message_count + len(pending),
+            updated_at=max(summary.updated_at, pending[-1].timestamp),
+            title=title
+        )
+
+    def compact_session(self, session_id: str) -> bool:
+        if not self.flush():
+            return False
+        return self.store.compact_session(session_id)
+
+    def search(self, query: str, limit: Optional[int] = None,
+               highlight: tuple = ('', '')) -> List[SearchHit]:
+        """Stored messages matching every word of ``query``, most relevant first."""
+        if not self.search_index:
+            return []
+        try:
+            return self.search_index.search(query, limit, highlight)
+        except Exception as e:
+            print(f"Error searching chat history: {str(e)}")
+            return []
+
+    def rebuild_search_index(self) -> int:
+        """Index every stored message; returns the number of sessions read.
+
+        Messages already indexed are skipped, so this is safe to run while
+        new messages are being written.
+        """
+        if not self.search_index:
+            return 0
+        count = 0
+        try:
+            with self._lock:
+                summaries = self.store.list_sessions()
+            for summary in summaries:
+                with self._lock:
+                    session = self.store.load_session(summary.id)
+                    if session:
+                        self.search_index.add_messages(session.id, session.messages)
+                        count += 1
+        except Exception as e:
+            print(f"Error rebuilding chat search index: {str(e)}")
+        return count
+
+    def archive_stale_sessions(self, after_days: Optional[int] = None) -> int:
+        """Archive sessions not updated for ``after_days`` days; returns how many.
+
+        The lock is taken one month at a time so the UI is never blocked for
+        the whole pass. The latest session and sessions with queued messages
+        are left alone.
+        """
+        if after_days is None:
+            after_days = self.config['archive']['after_days']
+        cutoff = datetime.now() - timedelta(days=after_days)
+        archived = 0
+        try:
+            with self._lock:
+                candidates = self.store.archive_candidates(cutoff)
+            for month, session_ids in candidates.items():
+                with self._lock:
+                    skip = set(self.writer.pending_sessions())
+                    skip.add(self.store.latest_session_id())
+                    session_ids = [
+                        session_id for session_id in session_ids if session_id not in skip
+                    ]
+                    archived += self.store.archive_sessions(month, session_ids, cutoff)
+                    for session_id in session_ids:
+                        self.cache.invalidate(session_id)
+        except Exception as e:
+            print(f"Error archiving chat sessions: {str(e)}")
+        return archived
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Wait until every queued message has been written and synced.
+
+        Returns False on timeout or while writes are failing.
+        """
+        return self.writer.flush(timeout)
+
+    def _on_messages_written(self, session_id: str, messages: List[ChatMessage],
+                             stamp_before, stamp_after):
+        # Called by the writer with the lock held. A cached copy that matched
+        # the store before the write is extended instead of being re-read.
+        if self.search_index:
+            self.search_index.add_messages(session_id, messages)
+        if stamp_before is not None and self.cache.get(session_id, stamp_before) is not None:
+            for message in messages:
+                self.cache.append(session_id, message, stamp_after)
         else:
-            raise ValueError(f"Session not found: {session_id}")
+            self.cache.invalidate(session_id)
+
+    def _cached_session(self, session_id: str) -> Optional[ChatSession]:
+        """Return the cached session if it is still current, without loading it."""
+        if session_id not in self.cache:
+            return None
+        stamp = self.store.session_stamp(session_id)
+        return self.cache.get(session_id, stamp) if stamp else None
 
-    def get_session_messages(self, session_id: str) -> List[ChatMessage]:
-        session = self._load_session(session_id)
-        return session.messages if session else []
+    def _load_session(self, session_id: str) -> Optional[ChatSession]:
+        """The session as stored, plus any messages still queued for it.
 
-    def get_last_session(self) -> Optional[ChatSession]:
-        sessions = [f for f in os.listdir(self.base_dir) if f.endswith('.json')]
-        if not sessions:
+        This may be the cached session itself: callers must not change it,
+        and must return a ``_copy`` of it rather than the session.
+        """
+        stamp = self.store.session_stamp(session_id)
+        if stamp is None:
+            self.cache.invalidate(session_id)
             return None
-        latest_session = max(
-            sessions,
-            key=lambda x: os.path.getmtime(os.path.join(self.base_dir, x))
+        session = self.cache.get(session_id, stamp)
+        if session is None:
+            session = self.store.load_session(session_id)
+            if not session:
+                return None
+            self.cache.put(session, stamp)
+
+        pending = self.writer.pending(session_id)
+        if not pending:
+            return session
+        return ChatSession(
+            id=session.id,
+            messages=session.messages + pending,
+            created_at=session.created_at,
+            updated_at=max(session.updated_at, pending[-1].timestamp),
+            metadata=session.metadata
         )
-        return self._load_session(latest_session.replace('.json', ''))
-
-    def _save_session(self, session: ChatSession):
-        file_path = os.path.join(self.base_dir, f"{session.id}.json")
-        with open(file_path, 'w') as f:
-            json.dump({
-                'id': session.id,
-                'messages': [
-                    {
-                        'id': msg.id,
-                        'role': msg.role.value,
-                        'content': msg.content,
-                        'timestamp': msg.timestamp.isoformat(),
-                        'session_id': msg.session_id
-                    }
-                    for msg in session.messages
-                ],
-                'created_at': session.created_at.isoformat(),
-                'updated_at': session.updated_at.isoformat()
-            }, f, indent=2)
 
-    def _load_session(self, session_id: str) -> Optional[ChatSession]:
-        file_path = os.path.join(self.base_dir, f"{session_id}.json")
-        if os.path.exists(file_path):
-            with open(file_path, 'r') as f:
-                data = json.load(f)
-                return ChatSession(
-                    id=data['id'],
-                    messages=[
-                        ChatMessage(
-                            id=msg['id'],
-                            role=Role(msg['role']),
-                            content=msg['content'],
-                            timestamp=datetime.fromisoformat(msg['timestamp']),
-                            session_id=msg['session_id']
-                        )
-                        for msg in data['messages']
-                    ],
-                    created_at=datetime.fromisoformat(data['created_at']),
-                    updated_at=datetime.fromisoformat(data['updated_at'])
-                )
-        return None
+    @staticmethod
+    def _copy(session: ChatSession) -> ChatSession:
+        # Messages are immutable; only the containers need copying.
+        return replace(session, messages=list(session.messages), metadata=dict(session.metadata))
 
     def remove_session(self, session_id: str) -> bool:
         try:
-            file_path = os.path.join(self.base_dir, f"{session_id}.json")
-            if os.path.exists(file_path):
-                os.remove(file_path)
-                for file in os.listdir(self.base_dir):
-                    if file.startswith(session_id):
-                        try:
-                            os.remove(os.path.join(self.base_dir, file))
-                        except Exception as e:
-                            print(f"Error removing associated file {file}: {str(e)}")
-                return True
-            return False
+            with self._lock:
+                self.writer.discard(session_id)
+                self.cache.invalidate(session_id)
+                if self.search_index:
+                    self.search_index.remove_session(session_id)
+                return self.store.remove_session(session_id)
         except Exception as e:
             print(f"Error removing session: {str(e)}")
             return False
 
     def clear_all_sessions(self) -> bool:
         try:
-            for file in os.listdir(self.base_dir):
-                if file.endswith('.json'):
-                    try:
-                        os.remove(os.path.join(self.base_dir, file))
-                    except Exception as e:
-                        print(f"Error removing file {file}: {str(e)}")
+            with self._lock:
+                self.writer.discard()
+                self.cache.clear()
+                if self.search_index:
+                    self.search_index.clear()
+                self.store.clear()
             return True
         except Exception as e:
             print(f"Error clearing all sessions: {str(e)}")
             return False
+
+    def close(self):
+        """Flush queued messages and release the store."""
+        if self._unwatch:
+            self._unwatch()
+        self.writer.close()
+        with self._lock:
+            self.store.close()
+            if self.search_index:
+                self.search_index.close()
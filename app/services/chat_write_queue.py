@@ -0,0 +1,210 @@
+import threading
+import time
+from contextlib import nullcontext
+from typing import Callable, Dict, List, Optional
+from app.models.chat import ChatMessage
+
+class ChatWriteQueue:
+    """Write-behind queue for chat messages.
+
+    Messages are queued per session and written to the store by a
+    background thread, so bursts of messages for one session become a
+    single append. The queue shares the owning service's lock: appends
+    happen while holding it, so under that lock the store and
+    ``pending()`` together always describe every message exactly once.
+
+    Durability is batched: files written since the last sync are fsynced
+    at most every ``fsync_interval`` seconds (``0`` after every write,
+    ``None`` leaves it to the OS), and always by ``flush()``. The fsync
+    happens after the lock is released, so readers never wait on it.
+
+    Messages that fail to be written stay queued, ahead of newer ones, and
+    are retried after ``retry_delay`` seconds, doubling up to
+    ``max_retry_delay``. ``on_error(message)`` is called on the first
+    failure of a run of them.
+    """
+
+    def __init__(self, store, lock: threading.RLock, config: dict,
+                 on_written: Callable[[str, List[ChatMessage], object, object], None],
+                 on_error: Optional[Callable[[str], None]] = None):
+        self.store = store
+        self.enabled = config['enabled']
+        self.flush_delay = config['flush_delay']
+        self.fsync_interval = config['fsync_interval']
+        self.retry_delay = config['retry_delay']
+        self.max_retry_delay = config['max_retry_delay']
+        self._on_written = on_written
+        self._on_error = on_error
+        self._cond = threading.Condition(lock)
+        self._pending: Dict[str, List[ChatMessage]] = {}
+        self._flush_requested = False
+        # Consecutive write attempts that failed, and all attempts made.
+        self._failures = 0
+        self._attempts = 0
+        self._closed = False
+        self._last_sync = time.monotonic()
+        self._unsynced = False
+        self._thread = None
+        if self.enabled:
+            self._thread = threading.Thread(
+                target=self._run, name="chat-write-behind", daemon=True
+            )
+            self._thread.start()
+
+    def enqueue(self, session_id: str, message: ChatMessage):
+        with self._cond:
+            self._pending.setdefault(session_id, []).append(message)
+            if self.enabled and not self._closed:
+                self._cond.notify_all()
+                return
+            self._write_pending()
+        self._maybe_sync()
+
+    def pending(self, session_id: str) -> List[ChatMessage]:
+        """Messages for a session that are queued but not yet in the store."""
+        with self._cond:
+            return list(self._pending.get(session_id, ()))
+
+    def pending_sessions(self) -> List[str]:
+        """Ids of sessions with queued messages, most recently written last."""
+        with self._cond:
+            return sorted(self._pending, key=lambda session_id: self._pending[session_id][-1].created)
+
+    def discard(self, session_id: Optional[str] = None):
+        """Drop queued messages for one session, or for all of them."""
+        with self._cond:
+            if session_id is None:
+                self._pending.clear()
+            else:
+                self._pending.pop(session_id, None)
+
+    @property
+    def failing(self) -> bool:
+        """Whether the last attempt to write queued messages failed."""
+        with self._cond:
+            return self._failures > 0
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Block until every queued message is written and synced to disk.
+
+        Returns False when ``timeout`` expires first or a write fails; the
+        messages that were not written stay queued.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            if self._thread is None or not self._thread.is_alive():
+                self._write_pending()
+            attempts = self._attempts
+            self._flush_requested = True
+            self._cond.notify_all()
+            while self._pending:
+                if self._failures and (self._attempts > attempts or self._thread is None
+                                       or not self._thread.is_alive()):
+                    return False
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+        self._sync()
+        return True
+
+    def close(self, timeout: Optional[float] = None) -> bool:
+        """Flush, then stop the background thread."""
+        flushed = self.flush(timeout)
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        if self._thread:
+            self._thread.join(timeout)
+        return flushed
+
+    def _run(self):
+        with self._cond:
+            while not self._closed:
+                if not self._pending:
+                    self._cond.wait(self._sync_due_in())
+                    if not self._pending:
+                        self._sync_if_due()
+                        continue
+                # Let a burst of messages accumulate before writing, or
+                # back off after a failed write.
+                deadline = time.monotonic() + (self._backoff() if self._failures
+                                               else self.flush_delay)
+                while not self._closed and not self._flush_requested:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+                self._write_pending()
+                self._flush_requested = False
+                self._cond.notify_all()
+                self._sync_if_due()
+
+    def _backoff(self) -> float:
+        return min(self.retry_delay * 2 ** (self._failures - 1), self.max_retry_delay)
+
+    def _sync_due_in(self) -> Optional[float]:
+        if not self._unsynced or self.fsync_interval is None:
+            return None
+        return max(self._last_sync + self.fsync_interval - time.monotonic(), 0)
+
+    def _sync_if_due(self):
+        if self._sync_due_in() != 0:
+            return
+        # fsync without holding the lock; readers need not wait on it.
+        self._cond.release()
+        try:
+            self._sync()
+        finally:
+            self._cond.acquire()
+
+    def _write_pending(self):
+        if not self._pending:
+            return
+        batch, self._pending = self._pending, {}
+        failed = self._write(batch)
+        self._attempts += 1
+        if not failed:
+            self._failures = 0
+            return
+        # Retried ahead of anything queued since, keeping each session in order.
+        for session_id, messages in self._pending.items():
+            failed.setdefault(session_id, []).extend(messages)
+        self._pending = failed
+        self._failures += 1
+
+    def _write(self, batch: Dict[str, List[ChatMessage]]) -> Dict[str, List[ChatMessage]]:
+        """Write ``batch``; returns the messages of the sessions that failed."""
+        failed = {}
+        for session_id, messages in batch.items():
+            try:
+                # Another process must not write between the two stamps.
+                with getattr(self.store, 'lock', None) or nullcontext():
+                    before = self.store.session_stamp(session_id)
+                    written = self.store.append_messages(session_id, messages)
+                    after = self.store.session_stamp(session_id)
+            except Exception as e:
+                failed[session_id] = messages
+                if not self._failures and self._on_error:
+                    self._on_error(f"Error writing chat messages for session {session_id}: {str(e)}")
+                continue
+            if written:
+                self._unsynced = True
+                self._on_written(session_id, messages, before, after)
+        return failed
+
+    def _maybe_sync(self):
+        with self._cond:
+            due = self._sync_due_in() == 0
+        if due:
+            self._sync()
+
+    def _sync(self):
+        with self._cond:
+            self._unsynced = False
+        try:
+            self.store.sync()
+        except Exception as e:
+            print(f"Error syncing chat storage: {str(e)}")
+        with self._cond:
+            self._last_sync = time.monotonic()
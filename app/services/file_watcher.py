@@ -0,0 +1,104 @@
+import os
+import threading
+from typing import Callable, Dict, List
+
+try:
+    from watchdog.events import FileSystemEventHandler
+    from watchdog.observers import Observer
+except ImportError:
+    FileSystemEventHandler = object
+    Observer = None
+
+class _DirectoryHandler(FileSystemEventHandler):
+    def __init__(self, watcher: 'FileWatcher', directory: str):
+        self.watcher = watcher
+        self.directory = directory
+
+    def on_any_event(self, event):
+        if event.is_directory or event.event_type not in ("created", "modified", "moved"):
+            return
+        # Files are saved by renaming a temporary file over them.
+        path = getattr(event, 'dest_path', None) or event.src_path
+        self.watcher._dispatch(self.directory, os.fsdecode(path))
+
+class FileWatcher:
+    """Tells callbacks when files in a directory change, without polling.
+
+    Uses one watchdog observer thread for the whole application; without
+    watchdog installed ``watch`` does nothing and changes made by other
+    processes are only seen when the files are next read. Callbacks run on
+    the observer thread and are also called for this process's own writes,
+    which they are expected to recognize and ignore.
+    """
+
+    _shared = None
+    _shared_lock = threading.Lock()
+
+    def __init__(self):
+        # Guards the callbacks, which the observer thread reads while holding
+        # its own lock; the observer is therefore only called under
+        # ``_schedule_lock``, never under this one.
+        self._lock = threading.Lock()
+        self._schedule_lock = threading.Lock()
+        self._observer = None
+        self._callbacks: Dict[str, List[Callable[[str], None]]] = {}
+        self._watches = {}
+
+    @classmethod
+    def shared(cls) -> 'FileWatcher':
+        with cls._shared_lock:
+            if cls._shared is None:
+                cls._shared = cls()
+            return cls._shared
+
+    @property
+    def available(self) -> bool:
+        return Observer is not None
+
+    def watch(self, directory: str, callback: Callable[[str], None]) -> Callable[[], None]:
+        """Call ``callback(path)`` when a file directly in ``directory`` changes.
+
+        Returns a function that stops the callback.
+        """
+        directory = os.path.realpath(directory)
+        if Observer is None:
+            return lambda: None
+        with self._schedule_lock:
+            if self._observer is None:
+                self._observer = Observer()
+                self._observer.daemon = True
+                self._observer.start()
+            if directory not in self._watches:
+                try:
+                    self._watches[directory] = self._observer.schedule(
+                        _DirectoryHandler(self, directory), directory, recursive=False
+                    )
+                except OSError as e:
+                    print(f"Error watching {directory}: {str(e)}")
+                    return lambda: None
+            with self._lock:
+                self._callbacks.setdefault(directory, []).append(callback)
+
+        def unwatch():
+            with self._schedule_lock:
+                with self._lock:
+                    callbacks = self._callbacks.get(directory, [])
+                    if callback in callbacks:
+                        callbacks.remove(callback)
+                    if callbacks or directory not in self._watches:
+                        return
+                    del self._callbacks[directory]
+                try:
+                    self._observer.unschedule(self._watches.pop(directory))
+                except (KeyError, OSError):
+                    pass  # The directory is already gone.
+        return unwatch
+
+    def _dispatch(self, directory: str, path: str):
+        with self._lock:
+            callbacks = list(self._callbacks.get(directory, ()))
+        for callback in callbacks:
+            try:
+                callback(path)
+            except Exception as e:
+                print(f"Error handling change of {path}: {str(e)}")
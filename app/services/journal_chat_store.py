@@ -0,0 +1,539 @@
+import os
+import json
+import functools
+from itertools import islice
+from datetime import datetime
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple
+from app.models.chat import ChatMessage, ChatSession, ROLE_BY_VALUE, SessionSummary
+from app.services.chat_archive import ChatArchive
+from app.services.chat_codec import decode_message_lines, encode_message, is_message_line
+from app.services.session_manifest import SessionManifest
+from app.services.file_lock import FileLock
+
+JOURNAL_VERSION = 2
+HEADER_LINE_PREFIX = b'{"type": "session"'
+METADATA_LINE_PREFIX = b'{"type": "metadata"'
+READ_BLOCK_SIZE = 64 * 1024
+
+def _exclusive(method):
+    """Run a store change holding the directory's lock, on an up-to-date manifest."""
+    @functools.wraps(method)
+    def locked(self, *args, **kwargs):
+        with self.lock:
+            self.manifest.refresh()
+            try:
+                return method(self, *args, **kwargs)
+            finally:
+                # Files renamed, created or removed by the change (and the
+                # lock file itself) must not make the manifest look stale.
+                self.manifest.touch()
+    return locked
+
+class JournalChatStore:
+    """File-based chat store using one append-only journal per session.
+
+    A journal (``<id>.jsonl``) is a header record followed by one JSON
+    record per message, so adding a message only writes that message.
+    Metadata updates are appended the same way and folded into the header
+    when the journal is compacted.
+    Sessions saved in the older single-document format (``<id>.json``) are
+    still read and are converted to a journal the first time a message is
+    added to them. A ``SessionManifest`` answers listing and latest-session
+    queries without touching the session files.
+
+    Old sessions can be moved into a ``ChatArchive``; the manifest records
+    which month's archive holds them, so they are still listed and loaded,
+    and are restored to a journal when a message is added.
+
+    Several processes can share the directory: every change is made while
+    holding a ``FileLock`` on the manifest, after reading the manifest
+    records the others have appended. ``external_changes()`` reports the
+    sessions they changed; ``watched_file`` is the file to watch for that.
+    """
+
+    def __init__(self, base_dir: str, config: dict):
+        self.base_dir = base_dir
+        self.config = config['journal']
+        self.journal_ext = self.config['extension']
+        self.legacy_ext = self.config['legacy_extension']
+        # Bytes of metadata records this process appended to each journal;
+        # compaction folds them into the header.
+        self._dead_bytes: Dict[str, int] = {}
+        self._unsynced: Set[str] = set()
+        os.makedirs(self.base_dir, exist_ok=True)
+        self.archive = ChatArchive(base_dir, config['archive'])
+        self.watched_file = os.path.join(base_dir, config['manifest']['file_name'])
+        self.lock = FileLock(self.watched_file)
+        self.manifest = SessionManifest(
+            base_dir,
+            dict(config['manifest'], title_length=config['title_length']),
+            self._scan_sessions
+        )
+
+    @_exclusive
+    def create_session(self, session: ChatSession):
+        self._save_session(session)
+        self.manifest.add_session(session)
+
+    def append_message(self, session_id: str, message: ChatMessage) -> bool:
+        return self.append_messages(session_id, [message])
+
+    @_exclusive
+    def append_messages(self, session_id: str, messages: List[ChatMessage]) -> bool:
+        """Append a batch of messages with a single write."""
+        journal_path = self._journal_path(session_id)
+        if not os.path.exists(journal_path):
+            # Legacy and archived sessions are migrated once, then appended to.
+            session = self.load_session(session_id)
+            if not session:
+                return False
+            self._save_session(session)
+            self._unarchive(session_id)
+
+        self._append_line(journal_path, b''.join(encode_message(msg) for msg in messages))
+        for message in messages:
+            self.manifest.add_message(session_id, message)
+        return True
+
+    @_exclusive
+    def update_metadata(self, session_id: str, values: dict) -> bool:
+        """Merge ``values`` into the session's metadata with a single append."""
+        journal_path = self._journal_path(session_id)
+        if not os.path.exists(journal_path):
+            session = self.load_session(session_id)
+            if not session:
+                return False
+            self._save_session(session)
+            self._unarchive(session_id)
+        record = json.dumps({'type': 'metadata', 'values': values}).encode('utf-8') + b'\n'
+        self._append_line(journal_path, record)
+        self._dead_bytes[session_id] = self._dead_bytes.get(session_id, 0) + len(record)
+        return True
+
+    def load_session(self, session_id: str) -> Optional[ChatSession]:
+        journal_path = self._journal_path(session_id)
+        if os.path.exists(journal_path):
+            return self._load_journal(journal_path)
+        legacy_path = self._legacy_path(session_id)
+        if os.path.exists(legacy_path):
+            return self._load_legacy(legacy_path)
+        month = self._archive_month(session_id)
+        if month:
+            data = self.archive.read(month, session_id)
+            if data:
+                return self._parse_journal(data.split(b'\n'))
+        return None
+
+    def read_metadata(self, session_id: str) -> Optional[dict]:
+        """The session's metadata, read without decoding its messages."""
+        journal_path = self._journal_path(session_id)
+        if not os.path.exists(journal_path):
+            session = self.load_session(session_id)
+            return session.metadata if session else None
+        metadata = None
+        updates = []
+        with open(journal_path, 'rb') as f:
+            for line in f:
+                try:
+                    if line.startswith(HEADER_LINE_PREFIX):
+                        metadata = json.loads(line).get('metadata', {})
+                    elif line.startswith(METADATA_LINE_PREFIX):
+                        updates.append(json.loads(line)['values'])
+                except (json.JSONDecodeError, KeyError):
+                    continue
+        if metadata is None:
+            return None
+        for values in updates:
+            metadata.update(values)
+        return metadata
+
+    def external_changes(self) -> Dict[str, Optional[SessionSummary]]:
+        """Sessions other processes changed since the last call, with their earlier summaries."""
+        self.manifest.refresh()
+        return self.manifest.take_external_changes()
+
+    def message_count(self, session_id: str) -> Optional[int]:
+        summary = self.manifest.get(session_id)
+        if summary:
+            return summary.message_count
+        session = self.load_session(session_id)
+        return len(session.messages) if session else None
+
+    def read_messages(self, session_id: str, offset: int, limit: int) -> List[ChatMessage]:
+        """Read ``limit`` messages starting at ``offset`` without loading the rest.
+
+        The window is located from whichever end of the journal is closer,
+        and only the records inside it are decoded.
+        """
+        journal_path = self._journal_path(session_id)
+        if not os.path.exists(journal_path):
+            session = self.load_session(session_id)
+            return session.messages[offset:offset + limit] if session else []
+
+        total = self.message_count(session_id) or 0
+        newer = total - offset - limit
+        if newer < offset:
+            take = min(limit, total - offset)
+            if take <= 0:
+                return []
+            lines = list(islice(self._message_lines_reverse(journal_path), max(newer, 0),
+                                max(newer, 0) + take))
+            lines.reverse()
+        else:
+            lines = list(islice(self._message_lines(journal_path), offset, offset + limit))
+        return decode_message_lines(lines)
+
+    def message_position(self, session_id: str, message_id: str) -> Optional[int]:
+        """Index of a message in its session, found without decoding the others."""
+        journal_path = self._journal_path(session_id)
+        if not os.path.exists(journal_path):
+            session = self.load_session(session_id)
+            if session:
+                for index, message in enumerate(session.messages):
+                    if message.id == message_id:
+                        return index
+            return None
+        encoded_id = json.dumps(message_id).encode('utf-8')
+        prefix = b'["m",' + encoded_id + b','
+        legacy_field = b'"id": ' + encoded_id
+        for index, line in enumerate(self._message_lines(journal_path)):
+            if line.startswith(prefix) or (not line.startswith(b'["m",') and legacy_field in line):
+                return index
+        return None
+
+    def read_tail(self, session_id: str, limit: int) -> List[ChatMessage]:
+        """Read the last ``limit`` messages by scanning the journal backwards."""
+        if limit <= 0:
+            return []
+        journal_path = self._journal_path(session_id)
+        if not os.path.exists(journal_path):
+            session = self.load_session(session_id)
+            return session.messages[-limit:] if session else []
+
+        lines = list(islice(self._message_lines_reverse(journal_path), limit))
+        lines.reverse()
+        return decode_message_lines(lines)
+
+    def session_stamp(self, session_id: str) -> Optional[tuple]:
+        """Modification time and size of the session's file, if it exists."""
+        for path in (self._journal_path(session_id), self._legacy_path(session_id)):
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            return (path, stat.st_mtime_ns, stat.st_size)
+        month = self._archive_month(session_id)
+        return self.archive.stamp(month) if month else None
+
+    def latest_session_id(self) -> Optional[str]:
+        self.manifest.refresh()
+        latest = self.manifest.latest()
+        if latest and not self._session_exists(latest.id):
+            # Removed behind our back; the manifest can't be trusted.
+            self.manifest.rebuild()
+            latest = self.manifest.latest()
+        return latest.id if latest else None
+
+    def list_sessions(self) -> List[SessionSummary]:
+        self.manifest.refresh()
+        return self.manifest.list()
+
+    def compaction_due(self, session_id: str) -> bool:
+        """Whether the metadata records appended to a journal call for ``compact_session``.
+
+        Compacting once they are a fixed share of the journal keeps the
+        rewrites' cost proportional to what was appended.
+        """
+        dead = self._dead_bytes.get(session_id, 0)
+        if dead < self.config['compact_min_bytes']:
+            return False
+        try:
+            size = os.path.getsize(self._journal_path(session_id))
+        except OSError:
+            return False
+        return dead >= size * self.config['compact_dead_ratio']
+
+    @_exclusive
+    def compact_session(self, session_id: str) -> bool:
+        """Rewrite a session's journal with a fresh header.
+
+        The header's ``updated_at`` and ``message_count`` are brought up to
+        date and any torn record left by an interrupted append is dropped.
+        """
+        session = self.load_session(session_id)
+        if not session:
+            return False
+        self._save_session(session)
+        return True
+
+    def archive_candidates(self, cutoff: datetime) -> Dict[str, List[str]]:
+        """Ids of unarchived sessions last updated before ``cutoff``, by month."""
+        candidates: Dict[str, List[str]] = {}
+        for summary in self.manifest.list():
+            if summary.archive is None and summary.updated_at < cutoff:
+                candidates.setdefault(summary.updated_at.strftime('%Y-%m'), []).append(summary.id)
+        return candidates
+
+    @_exclusive
+    def archive_sessions(self, month: str, session_ids: List[str], cutoff: datetime) -> int:
+        """Move sessions into the month's archive and delete their files.
+
+        Sessions that were updated since ``cutoff`` or are already archived
+        are skipped. The archive is rewritten before any file is deleted.
+        """
+        add = {}
+        for session_id in session_ids:
+            summary = self.manifest.get(session_id)
+            if not summary or summary.archive is not None or summary.updated_at >= cutoff:
+                continue
+            session = self.load_session(session_id)
+            if session:
+                add[session_id] = self._journal_bytes(session)
+        if not add:
+            return 0
+
+        self.archive.rewrite(month, add, self._archived_in(month))
+        for session_id in add:
+            for path in (self._journal_path(session_id), self._legacy_path(session_id)):
+                if os.path.exists(path):
+                    os.remove(path)
+                self._unsynced.discard(path)
+            self._dead_bytes.pop(session_id, None)
+            self.manifest.set_archive(session_id, month)
+        return len(add)
+
+    @_exclusive
+    def remove_session(self, session_id: str) -> bool:
+        if not self._session_exists(session_id):
+            return False
+        self._unarchive(session_id)
+        for file in os.listdir(self.base_dir):
+            if file.startswith(session_id):
+                try:
+                    os.remove(os.path.join(self.base_dir, file))
+                except Exception as e:
+                    print(f"Error removing associated file {file}: {str(e)}")
+        self._dead_bytes.pop(session_id, None)
+        self.manifest.remove(session_id)
+        return True
+
+    @_exclusive
+    def clear(self):
+        for file in os.listdir(self.base_dir):
+            if self._is_session_file(file):
+                try:
+                    os.remove(os.path.join(self.base_dir, file))
+                except Exception as e:
+                    print(f"Error removing file {file}: {str(e)}")
+        self._dead_bytes.clear()
+        self.archive.clear()
+        self.manifest.clear()
+
+    def sync(self):
+        """fsync every journal written since the last sync."""
+        # Appends may run on other threads meanwhile; only the swap is locked.
+        with self.lock:
+            paths, self._unsynced = self._unsynced, set()
+        for path in paths:
+            try:
+                fd = os.open(path, os.O_RDONLY)
+            except FileNotFoundError:
+                continue
+            try:
+                os.fsync(fd)
+            finally:
+                os.close(fd)
+
+    def close(self):
+        # Journals are opened per operation; nothing is held open.
+        pass
+
+    def _journal_path(self, session_id: str) -> str:
+        return os.path.join(self.base_dir, f"{session_id}{self.journal_ext}")
+
+    def _legacy_path(self, session_id: str) -> str:
+        return os.path.join(self.base_dir, f"{session_id}{self.legacy_ext}")
+
+    def _is_session_file(self, file_name: str) -> bool:
+        return file_name.endswith((self.journal_ext, self.legacy_ext))
+
+    def _session_exists(self, session_id: str) -> bool:
+        if (os.path.exists(self._journal_path(session_id))
+                or os.path.exists(self._legacy_path(session_id))):
+            return True
+        month = self._archive_month(session_id)
+        return month is not None and self.archive.stamp(month) is not None
+
+    def _archive_month(self, session_id: str) -> Optional[str]:
+        summary = self.manifest.get(session_id)
+        return summary.archive if summary else None
+
+    def _archived_in(self, month: str) -> Set[str]:
+        return {summary.id for summary in self.manifest.list() if summary.archive == month}
+
+    def _unarchive(self, session_id: str):
+        """Drop a session's archived copy, if it has one."""
+        month = self._archive_month(session_id)
+        if not month:
+            return
+        self.archive.rewrite(month, {}, self._archived_in(month) - {session_id})
+        self.manifest.set_archive(session_id, None)
+
+    def _scan_sessions(self) -> Iterator[Tuple[ChatSession, Optional[str]]]:
+        """Yield every stored session with the month it is archived in, if any."""
+        seen = set()
+        for file in os.listdir(self.base_dir):
+            if not self._is_session_file(file):
+                continue
+            try:
+                session = self.load_session(os.path.splitext(file)[0])
+            except Exception as e:
+                print(f"Error reading session file {file}: {str(e)}")
+                continue
+            if session and session.id not in seen:
+                seen.add(session.id)
+                yield session, None
+
+        try:
+            members = list(self.archive.members())
+        except Exception as e:
+            print(f"Error reading chat archive: {str(e)}")
+            return
+        for month, session_id, data in members:
+            # A journal on disk is newer than any archived copy.
+            if session_id in seen:
+                continue
+            session = self._parse_journal(data.split(b'\n'))
+            if session:
+                seen.add(session_id)
+                yield session, month
+
+    def _header_record(self, session: ChatSession) -> dict:
+        return {
+            'type': 'session',
+            'version': JOURNAL_VERSION,
+            'id': session.id,
+            'created_at': session.created_at.isoformat(),
+            'updated_at': session.updated_at.isoformat(),
+            'message_count': len(session.messages),
+            'metadata': session.metadata
+        }
+
+    def _append_line(self, file_path: str, line: bytes):
+        with open(file_path, 'ab+') as f:
+            # If a previous append was interrupted the file may not end on a
+            # record boundary; start a new line so this record stays intact.
+            if f.tell() > 0:
+                f.seek(-1, os.SEEK_END)
+                if f.read(1) != b'\n':
+                    line = b'\n' + line
+            f.write(line)
+        self._unsynced.add(file_path)
+
+    def _save_session(self, session: ChatSession):
+        """Write the whole session as a journal, replacing any older copy.
+
+        The new copy is written to a temporary file and fsynced before it is
+        renamed over the old one, so a crash leaves one or the other intact.
+        """
+        file_path = self._journal_path(session.id)
+        tmp_path = f"{file_path}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(self._journal_bytes(session))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, file_path)
+        self._unsynced.discard(file_path)
+        self._dead_bytes.pop(session.id, None)
+
+        legacy_path = self._legacy_path(session.id)
+        if os.path.exists(legacy_path):
+            os.remove(legacy_path)
+
+    def _journal_bytes(self, session: ChatSession) -> bytes:
+        header = json.dumps(self._header_record(session)).encode('utf-8') + b'\n'
+        return header + b''.join(encode_message(msg) for msg in session.messages)
+
+    def _message_lines(self, file_path: str) -> Iterator[bytes]:
+        with open(file_path, 'rb') as f:
+            for line in f:
+                line = line.rstrip(b'\n')
+                if is_message_line(line):
+                    yield line
+
+    def _message_lines_reverse(self, file_path: str) -> Iterator[bytes]:
+        """Yield message lines from the end of the file towards the start."""
+        with open(file_path, 'rb') as f:
+            position = f.seek(0, os.SEEK_END)
+            remainder = b''
+            while position > 0:
+                size = min(READ_BLOCK_SIZE, position)
+                position -= size
+                f.seek(position)
+                lines = (f.read(size) + remainder).split(b'\n')
+                remainder = lines.pop(0)
+                for line in reversed(lines):
+                    if is_message_line(line):
+                        yield line
+            if is_message_line(remainder):
+                yield remainder
+
+    def _load_journal(self, file_path: str) -> Optional[ChatSession]:
+        with open(file_path, 'rb') as f:
+            return self._parse_journal(f)
+
+    def _parse_journal(self, journal_lines: Iterable[bytes]) -> Optional[ChatSession]:
+        header = None
+        lines = []
+        metadata_updates = []
+        for line in journal_lines:
+            line = line.rstrip(b'\n')
+            if is_message_line(line):
+                lines.append(line)
+            elif line.startswith(HEADER_LINE_PREFIX):
+                try:
+                    header = json.loads(line)
+                except json.JSONDecodeError:
+                    # Torn header from an interrupted rewrite.
+                    continue
+            elif line.startswith(METADATA_LINE_PREFIX):
+                try:
+                    metadata_updates.append(json.loads(line)['values'])
+                except (json.JSONDecodeError, KeyError):
+                    continue
+        if not header:
+            return None
+
+        metadata = header.get('metadata', {})
+        for values in metadata_updates:
+            metadata.update(values)
+
+        messages = decode_message_lines(lines)
+        updated_at = datetime.fromisoformat(header['updated_at'])
+        if messages:
+            updated_at = max(updated_at, messages[-1].timestamp)
+        return ChatSession(
+            id=header['id'],
+            messages=messages,
+            created_at=datetime.fromisoformat(header['created_at']),
+            updated_at=updated_at,
+            metadata=metadata
+        )
+
+    def _load_legacy(self, file_path: str) -> ChatSession:
+        with open(file_path, 'r') as f:
+            data = json.load(f)
+            return ChatSession(
+                id=data['id'],
+                messages=[
+                    ChatMessage(
+                        id=msg['id'],
+                        role=ROLE_BY_VALUE[msg['role']],
+                        content=msg['content'],
+                        created=datetime.fromisoformat(msg['timestamp']).timestamp()
+                    )
+                    for msg in data['messages']
+                ],
+                created_at=datetime.fromisoformat(data['created_at']),
+                updated_at=datetime.fromisoformat(data['updated_at'])
+            )
@@ -0,0 +1,183 @@
+import os
+import json
+import time
+import threading
+from collections import deque
+from dataclasses import asdict, fields
+from typing import Dict, List, Optional
+import openai
+from app.models.llm_metrics import RequestMetric
+from app.services.request_control import RequestCancelled
+from app.config.openai_config import OPENAI_CONFIG
+
+def percentile(values: List[float], fraction: float) -> Optional[float]:
+    """Nearest-rank percentile; None for no values."""
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, max(0, round(fraction * len(values)) - 1))]
+
+class RequestTimer:
+    """Measures one request; handed to the scheduler as its ``trace``."""
+
+    def __init__(self, metrics: 'LLMMetricsService', model: str, streamed: bool):
+        self.metrics = metrics
+        self.metric = RequestMetric(started=time.time(), model=model, streamed=streamed)
+        self._started = time.perf_counter()
+        self._done = False
+
+    def sent(self, attempt: int):
+        """Called by the scheduler right before each attempt goes out."""
+        self.metric.attempts = attempt
+        self.metric.queue_seconds = time.perf_counter() - self._started
+
+    def first_token(self):
+        if self.metric.ttft_seconds is None:
+            self.metric.ttft_seconds = time.perf_counter() - self._started
+
+    def set_usage(self, usage):
+        if usage is not None:
+            self.metric.prompt_tokens = usage.prompt_tokens
+            self.metric.completion_tokens = usage.completion_tokens
+
+    def finish(self, error: Optional[BaseException] = None):
+        """Record the request once; later calls are ignored."""
+        if self._done:
+            return
+        self._done = True
+        self.metric.latency_seconds = time.perf_counter() - self._started
+        if isinstance(error, (GeneratorExit, RequestCancelled)):
+            self.metric.outcome = "cancelled"
+        elif isinstance(error, openai.RateLimitError):
+            self.metric.outcome = "rate_limited"
+        elif error is not None:
+            self.metric.outcome = "error"
+        if self.metric.outcome in ("error", "rate_limited"):
+            self.metric.error = str(error)[:200]
+        self.metrics.record(self.metric)
+
+class LLMMetricsService:
+    """Local store of per-request API telemetry.
+
+    Every record is appended to a JSON lines file; the most recent
+    ``window`` records of each model are kept in memory (and reloaded on
+    start-up) for the rolling aggregates returned by ``summary()``. The
+    file is trimmed back to the in-memory records once it holds more than
+    ``max_file_records`` lines.
+    """
+
+    _shared = None
+    _shared_lock = threading.Lock()
+
+    def __init__(self, config: Optional[dict] = None):
+        self.config = config or OPENAI_CONFIG["metrics"]
+        self.path = os.path.expanduser(self.config["file"])
+        self._lock = threading.Lock()
+        self._by_model: Dict[str, deque] = {}
+        self._file_records = 0
+        if self.config["enabled"]:
+            self._load()
+
+    @classmethod
+    def shared(cls) -> 'LLMMetricsService':
+        """The store every service records into."""
+        with cls._shared_lock:
+            if cls._shared is None:
+                cls._shared = cls()
+            return cls._shared
+
+    def start(self, model: str, streamed: bool = False) -> RequestTimer:
+        return RequestTimer(self, model, streamed)
+
+    def record(self, metric: RequestMetric):
+        if not self.config["enabled"]:
+            return
+        with self._lock:
+            self._remember(metric)
+            try:
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+                with open(self.path, 'a', encoding='utf-8') as f:
+                    f.write(json.dumps(asdict(metric)) + '\n')
+                self._file_records += 1
+                if self._file_records > self.config["max_file_records"]:
+                    self._trim()
+            except OSError as e:
+                print(f"Error recording request metrics: {str(e)}")
+
+    def recent(self, model: Optional[str] = None, limit: int = 100) -> List[RequestMetric]:
+        """The latest records, newest first."""
+        with self._lock:
+            records = (list(self._by_model.get(model, ())) if model
+                       else [metric for records in self._by_model.values() for metric in records])
+        records.sort(key=lambda metric: metric.started, reverse=True)
+        return records[:limit]
+
+    def summary(self) -> Dict[str, dict]:
+        """Rolling aggregates per model over its most recent ``window`` requests."""
+        with self._lock:
+            snapshot = {model: list(records) for model, records in self._by_model.items()}
+        return {model: self._aggregate(records) for model, records in sorted(snapshot.items())}
+
+    def clear(self):
+        with self._lock:
+            self._by_model.clear()
+            self._file_records = 0
+            try:
+                os.remove(self.path)
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                print(f"Error clearing request metrics: {str(e)}")
+
+    def _aggregate(self, records: List[RequestMetric]) -> dict:
+        ok = [metric for metric in records if metric.outcome == "ok"]
+        latencies = [metric.latency_seconds for metric in ok]
+        ttfts = [metric.ttft_seconds for metric in ok if metric.ttft_seconds is not None]
+        queues = [metric.queue_seconds for metric in ok if metric.queue_seconds is not None]
+        speeds = [metric.tokens_per_second for metric in ok if metric.tokens_per_second]
+        return {
+            'requests': len(records),
+            'errors': sum(metric.outcome in ("error", "rate_limited") for metric in records),
+            'rate_limited': sum(metric.outcome == "rate_limited" for metric in records),
+            'latency_p50': percentile(latencies, 0.50),
+            'latency_p95': percentile(latencies, 0.95),
+            'ttft_p50': percentile(ttfts, 0.50),
+            'ttft_p95': percentile(ttfts, 0.95),
+            'queue_p50': percentile(queues, 0.50),
+            'queue_p95': percentile(queues, 0.95),
+            'tokens_per_second_p50': percentile(speeds, 0.50),
+            'prompt_tokens': sum(metric.prompt_tokens or 0 for metric in records),
+            'completion_tokens': sum(metric.completion_tokens or 0 for metric in records),
+        }
+
+    def _remember(self, metric: RequestMetric):
+        records = self._by_model.get(metric.model)
+        if records is None:
+            records = self._by_model[metric.model] = deque(maxlen=self.config["window"])
+        records.append(metric)
+
+    def _load(self):
+        names = {field.name for field in fields(RequestMetric)}
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        values = json.loads(line)
+                        self._remember(RequestMetric(**{k: v for k, v in values.items() if k in names}))
+                    except (ValueError, TypeError):
+                        continue  # A torn last line after a crash
+                    self._file_records += 1
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            print(f"Error loading request metrics: {str(e)}")
+
+    def _trim(self):
+        records = sorted((metric for records in self._by_model.values() for metric in records),
+                         key=lambda metric: metric.started)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            for metric in records:
+                f.write(json.dumps(asdict(metric)) + '\n')
+        os.replace(tmp_path, self.path)
+        self._file_records = len(records)
@@ -0,0 +1,151 @@
+import os
+import json
+import time
+import threading
+from typing import Dict, List, Optional
+from app.models.model_catalog import ModelCapabilities
+from app.services.openai_client_provider import OpenAIClientProvider
+from app.services.request_executor import RequestExecutor, RequestJob
+from app.services.request_scheduler import RequestScheduler
+from app.config.openai_config import OPENAI_CONFIG
+
+# Scheduler key of the list request; no model's limits match it, so the
+# default ones pace it.
+LIST_MODELS = "models.list"
+
+class ModelCatalogService:
+    """The chat models the account offers, cached on disk, and what each accepts.
+
+    The list is fetched with ``models.list()`` and saved with its fetch time
+    and API base URL to ``model_catalog["file"]``; ``refresh_if_stale``
+    refetches it in the background once it is older than ``ttl_seconds``
+    or was fetched from another server. Capabilities (context window and
+    parameter rules) come from OPENAI_CONFIG and are resolved once per model.
+    """
+
+    _shared = None
+    _shared_lock = threading.Lock()
+
+    def __init__(self, config: Optional[dict] = None):
+        self.config = config or OPENAI_CONFIG["model_catalog"]
+        self.path = os.path.expanduser(self.config["file"])
+        self._lock = threading.Lock()
+        self._models: List[dict] = []
+        self.fetched_at: Optional[float] = None
+        self.base_url: Optional[str] = None
+        self._capabilities: Dict[str, ModelCapabilities] = {}
+        self._refresh_job = None
+        self._load()
+
+    @classmethod
+    def shared(cls) -> 'ModelCatalogService':
+        with cls._shared_lock:
+            if cls._shared is None:
+                cls._shared = cls()
+            return cls._shared
+
+    def models(self) -> List[dict]:
+        """``{"id", "name", "description"}`` of every cached chat model."""
+        with self._lock:
+            return list(self._models)
+
+    def is_stale(self, base_url: Optional[str] = None) -> bool:
+        return (self.fetched_at is None or (base_url or None) != self.base_url
+                or time.time() - self.fetched_at > self.config["ttl_seconds"])
+
+    def refresh(self, api_key: str, base_url: Optional[str] = None) -> List[dict]:
+        """Fetch the model list now and save it; raises on API errors.
+
+        The credentials may be unsaved ones from the Settings tab, so the
+        shared client is only used if it already has them.
+        """
+        with OpenAIClientProvider.client_for(api_key, base_url) as client:
+            raw = RequestScheduler.shared().execute(
+                LIST_MODELS, 0, lambda: client.models.with_raw_response.list()
+            )
+            models = [self._describe(model.id) for model in raw.parse().data
+                      if self._is_chat_model(model.id)]
+        models.sort(key=lambda model: model['id'])
+        with self._lock:
+            self._models = models
+            self.fetched_at = time.time()
+            self.base_url = base_url or None
+            self._save()
+        return list(models)
+
+    def refresh_async(self, api_key: str, base_url: Optional[str] = None) -> RequestJob:
+        """Run ``refresh`` on the request executor; the models arrive as ``result``."""
+        return RequestExecutor.shared().submit(self.refresh, api_key, base_url)
+
+    def refresh_if_stale(self, api_key: Optional[str], base_url: Optional[str] = None):
+        """Start a background refresh unless the cache is fresh or one is running."""
+        if not api_key or not self.is_stale(base_url) or self._refresh_job is not None:
+            return None
+        job = self.refresh_async(api_key, base_url)
+        job.signals.error.connect(lambda error: print(f"Error refreshing model catalog: {error}"))
+        job.signals.finished.connect(self._on_refresh_finished)
+        self._refresh_job = job
+        return job
+
+    def description(self, model_id: str) -> str:
+        return OPENAI_CONFIG["model_descriptions"].get(model_id, self.config["default_description"])
+
+    def capabilities(self, model: str) -> ModelCapabilities:
+        capabilities = self._capabilities.get(model)
+        if capabilities is None:
+            capabilities = self._capabilities[model] = self._resolve(model)
+        return capabilities
+
+    def _on_refresh_finished(self):
+        self._refresh_job = None
+
+    def _resolve(self, model: str) -> ModelCapabilities:
+        table = self.config["capabilities"]
+        matches = [prefix for prefix in table if model.startswith(prefix)]
+        entry = table[max(matches, key=len)] if matches else self.config["default_capabilities"]
+        rules = OPENAI_CONFIG["model_specific_settings"][entry["family"]]
+        return ModelCapabilities(
+            model=model,
+            family=entry["family"],
+            context_window=entry["context_window"],
+            supported_params=list(rules["supported_params"]),
+            fixed_params=dict(rules.get("default_values", {})),
+            param_mapping=dict(rules.get("param_mapping", {})),
+            streaming=rules.get("streaming", True),
+            system_role=rules.get("system_role", True)
+        )
+
+    def _is_chat_model(self, model_id: str) -> bool:
+        lowered = model_id.lower()
+        return (model_id.startswith(tuple(self.config["include_prefixes"]))
+                and not any(term in lowered for term in self.config["excluded_terms"]))
+
+    def _describe(self, model_id: str) -> dict:
+        return {
+            'id': model_id,
+            'name': model_id.replace('-', ' ').title(),
+            'description': self.description(model_id)
+        }
+
+    def _load(self):
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            self._models = data['models']
+            self.fetched_at = data['fetched_at']
+            self.base_url = data.get('base_url')
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError, KeyError) as e:
+            print(f"Error loading model catalog: {str(e)}")
+
+    def _save(self):
+        tmp_path = f"{self.path}.tmp"
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({'fetched_at': self.fetched_at, 'base_url': self.base_url,
+                           'models': self._models}, f, indent=2)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            print(f"Error saving model catalog: {str(e)}")
@@ -0,0 +1,88 @@
+import threading
+from contextlib import contextmanager
+from typing import Iterator, Optional
+import openai
+from app.config.openai_config import OPENAI_CONFIG
+
+# The HTTP library's Limits class, taken from openai so that whichever
+# library openai is built on (httpx or httpx2) is used.
+Limits = type(openai.DEFAULT_CONNECTION_LIMITS)
+
+class OpenAIClientProvider:
+    """Process-wide OpenAI client shared by every service.
+
+    All requests go through one HTTP connection pool, so connections (and
+    their TLS sessions) are reused across services and requests. The
+    client is only rebuilt when the API key or base URL changes; the old
+    one is left for in-flight requests to finish with and is then
+    garbage collected.
+    """
+
+    _lock = threading.Lock()
+    _client: Optional[openai.OpenAI] = None
+    _api_key: Optional[str] = None
+    _base_url: Optional[str] = None
+
+    @classmethod
+    def get_client(cls, api_key: str, base_url: Optional[str] = None) -> openai.OpenAI:
+        with cls._lock:
+            if cls._client is None or api_key != cls._api_key or base_url != cls._base_url:
+                cls._client = cls._create_client(api_key, base_url)
+                cls._api_key = api_key
+                cls._base_url = base_url
+            return cls._client
+
+    @classmethod
+    @contextmanager
+    def client_for(cls, api_key: str, base_url: Optional[str] = None) -> Iterator[openai.OpenAI]:
+        """The shared client if it uses these credentials, else a client closed after use.
+
+        For credentials that may not be saved yet, such as those typed into
+        the Settings tab: unlike ``get_client`` this never replaces the
+        shared client and its connection pool.
+        """
+        with cls._lock:
+            if cls._client is not None and api_key == cls._api_key and base_url == cls._base_url:
+                client = cls._client
+            else:
+                client = None
+        if client is not None:
+            yield client
+            return
+        client = cls._create_client(api_key, base_url)
+        try:
+            yield client
+        finally:
+            client.close()
+
+    @classmethod
+    def reset(cls):
+        """Drop the shared client, e.g. after the API key was removed."""
+        with cls._lock:
+            cls._client = None
+            cls._api_key = None
+            cls._base_url = None
+
+    @classmethod
+    def _create_client(cls, api_key: str, base_url: Optional[str]) -> openai.OpenAI:
+        config = OPENAI_CONFIG["client"]
+        timeouts = config["timeouts"]
+        http_client = openai.DefaultHttpxClient(
+            limits=Limits(
+                max_connections=config["max_connections"],
+                max_keepalive_connections=config["max_keepalive_connections"],
+                keepalive_expiry=config["keepalive_expiry"]
+            ),
+            timeout=openai.Timeout(
+                timeouts["read"],
+                connect=timeouts["connect"],
+                write=timeouts["write"],
+                pool=timeouts["pool"]
+            )
+        )
+        return openai.OpenAI(
+            api_key=api_key,
+            base_url=base_url or None,
+            http_client=http_client,
+            max_retries=config["max_retries"]
+        )
@@ -1,17 +1,32 @@
-import openai
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Iterator, Optional
 from app.services.settings_manager import SettingsManager
-from app.config.openai_config import OPENAI_CONFIG
+from app.services.openai_client_provider import OpenAIClientProvider
+from app.services.request_scheduler import RequestScheduler
+from app.services.llm_metrics_service import LLMMetricsService
+from app.services.model_catalog_service import ModelCatalogService
+from app.services.response_cache_service import ResponseCacheService
+from app.services.request_control import CancelToken, RequestCancelled, SingleFlight
 
 class OpenAIService:
-    """Service for handling OpenAI API interactions."""
+    """Service for handling OpenAI API interactions.
+
+    The request parameters and client are kept up to date by a
+    subscription to the ``openai`` settings rather than re-read per call.
+    """
+
+    # Completion requests in flight, shared by every instance.
+    in_flight = SingleFlight()
 
     def __init__(self, settings_manager: SettingsManager):
         self.settings_manager = settings_manager
         self.api_key = None
         self.client = None
         self.available_models = []
+        self.scheduler = RequestScheduler.shared()
+        self.metrics = LLMMetricsService.shared()
+        self.catalog = ModelCatalogService.shared()
         self.current_settings = self._load_settings()
+        self.settings_manager.subscribe("openai", self._on_settings_changed)
 
     def initialize(self, api_key: str = None) -> bool:
         if api_key is None:
@@ -21,7 +36,9 @@ class OpenAIService:
         
         try:
             self.api_key = api_key
-            self.client = openai.OpenAI(api_key=api_key)
+            # An OpenAI-compatible server, e.g. benchmarks/mock_openai_server.py
+            base_url = self.settings_manager.typed.openai.base_url or None
+            self.client = OpenAIClientProvider.get_client(api_key, base_url)
             return True
         except Exception as e:
             print(f"Failed to initialize OpenAI client: {e}")
@@ -32,54 +49,158 @@ class OpenAIService:
     def is_initialized(self) -> bool:
         return self.client is not None
 
-    def get_chat_completion(self, messages: List[Dict[str, str]], model: Optional[str] = None) -> str:
+    @property
+    def model(self) -> str:
+        """The model selected in the settings."""
+        return self.current_settings['model']
+
+    def _on_settings_changed(self, key: str):
+        if key in ("openai", "openai.api_key", "openai.base_url"):
+            # Keep a key passed to initialize() when none is stored.
+            self.initialize(self.settings_manager.get("openai.api_key") or self.api_key)
+        if key != "openai.api_key":
+            self.current_settings = self._load_settings()
+
+    def get_chat_completion(self, messages: List[Dict[str, str]], model: Optional[str] = None,
+                            cancel_token: Optional[CancelToken] = None) -> str:
+        """Return the completion text, or None if the request failed.
+
+        Identical requests made while one is in flight share its result.
+        With a ``cancel_token`` the completion is streamed internally, so
+        that cancelling closes the connection and stops the generation;
+        a cancelled request raises ``RequestCancelled``.
+        """
         if not self.is_initialized():
             raise ValueError("OpenAI client not initialized")
 
+        settings = self.request_settings(model)
+        key = ResponseCacheService.make_key(messages, settings)
         try:
-            settings = self.current_settings.copy()
-            if model:
-                settings['model'] = model
-
-            if settings['model'].startswith('o1'):
-                o1_config = OPENAI_CONFIG["model_specific_settings"]["o1"]
-                settings.update(o1_config.get("default_values", {}))
-                supported_params = o1_config["supported_params"]
-                settings = {k: v for k, v in settings.items() if k in supported_params or k == 'model'}
-                if 'max_tokens' in settings:
-                    settings['max_completion_tokens'] = settings.pop('max_tokens')
-
-            response = self.client.chat.completions.create(
-                messages=messages,
-                **settings
+            return self.in_flight.do(
+                key,
+                lambda token: self._complete(messages, settings, token if cancel_token else None),
+                cancel_token
             )
-            return response.choices[0].message.content
+        except RequestCancelled:
+            raise
         except Exception as e:
             print(f"Error getting chat completion: {e}")
             return None
 
+    def stream_chat_completion(self, messages: List[Dict[str, str]], model: Optional[str] = None,
+                               cancel_token: Optional[CancelToken] = None) -> Iterator[str]:
+        """Yield the completion text piece by piece as the API produces it.
+
+        Models that cannot stream yield the whole completion at once.
+        Errors are raised to the caller, which may already have shown part
+        of the response. Once ``cancel_token`` is cancelled the stream is
+        closed and ``RequestCancelled`` is raised.
+        """
+        if not self.is_initialized():
+            raise ValueError("OpenAI client not initialized")
+
+        settings = self.request_settings(model)
+        if not self.supports_streaming(settings['model']):
+            content = self._complete(messages, settings, cancel_token)
+            if content:
+                yield content
+            return
+        yield from self._stream(messages, settings, cancel_token)
+
+    def _complete(self, messages: List[Dict[str, str]], settings: Dict[str, Any],
+                  cancel_token: Optional[CancelToken] = None) -> str:
+        if cancel_token is not None and self.supports_streaming(settings['model']):
+            return "".join(self._stream(messages, settings, cancel_token))
+
+        timer = self.metrics.start(settings['model'])
+        reserved = self.scheduler.estimate_tokens(messages, settings)
+        try:
+            response = self._create_completion(messages, settings, reserved, timer, cancel_token)
+            self.scheduler.settle(settings['model'], reserved, response.usage)
+            # A request that cannot be aborted midway is still discarded.
+            if cancel_token is not None:
+                cancel_token.check()
+        except BaseException as e:
+            timer.finish(e)
+            raise
+        timer.set_usage(response.usage)
+        timer.finish()
+        return response.choices[0].message.content
+
+    def _stream(self, messages: List[Dict[str, str]], settings: Dict[str, Any],
+                cancel_token: Optional[CancelToken] = None) -> Iterator[str]:
+        timer = self.metrics.start(settings['model'], True)
+        reserved = self.scheduler.estimate_tokens(messages, settings)
+        try:
+            # Only opening the stream is retried; a reply cut off midway is not.
+            stream = self._create_completion(messages, settings, reserved, timer, cancel_token,
+                                             stream=True)
+            settled = False
+            received = 0
+            try:
+                for chunk in stream:
+                    if cancel_token is not None:
+                        cancel_token.check()
+                    # The last chunk carries only the token usage.
+                    if chunk.usage:
+                        timer.set_usage(chunk.usage)
+                        settled = self.scheduler.settle(settings['model'], reserved, chunk.usage)
+                    if chunk.choices and chunk.choices[0].delta.content:
+                        timer.first_token()
+                        received += len(chunk.choices[0].delta.content)
+                        yield chunk.choices[0].delta.content
+            finally:
+                stream.close()
+                if not settled:
+                    # Cut off before the usage arrived: charge the prompt and what was received.
+                    used = self.scheduler.estimate_tokens(messages, {}) + (received + 3) // 4
+                    self.scheduler.refund(settings['model'], reserved - used)
+            timer.finish()
+        except BaseException as e:  # Including GeneratorExit when the caller stops reading
+            timer.finish(e)
+            raise
+
+    def _create_completion(self, messages: List[Dict[str, str]], settings: Dict[str, Any],
+                           reserved: int, timer=None, cancel_token: Optional[CancelToken] = None,
+                           stream: bool = False):
+        """Send a completion request through the scheduler and parse the response."""
+        extra = {'stream': True, 'stream_options': {'include_usage': True}} if stream else {}
+        raw = self.scheduler.execute(
+            settings['model'],
+            reserved,
+            lambda: self.client.chat.completions.with_raw_response.create(
+                messages=messages, **extra, **settings
+            ),
+            trace=timer,
+            cancel_token=cancel_token
+        )
+        return raw.parse()
+
+    def supports_streaming(self, model: str) -> bool:
+        return self.catalog.capabilities(model).streaming
+
+    def request_settings(self, model: Optional[str] = None) -> Dict[str, Any]:
+        """The API parameters a completion request for ``model`` is sent with."""
+        settings = self.current_settings.copy()
+        if model:
+            settings['model'] = model
+
+        capabilities = self.catalog.capabilities(settings['model'])
+        settings.update(capabilities.fixed_params)
+        for name, model_name in capabilities.param_mapping.items():
+            if name in settings:
+                settings[model_name] = settings.pop(name)
+        return {k: v for k, v in settings.items()
+                if k == 'model' or k in capabilities.supported_params}
+
     def _load_settings(self) -> Dict[str, Any]:
-        openai_settings = self.settings_manager.get('openai', {})
-        if not openai_settings:
-            openai_settings = OPENAI_CONFIG["default_settings"]
-            self.settings_manager.set('openai', openai_settings)
-        
-        model = openai_settings.get('model', 'gpt-4')
-        
-        base_settings = {'model': model}
-        
-        if model.startswith('o1'):
-            base_settings.update({
-                'temperature': 1,
-                'max_completion_tokens': openai_settings.get('max_tokens', 4000)
-            })
-        else:
-            base_settings.update({
-                'temperature': openai_settings.get('temperature', 0.7),
-                'max_tokens': openai_settings.get('max_tokens', 4000),
-                'top_p': openai_settings.get('top_p', 1.0),
-                'frequency_penalty': openai_settings.get('frequency_penalty', 0.0),
-                'presence_penalty': openai_settings.get('presence_penalty', 0.0)
-            })
-        
-        return base_settings
+        openai_settings = self.settings_manager.typed.openai
+        # Model-specific rules are applied per request by request_settings.
+        return {
+            'model': openai_settings.model,
+            'temperature': openai_settings.temperature,
+            'max_tokens': openai_settings.max_tokens,
+            'top_p': openai_settings.top_p,
+            'frequency_penalty': openai_settings.frequency_penalty,
+            'presence_penalty': openai_settings.presence_penalty
+        }
@@ -0,0 +1,129 @@
+import threading
+from typing import Any, Callable, Dict, List, Optional
+
+class RequestCancelled(Exception):
+    """Raised in the thread running a request once its caller has cancelled it."""
+
+    def __init__(self, message: str = "Request cancelled"):
+        super().__init__(message)
+
+class CancelToken:
+    """Set by the caller to abandon a request; checked by the code running it."""
+
+    def __init__(self):
+        self._event = threading.Event()
+        self._lock = threading.Lock()
+        self._callbacks: List[Callable[[], None]] = []
+
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set()
+
+    def cancel(self):
+        with self._lock:
+            if self._event.is_set():
+                return
+            self._event.set()
+            callbacks, self._callbacks = self._callbacks, []
+        for callback in callbacks:
+            callback()
+
+    def on_cancel(self, callback: Callable[[], None]):
+        """Call ``callback`` on cancellation; at once if already cancelled."""
+        with self._lock:
+            if not self._event.is_set():
+                self._callbacks.append(callback)
+                return
+        callback()
+
+    def check(self):
+        if self._event.is_set():
+            raise RequestCancelled()
+
+    def wait(self, seconds: float):
+        """Sleep up to ``seconds``, raising ``RequestCancelled`` if cancelled meanwhile."""
+        if self._event.wait(seconds):
+            raise RequestCancelled()
+
+class _Flight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.token = CancelToken()
+        self.waiters = 0
+        # Events of the callers waiting with a cancel token, set when done.
+        self.wakers: List[threading.Event] = []
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+
+class SingleFlight:
+    """Coalesces identical concurrent calls into one.
+
+    The first caller for a key starts the call; callers arriving while it
+    runs wait for and share its result or error. A caller that cancels its
+    token stops waiting at once, the first one included: when it has a
+    token, the call runs on a thread of its own. The call is given a token
+    that is cancelled only once every caller waiting on it has cancelled,
+    so one caller giving up does not abort the request for the others.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._flights: Dict[str, _Flight] = {}
+
+    def do(self, key: str, call: Callable[[CancelToken], Any],
+           cancel_token: Optional[CancelToken] = None) -> Any:
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+            flight.waiters += 1
+
+        if leader and cancel_token is None:
+            # This caller cannot leave early; run the call on its thread.
+            self._run(key, flight, call)
+        else:
+            if leader:
+                threading.Thread(target=self._run, args=(key, flight, call),
+                                 name="single-flight", daemon=True).start()
+            if cancel_token is None:
+                flight.done.wait()
+            else:
+                woken = threading.Event()
+                with self._lock:
+                    if flight.done.is_set():
+                        woken.set()
+                    else:
+                        flight.wakers.append(woken)
+                cancel_token.on_cancel(lambda: self._leave(flight, woken))
+                woken.wait()
+                cancel_token.check()
+
+        if flight.error is not None:
+            raise flight.error
+        return flight.result
+
+    def _run(self, key: str, flight: _Flight, call: Callable[[CancelToken], Any]):
+        try:
+            flight.result = call(flight.token)
+        except BaseException as e:
+            flight.error = e
+        finally:
+            with self._lock:
+                self._flights.pop(key, None)
+                flight.done.set()
+                wakers, flight.wakers = flight.wakers, []
+            for woken in wakers:
+                woken.set()
+
+    def in_flight(self) -> int:
+        with self._lock:
+            return len(self._flights)
+
+    def _leave(self, flight: _Flight, woken: threading.Event):
+        with self._lock:
+            flight.waiters -= 1
+            abandoned = flight.waiters == 0 and not flight.done.is_set()
+        woken.set()
+        if abandoned:
+            flight.token.cancel()
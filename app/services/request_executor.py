@@ -0,0 +1,123 @@
+from typing import Callable, Optional, Set
+from PyQt6.QtCore import QObject, QRunnable, QThreadPool, pyqtSignal
+from app.config.openai_config import OPENAI_CONFIG
+from app.services.request_control import CancelToken, RequestCancelled
+
+class RequestSignals(QObject):
+    """Signals of one job; delivered on the thread that owns the receiver."""
+    progress = pyqtSignal(object)
+    result = pyqtSignal(object)
+    error = pyqtSignal(str)
+    cancelled = pyqtSignal()
+    finished = pyqtSignal()
+
+class RequestJob(QRunnable):
+    """Runs a blocking call on a pool thread and reports through signals.
+
+    With ``stream=True`` the call must return an iterable; every item is
+    emitted through ``progress`` and the list of items through ``result``.
+    ``cancel()`` stops the job: the call is skipped if it has not started,
+    and a running call sees its ``cancel_token`` cancelled. A cancelled job
+    emits ``cancelled`` instead of ``result`` or ``error``. ``finished`` is
+    emitted last.
+    """
+
+    def __init__(self, fn: Callable, *args, stream: bool = False, **kwargs):
+        super().__init__()
+        self.setAutoDelete(False)
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        self.stream = stream
+        self.cancel_token = CancelToken()
+        self.signals = RequestSignals()
+
+    def cancel(self):
+        self.cancel_token.cancel()
+
+    def run(self):
+        try:
+            self.cancel_token.check()
+            if self.stream:
+                items = []
+                iterator = self.fn(*self.args, **self.kwargs)
+                try:
+                    for item in iterator:
+                        self.cancel_token.check()
+                        items.append(item)
+                        self.signals.progress.emit(item)
+                finally:
+                    # Stops a generator at once, closing its connection.
+                    if hasattr(iterator, 'close'):
+                        iterator.close()
+                self.signals.result.emit(items)
+            else:
+                result = self.fn(*self.args, **self.kwargs)
+                self.cancel_token.check()
+                self.signals.result.emit(result)
+        except RequestCancelled:
+            self.signals.cancelled.emit()
+        except Exception as e:
+            if self.cancel_token.cancelled:
+                self.signals.cancelled.emit()
+            else:
+                self.signals.error.emit(str(e))
+        finally:
+            self.signals.finished.emit()
+
+class RequestExecutor(QObject):
+    """Thread pool for API requests, so they never block the GUI thread.
+
+    Jobs are kept alive until they have finished and their signals have
+    been delivered; callers connect to ``job.signals`` and may drop the
+    job afterwards.
+    """
+
+    _shared = None
+
+    def __init__(self, max_threads: Optional[int] = None):
+        super().__init__()
+        self.pool = QThreadPool()
+        self.pool.setMaxThreadCount(max_threads or OPENAI_CONFIG["requests"]["max_concurrent"])
+        self._active: Set[RequestJob] = set()
+
+    @classmethod
+    def shared(cls) -> 'RequestExecutor':
+        """The executor used by services that are not given one."""
+        if cls._shared is None:
+            cls._shared = cls()
+        return cls._shared
+
+    def submit(self, fn: Callable, *args, stream: bool = False, cancellable: bool = False,
+               **kwargs) -> RequestJob:
+        """Queue ``fn(*args, **kwargs)``; with ``cancellable`` it is also passed the job's ``cancel_token``."""
+        job = RequestJob(fn, *args, stream=stream, **kwargs)
+        if cancellable:
+            job.kwargs['cancel_token'] = job.cancel_token
+        self._active.add(job)
+        job.signals.finished.connect(lambda: self._active.discard(job))
+        self.pool.start(job)
+        return job
+
+    def active_count(self) -> int:
+        return len(self._active)
+
+    def cancel_all(self):
+        """Cancel every job that has not finished yet."""
+        for job in list(self._active):
+            job.cancel()
+
+    def wait(self, timeout_ms: int = -1) -> bool:
+        """Block until every running job is done; used at shutdown."""
+        return self.pool.waitForDone(timeout_ms)
+
+    def shutdown(self, timeout_ms: Optional[int] = None) -> bool:
+        """Cancel every job and wait up to ``timeout_ms`` for them to stop.
+
+        Returns False if some were still running when the time was up.
+        """
+        self.cancel_all()
+        self.pool.clear()  # Jobs not started yet are dropped.
+        if timeout_ms is None:
+            timeout_ms = OPENAI_CONFIG["requests"]["shutdown_timeout_ms"]
+        return self.wait(timeout_ms)
@@ -0,0 +1,298 @@
+import re
+import time
+import random
+import threading
+from email.utils import parsedate_to_datetime
+from typing import Any, Callable, Dict, List, Mapping, Optional
+import openai
+from app.config.openai_config import OPENAI_CONFIG
+from app.services.request_control import CancelToken
+
+# "1s", "6m0s", "20ms", "1h2m3.5s" as used by the x-ratelimit-reset-* headers.
+DURATION_PART = re.compile(r'(\d+(?:\.\d+)?)(ms|h|m|s)')
+DURATION_UNITS = {'h': 3600.0, 'm': 60.0, 's': 1.0, 'ms': 0.001}
+
+def parse_duration(value: Optional[str]) -> Optional[float]:
+    """Seconds in a rate-limit reset header such as ``"6m0s"``; None if unreadable."""
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    parts = DURATION_PART.findall(value)
+    if not parts or ''.join(number + unit for number, unit in parts) != value:
+        return None
+    return sum(float(number) * DURATION_UNITS[unit] for number, unit in parts)
+
+def retry_after(headers: Optional[Mapping[str, str]]) -> Optional[float]:
+    """Seconds the server asks us to wait before retrying, if it says."""
+    if not headers:
+        return None
+    milliseconds = headers.get('retry-after-ms')
+    if milliseconds:
+        try:
+            return float(milliseconds) / 1000
+        except ValueError:
+            pass
+    value = headers.get('retry-after')
+    if value:
+        try:
+            return float(value)
+        except ValueError:
+            try:
+                return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+            except (TypeError, ValueError):
+                pass
+    resets = [parse_duration(headers.get(name))
+              for name in ('x-ratelimit-reset-requests', 'x-ratelimit-reset-tokens')]
+    resets = [reset for reset in resets if reset is not None]
+    return max(resets) if resets else None
+
+class TokenBucket:
+    """Refills at ``per_minute`` units a minute, holding at most one minute's worth.
+
+    A limit of 0 (or None) turns the bucket off: only pauses hold requests back.
+    """
+
+    def __init__(self, per_minute: Optional[float]):
+        if per_minute is not None and per_minute < 0:
+            raise ValueError(f"Rate limit must not be negative: {per_minute}")
+        self.limited = bool(per_minute)
+        self.capacity = float(per_minute or 0)
+        self.rate = self.capacity / 60.0
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self, amount: float = 1.0, cancel_token: Optional[CancelToken] = None):
+        """Block until ``amount`` units are available and take them."""
+        # A request larger than the whole bucket waits for a full bucket.
+        amount = min(amount, self.capacity)
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                wait = self.paused_until - now
+                if wait <= 0:
+                    if not self.limited:
+                        return
+                    if self.tokens >= amount:
+                        self.tokens -= amount
+                        return
+                    wait = (amount - self.tokens) / self.rate
+            if cancel_token is not None:
+                cancel_token.wait(wait)
+            else:
+                time.sleep(wait)
+
+    def pause(self, seconds: float):
+        """Hold back every request for ``seconds``, e.g. after a 429."""
+        with self._lock:
+            self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+    def adjust(self, amount: float):
+        """Take ``amount`` more units (or give back a negative amount) after the fact."""
+        with self._lock:
+            self._refill(time.monotonic())
+            self.tokens = min(self.capacity, self.tokens - amount)
+
+    def drain(self):
+        """The server says the limit is used up; start refilling from empty."""
+        with self._lock:
+            self._refill(time.monotonic())
+            self.tokens = 0.0
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+class ModelLimits:
+    """The request and token buckets of one model."""
+
+    def __init__(self, limits: Dict[str, int]):
+        self.requests = TokenBucket(limits['requests_per_minute'])
+        self.tokens = TokenBucket(limits['tokens_per_minute'])
+
+    def acquire(self, tokens: int, cancel_token: Optional[CancelToken] = None):
+        self.requests.acquire(1, cancel_token)
+        if tokens:
+            self.tokens.acquire(tokens, cancel_token)
+
+    def pause(self, seconds: float):
+        self.requests.pause(seconds)
+        self.tokens.pause(seconds)
+
+class RequestScheduler:
+    """Paces and retries the API requests of every service.
+
+    Before each attempt a request takes one unit from its model's request
+    bucket and its estimated tokens from the token bucket, so bursts are
+    spread out instead of running into the account's rate limits. The
+    estimate reserves only part of ``max_tokens`` for the reply; ``settle``
+    corrects it with the usage the API reports, and a failed or cancelled
+    attempt gives its tokens back. Rate limit errors, timeouts, connection
+    errors and 5xx responses are retried with exponential backoff and full
+    jitter; a ``retry-after`` or ``x-ratelimit-reset-*`` header replaces the
+    computed delay and pauses the model's buckets for every other request
+    too. Callbacks registered with ``subscribe`` are told about every retry.
+    """
+
+    RETRYABLE_STATUS = {408, 409, 429}
+
+    _shared = None
+    _shared_lock = threading.Lock()
+
+    def __init__(self, config: Optional[dict] = None):
+        self.config = config or OPENAI_CONFIG["rate_limits"]
+        self._limits: Dict[str, ModelLimits] = {}
+        self._lock = threading.Lock()
+        self._listeners: List[Callable[[str], None]] = []
+
+    @classmethod
+    def shared(cls) -> 'RequestScheduler':
+        """The scheduler all requests go through, so they share the buckets."""
+        with cls._shared_lock:
+            if cls._shared is None:
+                cls._shared = cls()
+            return cls._shared
+
+    def subscribe(self, callback: Callable[[str], None]) -> Callable[[], None]:
+        """Call ``callback(message)`` when a request is retried.
+
+        Called on the thread making the request. Returns a function that
+        unsubscribes.
+        """
+        with self._lock:
+            self._listeners.append(callback)
+
+        def unsubscribe():
+            with self._lock:
+                if callback in self._listeners:
+                    self._listeners.remove(callback)
+        return unsubscribe
+
+    def limits_for(self, model: str) -> ModelLimits:
+        with self._lock:
+            limits = self._limits.get(model)
+            if limits is None:
+                models = self.config["models"]
+                matches = [prefix for prefix in models if model.startswith(prefix)]
+                config = models[max(matches, key=len)] if matches else self.config["default"]
+                limits = self._limits[model] = ModelLimits(config)
+            return limits
+
+    def estimate_tokens(self, messages: List[Dict[str, str]], settings: Dict[str, Any]) -> int:
+        """Tokens to reserve for a request: the prompt plus part of the reply allowance.
+
+        Replies rarely use all of ``max_tokens``; reserving all of it would
+        let only a few requests a minute through a small token limit.
+        """
+        prompt = sum((len(message.get('content') or '') + 3) // 4 + 4 for message in messages)
+        completion = settings.get('max_tokens') or settings.get('max_completion_tokens') or 0
+        return prompt + min(completion, self.config["completion_reservation"])
+
+    def settle(self, model: str, reserved: int, usage) -> bool:
+        """Charge the tokens a request actually used instead of the ``reserved`` estimate.
+
+        Returns False, leaving the reservation, if ``usage`` has no total.
+        """
+        used = getattr(usage, 'total_tokens', None)
+        if used is None:
+            return False
+        self.limits_for(model).tokens.adjust(used - reserved)
+        return True
+
+    def refund(self, model: str, tokens: int) -> None:
+        """Give back reserved tokens a request did not use."""
+        if tokens:
+            self.limits_for(model).tokens.adjust(-tokens)
+
+    def execute(self, model: str, tokens: int, call: Callable[[], Any], trace=None,
+                cancel_token: Optional[CancelToken] = None) -> Any:
+        """Run ``call`` once the buckets allow it, retrying transient failures.
+
+        ``call`` should return a raw response (``with_raw_response``) so that
+        the rate-limit headers can be read; the last error is raised once
+        ``max_attempts`` attempts have failed. ``trace.sent(attempt)``, if
+        given, is called right before every attempt. Waiting for the buckets
+        or a retry stops with ``RequestCancelled`` once ``cancel_token`` is
+        cancelled.
+        """
+        limits = self.limits_for(model)
+        attempt = 0
+        while True:
+            attempt += 1
+            limits.acquire(tokens, cancel_token)
+            try:
+                if cancel_token is not None:
+                    cancel_token.check()
+                if trace is not None:
+                    trace.sent(attempt)
+                response = call()
+            except BaseException as e:
+                # A rejected or abandoned attempt uses no tokens; a retry reserves them again.
+                self.refund(model, tokens)
+                if (not isinstance(e, openai.APIError) or attempt >= self.config["max_attempts"]
+                        or not self.is_retryable(e)):
+                    raise
+                headers = getattr(getattr(e, 'response', None), 'headers', None)
+                delay = retry_after(headers)
+                if delay is not None:
+                    delay = min(delay, self.config["max_delay"])
+                    limits.pause(delay)
+                else:
+                    delay = self.backoff(attempt)
+                self._report(f"Retrying {model} request in {delay:.1f}s "
+                             f"(attempt {attempt} failed: {str(e)})")
+                if cancel_token is not None:
+                    cancel_token.wait(delay)
+                else:
+                    time.sleep(delay)
+                continue
+            self.observe(limits, getattr(response, 'headers', None))
+            return response
+
+    def _report(self, message: str):
+        with self._lock:
+            listeners = list(self._listeners)
+        for listener in listeners:
+            try:
+                listener(message)
+            except Exception as e:
+                print(f"Error reporting request retry: {str(e)}")
+
+    def is_retryable(self, error: openai.APIError) -> bool:
+        if isinstance(error, openai.APIConnectionError):  # Includes timeouts
+            return True
+        if isinstance(error, openai.APIStatusError):
+            # An exhausted quota will not come back by waiting.
+            if error.code == 'insufficient_quota':
+                return False
+            return error.status_code in self.RETRYABLE_STATUS or error.status_code >= 500
+        return False
+
+    def backoff(self, attempt: int) -> float:
+        """Full jitter: a random delay up to ``base_delay * 2 ** (attempt - 1)``."""
+        ceiling = min(self.config["max_delay"], self.config["base_delay"] * 2 ** (attempt - 1))
+        return random.uniform(0, ceiling)
+
+    def observe(self, limits: ModelLimits, headers: Optional[Mapping[str, str]]):
+        """Empty a bucket the server reports as used up, so we wait for its reset."""
+        if not headers:
+            return
+        for name, bucket in (('requests', limits.requests), ('tokens', limits.tokens)):
+            remaining = headers.get(f'x-ratelimit-remaining-{name}')
+            if remaining is None:
+                continue
+            try:
+                remaining = int(remaining)
+            except ValueError:
+                continue
+            if remaining <= 0:
+                bucket.drain()
+                reset = parse_duration(headers.get(f'x-ratelimit-reset-{name}'))
+                if reset:
+                    bucket.pause(min(reset, self.config["max_delay"]))
@@ -0,0 +1,140 @@
+import os
+import json
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+from app.models.model_catalog import ModelCapabilities
+
+class ResponseCacheService:
+    """Disk cache of API responses, addressed by a hash of the request.
+
+    Each entry is one ``<sha256>.json`` file. An in-memory index, built
+    from the directory on start-up, keeps the entries in least recently
+    used order; entries older than ``ttl_seconds`` are never returned, and
+    the least recently used ones are deleted once the cache holds more than
+    ``max_entries`` entries or ``max_bytes`` bytes.
+    """
+
+    # What the API samples at when a request leaves the temperature out.
+    API_DEFAULT_TEMPERATURE = 1
+
+    def __init__(self, config: dict):
+        self.config = config
+        self.cache_dir = os.path.expanduser(config['dir'])
+        self._lock = threading.Lock()
+        # key -> (created, size), least recently used first
+        self._index: "OrderedDict[str, tuple]" = OrderedDict()
+        self.total_bytes = 0
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self._load_index()
+
+    @staticmethod
+    def make_key(messages: List[Dict[str, str]], settings: Dict[str, Any]) -> str:
+        """Hash of the exact messages and API parameters of a request."""
+        payload = json.dumps({'messages': messages, 'settings': settings},
+                             sort_keys=True, separators=(',', ':'))
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def is_cacheable(self, settings: Dict[str, Any],
+                     capabilities: Optional[ModelCapabilities] = None) -> bool:
+        """Sampled responses (temperature > 0) differ per request; skip them unless allowed.
+
+        The temperature is the one the model really uses: the value it is
+        fixed to, else the one sent, else the API's default.
+        """
+        if not self.config['enabled']:
+            return False
+        effective = dict(settings)
+        if capabilities is not None:
+            effective.update(capabilities.fixed_params)
+        temperature = effective.get('temperature', self.API_DEFAULT_TEMPERATURE)
+        return self.config['cache_sampled'] or temperature == 0
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            entry = self._index.get(key)
+            if not entry:
+                return None
+            created, _ = entry
+            if time.time() - created > self.config['ttl_seconds']:
+                self._remove(key)
+                return None
+            try:
+                with open(self._path(key), 'r', encoding='utf-8') as f:
+                    response = json.load(f)['response']
+            except (OSError, ValueError, KeyError) as e:
+                print(f"Error reading cached response: {str(e)}")
+                self._remove(key)
+                return None
+            self._index.move_to_end(key)
+            try:
+                os.utime(self._path(key))
+            except OSError:
+                pass
+            return response
+
+    def put(self, key: str, response: str):
+        record = {'created': time.time(), 'response': response}
+        data = json.dumps(record).encode('utf-8')
+        with self._lock:
+            path = self._path(key)
+            tmp_path = f"{path}.tmp"
+            try:
+                with open(tmp_path, 'wb') as f:
+                    f.write(data)
+                os.replace(tmp_path, path)
+            except OSError as e:
+                print(f"Error caching response: {str(e)}")
+                return
+            self._forget(key)
+            self._index[key] = (record['created'], len(data))
+            self.total_bytes += len(data)
+            self._evict()
+
+    def clear(self):
+        with self._lock:
+            for key in list(self._index):
+                self._remove(key)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.json")
+
+    def _load_index(self):
+        entries = []
+        for file in os.listdir(self.cache_dir):
+            if not file.endswith('.json'):
+                continue
+            path = os.path.join(self.cache_dir, file)
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    created = json.load(f)['created']
+                stat = os.stat(path)
+            except (OSError, ValueError, KeyError):
+                continue
+            # Files are touched on every hit, so mtime orders them by use.
+            entries.append((stat.st_mtime, file[:-len('.json')], created, stat.st_size))
+        for _, key, created, size in sorted(entries):
+            self._index[key] = (created, size)
+            self.total_bytes += size
+        self._evict()
+
+    def _forget(self, key: str):
+        entry = self._index.pop(key, None)
+        if entry:
+            self.total_bytes -= entry[1]
+
+    def _remove(self, key: str):
+        self._forget(key)
+        try:
+            os.remove(self._path(key))
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            print(f"Error removing cached response: {str(e)}")
+
+    def _evict(self):
+        while self._index and (len(self._index) > self.config['max_entries']
+                               or self.total_bytes > self.config['max_bytes']):
+            self._remove(next(iter(self._index)))
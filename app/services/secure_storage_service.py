@@ -1,23 +1,90 @@
+import time
+import threading
+from typing import Dict, Optional, Tuple
 import keyring
 
 class SecureStorageService:
-    """Service for securely storing sensitive data like API keys."""
+    """Service for securely storing sensitive data like API keys.
+
+    Secrets read from the keyring are kept in a process-local cache, so
+    each one is looked up in the backend once; ``save_secret`` updates the
+    cached value. A secret not read for ``CACHE_IDLE_TIMEOUT`` seconds is
+    wiped from memory and looked up again when next needed.
+    """
 
     SERVICE_NAME = "AIWritingAssistant"
+    CACHE_IDLE_TIMEOUT: Optional[float] = 30 * 60  # None keeps secrets until exit
+
+    _lock = threading.Lock()
+    # key -> (value, last read); value is None for secrets that are not set.
+    _cache: Dict[str, Tuple[Optional[str], float]] = {}
+    _wipe_timer: Optional[threading.Timer] = None
 
     @classmethod
     def save_secret(cls, key: str, value: str) -> bool:
-        try:
-            keyring.set_password(cls.SERVICE_NAME, key, value)
+        with cls._lock:
+            try:
+                keyring.set_password(cls.SERVICE_NAME, key, value)
+            except Exception as e:
+                cls._cache.pop(key, None)
+                print(f"Error saving secret: {str(e)}")
+                return False
+            cls._remember(key, value)
             return True
-        except Exception as e:
-            print(f"Error saving secret: {str(e)}")
-            return False
 
     @classmethod
     def get_secret(cls, key: str) -> str:
-        try:
-            return keyring.get_password(cls.SERVICE_NAME, key)
-        except Exception as e:
-            print(f"Error getting secret: {str(e)}")
-            return ""
+        with cls._lock:
+            cached = cls._cache.get(key)
+            if cached is not None:
+                cls._cache[key] = (cached[0], time.monotonic())
+                return cached[0]
+            try:
+                value = keyring.get_password(cls.SERVICE_NAME, key)
+            except keyring.errors.NoKeyringError as e:
+                # No backend will appear later in this process: remember the miss.
+                print(f"Error getting secret: {str(e)}")
+                cls._remember(key, None)
+                return ""
+            except Exception as e:
+                # Not cached, so the lookup is retried next time.
+                print(f"Error getting secret: {str(e)}")
+                return ""
+            cls._remember(key, value)
+            return value
+
+    @classmethod
+    def invalidate(cls, key: Optional[str] = None):
+        """Forget one cached secret, or all of them, e.g. after the keyring changed outside the app."""
+        with cls._lock:
+            if key is None:
+                cls._cache.clear()
+            else:
+                cls._cache.pop(key, None)
+
+    @classmethod
+    def _remember(cls, key: str, value: Optional[str]):
+        cls._cache[key] = (value, time.monotonic())
+        if cls.CACHE_IDLE_TIMEOUT is not None and cls._wipe_timer is None:
+            cls._schedule_wipe(cls.CACHE_IDLE_TIMEOUT)
+
+    @classmethod
+    def _schedule_wipe(cls, delay: float):
+        cls._wipe_timer = threading.Timer(delay, cls._wipe_idle)
+        cls._wipe_timer.daemon = True
+        cls._wipe_timer.start()
+
+    @classmethod
+    def _wipe_idle(cls):
+        with cls._lock:
+            cls._wipe_timer = None
+            timeout = cls.CACHE_IDLE_TIMEOUT
+            if timeout is None:
+                return
+            now = time.monotonic()
+            for key, (_, last_read) in list(cls._cache.items()):
+                if now - last_read >= timeout:
+                    del cls._cache[key]
+            if cls._cache:
+                oldest = min(last_read for _, last_read in cls._cache.values())
+                cls._schedule_wipe(max(0.0, oldest + timeout - now))
@@ -0,0 +1,88 @@
+from collections import OrderedDict
+from typing import Hashable, Optional
+from app.models.chat import ChatMessage, ChatSession
+
+# Rough per-message bookkeeping cost (object headers, id, timestamp) on top
+# of the message text itself.
+MESSAGE_OVERHEAD_BYTES = 200
+
+def estimate_size(session: ChatSession) -> int:
+    """Approximate in-memory size of a deserialized session, in bytes."""
+    return sum(len(msg.content) + MESSAGE_OVERHEAD_BYTES for msg in session.messages)
+
+class SessionCache:
+    """Bounded LRU cache of deserialized chat sessions.
+
+    Every entry remembers the stamp of its backing storage (e.g. file mtime
+    and size) at the time it was read; a lookup with a different stamp is
+    a miss, so changes made outside this process are picked up. Entries
+    are evicted least-recently-used first once either the session count or
+    the estimated total size exceeds its limit.
+    """
+
+    def __init__(self, max_sessions: int, max_bytes: int):
+        self.max_sessions = max_sessions
+        self.max_bytes = max_bytes
+        self.total_bytes = 0
+        self._entries = OrderedDict()
+
+    def get(self, session_id: str, stamp: Hashable) -> Optional[ChatSession]:
+        entry = self._entries.get(session_id)
+        if not entry:
+            return None
+        session, cached_stamp, _ = entry
+        if cached_stamp != stamp:
+            self.invalidate(session_id)
+            return None
+        self._entries.move_to_end(session_id)
+        return session
+
+    def peek(self, session_id: str) -> Optional[ChatSession]:
+        """Return a cached session without validating or reordering it."""
+        entry = self._entries.get(session_id)
+        return entry[0] if entry else None
+
+    def put(self, session: ChatSession, stamp: Hashable):
+        self.invalidate(session.id)
+        size = estimate_size(session)
+        if size > self.max_bytes:
+            return
+        self._entries[session.id] = (session, stamp, size)
+        self.total_bytes += size
+        self._evict()
+
+    def append(self, session_id: str, message: ChatMessage, stamp: Hashable) -> bool:
+        """Add a just-written message to a cached session and re-stamp it."""
+        entry = self._entries.get(session_id)
+        if not entry:
+            return False
+        session, _, size = entry
+        session.messages.append(message)
+        session.updated_at = max(session.updated_at, message.timestamp)
+        added = len(message.content) + MESSAGE_OVERHEAD_BYTES
+        self._entries[session_id] = (session, stamp, size + added)
+        self._entries.move_to_end(session_id)
+        self.total_bytes += added
+        self._evict()
+        return True
+
+    def invalidate(self, session_id: str):
+        entry = self._entries.pop(session_id, None)
+        if entry:
+            self.total_bytes -= entry[2]
+
+    def clear(self):
+        self._entries.clear()
+        self.total_bytes = 0
+
+    def __contains__(self, session_id: str) -> bool:
+        return session_id in self._entries
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _evict(self):
+        while self._entries and (len(self._entries) > self.max_sessions
+                                 or self.total_bytes > self.max_bytes):
+            _, (_, _, size) = self._entries.popitem(last=False)
+            self.total_bytes -= size
@@ -0,0 +1,232 @@
+import os
+import json
+from dataclasses import replace
+from datetime import datetime
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+from app.models.chat import ChatMessage, ChatSession, Role, SessionSummary
+
+MANIFEST_VERSION = 1
+
+def make_title(content: str, max_length: int) -> str:
+    """Build a one-line session title from a message."""
+    title = content.strip().split('\n', 1)[0]
+    return title[:max_length - 3] + "..." if len(title) > max_length else title
+
+class SessionManifest:
+    """Small append-only index of the sessions in a chat directory.
+
+    Each line of the manifest is either a full ``SessionSummary`` record
+    (last one wins) or a tombstone for a removed session, so keeping it up
+    to date costs one appended line per write. The whole index is read
+    once and kept in memory; it is rebuilt from the session files when it
+    is missing, from another version, or older than the directory itself
+    (sessions added or removed behind our back).
+
+    Other processes sharing the directory append to the same file;
+    ``refresh()`` reads only the records added since this process last
+    read or wrote it, and the whole file only after it was compacted.
+    Writers in several processes must hold the store's ``FileLock`` and
+    call ``refresh()`` before changing anything.
+    """
+
+    def __init__(self, base_dir: str, config: dict,
+                 scan: Callable[[], Iterable[Tuple[ChatSession, Optional[str]]]]):
+        self.path = os.path.join(base_dir, config['file_name'])
+        self.base_dir = base_dir
+        self.config = config
+        self._scan = scan
+        self._entries: Dict[str, SessionSummary] = {}
+        self._records = 0
+        # How far this process has read the file, and which file that was.
+        self._offset = 0
+        self._file_id = None
+        # Sessions changed by other processes -> their summaries from before.
+        self._external: Dict[str, Optional[SessionSummary]] = {}
+        if not self._load():
+            self.rebuild()
+
+    def get(self, session_id: str) -> Optional[SessionSummary]:
+        return self._entries.get(session_id)
+
+    def list(self) -> List[SessionSummary]:
+        return sorted(self._entries.values(), key=lambda s: s.updated_at, reverse=True)
+
+    def latest(self) -> Optional[SessionSummary]:
+        if not self._entries:
+            return None
+        return max(self._entries.values(), key=lambda s: s.updated_at)
+
+    def add_session(self, session: ChatSession):
+        self._put(self._summarize(session))
+
+    def add_message(self, session_id: str, message: ChatMessage):
+        summary = self._entries.get(session_id)
+        if not summary:
+            return
+        summary.message_count += 1
+        summary.updated_at = max(summary.updated_at, message.timestamp)
+        if not summary.title and message.role == Role.USER:
+            summary.title = make_title(message.content, self.config['title_length'])
+        self._put(summary)
+
+    def set_archive(self, session_id: str, archive: Optional[str]):
+        summary = self._entries.get(session_id)
+        if summary and summary.archive != archive:
+            summary.archive = archive
+            self._put(summary)
+
+    def remove(self, session_id: str):
+        if self._entries.pop(session_id, None):
+            self._append({'id': session_id, 'deleted': True})
+            self._maybe_compact()
+
+    def clear(self):
+        self._entries.clear()
+        self._write_all()
+
+    def touch(self):
+        """Mark the manifest as up to date after the session files were changed.
+
+        Saving, compacting or removing a session file updates the
+        directory's mtime; without this the next load would rebuild.
+        """
+        try:
+            os.utime(self.path)
+        except FileNotFoundError:
+            pass
+
+    def refresh(self):
+        """Take in the records other processes have written since we last looked."""
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return
+        if stat.st_ino == self._file_id and stat.st_size == self._offset:
+            return
+        if stat.st_ino != self._file_id or stat.st_size < self._offset:
+            self._reread()
+        else:
+            self._read_records(self._offset, track=True)
+
+    def take_external_changes(self) -> Dict[str, Optional[SessionSummary]]:
+        """Sessions other processes changed since the last call, with their earlier summaries."""
+        changes, self._external = self._external, {}
+        return changes
+
+    def rebuild(self):
+        """Re-read every session file and rewrite the manifest."""
+        self._entries.clear()
+        for session, archive in self._scan():
+            self._entries[session.id] = self._summarize(session, archive)
+        self._write_all()
+
+    def _summarize(self, session: ChatSession, archive: Optional[str] = None) -> SessionSummary:
+        title = ""
+        for msg in session.messages:
+            if msg.role == Role.USER:
+                title = make_title(msg.content, self.config['title_length'])
+                break
+        return SessionSummary(
+            id=session.id,
+            created_at=session.created_at,
+            updated_at=session.updated_at,
+            message_count=len(session.messages),
+            title=title,
+            archive=archive
+        )
+
+    def _put(self, summary: SessionSummary):
+        self._entries[summary.id] = summary
+        self._append(self._summary_record(summary))
+        self._maybe_compact()
+
+    def _load(self) -> bool:
+        if not os.path.exists(self.path):
+            return False
+        if os.stat(self.base_dir).st_mtime_ns > os.stat(self.path).st_mtime_ns:
+            return False
+        return self._read_records(0)
+
+    def _reread(self):
+        """Read a manifest another process has rewritten, noting what changed."""
+        previous = {session_id: replace(summary) for session_id, summary in self._entries.items()}
+        self._entries.clear()
+        self._records = 0
+        if not self._read_records(0):
+            self.rebuild()
+        for session_id in previous.keys() | self._entries.keys():
+            if previous.get(session_id) != self._entries.get(session_id):
+                self._external.setdefault(session_id, previous.get(session_id))
+
+    def _read_records(self, offset: int, track: bool = False) -> bool:
+        """Apply the complete records from ``offset`` on; False for another version.
+
+        With ``track`` the sessions they change are noted as external changes.
+        """
+        with open(self.path, 'rb') as f:
+            self._file_id = os.fstat(f.fileno()).st_ino
+            f.seek(offset)
+            for line in f:
+                if not line.endswith(b'\n'):
+                    break  # Still being written; read again next time.
+                offset += len(line)
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                self._records += 1
+                if record.get('type') == 'manifest':
+                    if record.get('version') != MANIFEST_VERSION:
+                        return False
+                    continue
+                if track and record['id'] not in self._external:
+                    previous = self._entries.get(record['id'])
+                    self._external[record['id']] = replace(previous) if previous else None
+                if record.get('deleted'):
+                    self._entries.pop(record['id'], None)
+                else:
+                    self._entries[record['id']] = SessionSummary(
+                        id=record['id'],
+                        created_at=datetime.fromisoformat(record['created_at']),
+                        updated_at=datetime.fromisoformat(record['updated_at']),
+                        message_count=record['message_count'],
+                        title=record['title'],
+                        archive=record.get('archive')
+                    )
+        self._offset = offset
+        return True
+
+    def _summary_record(self, summary: SessionSummary) -> dict:
+        return {
+            'id': summary.id,
+            'created_at': summary.created_at.isoformat(),
+            'updated_at': summary.updated_at.isoformat(),
+            'message_count': summary.message_count,
+            'title': summary.title,
+            'archive': summary.archive
+        }
+
+    def _append(self, record: dict):
+        with open(self.path, 'ab') as f:
+            f.write(json.dumps(record).encode('utf-8') + b'\n')
+            self._offset = f.tell()
+            self._file_id = os.fstat(f.fileno()).st_ino
+        self._records += 1
+
+    def _maybe_compact(self):
+        if self._records > max(2 * len(self._entries), self.config['compact_min_records']):
+            self._write_all()
+
+    def _write_all(self):
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(json.dumps({'type': 'manifest', 'version': MANIFEST_VERSION}) + '\n')
+            for summary in self._entries.values():
+                f.write(json.dumps(self._summary_record(summary)) + '\n')
+        os.replace(tmp_path, self.path)
+        # The rename bumps the directory mtime; touch the manifest so it is
+        # not mistaken for stale on the next load.
+        os.utime(self.path)
+        self._records = len(self._entries) + 1
+        stat = os.stat(self.path)
+        self._offset, self._file_id = stat.st_size, stat.st_ino
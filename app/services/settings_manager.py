@@ -1,68 +1,460 @@
+import os
 import json
+import time
+import atexit
+import shutil
+import threading
+from contextlib import contextmanager
+from dataclasses import fields, replace
 from pathlib import Path
-from typing import Optional
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
 from .secure_storage_service import SecureStorageService
+from .file_lock import FileLock
+from .file_watcher import FileWatcher
+from app.models.settings import ChatSettings, FolderSettings, OpenAISettings, Settings
+from app.config.settings_schema import SETTINGS_SCHEMA
+
+try:
+    from jsonschema import Draft7Validator
+except ImportError:
+    Draft7Validator = None
+
+_MISSING = object()
 
 class SettingsManager:
-    """Manages application settings."""
+    """Manages application settings.
+
+    ``set`` only changes the settings in memory and marks them dirty; a
+    background writer saves them once no change has come in for
+    ``FLUSH_DELAY`` seconds, and at the latest ``MAX_FLUSH_DELAY`` seconds
+    after the first unsaved change. Each save writes a temporary file and
+    renames it over settings.json, so the file is never left half written.
+    ``flush()`` saves at once and is called on exit.
+
+    The application uses one instance, ``shared()``. Components that cache
+    settings ``subscribe`` to a key prefix and are called with the changed
+    key whenever a setting under it changes; changes made inside a
+    ``transaction()`` are announced when it ends, once per subscriber,
+    with the nearest key enclosing all those it follows.
+
+    Settings read on every request are also available as attributes of
+    ``typed`` (e.g. ``typed.openai.model``), checked against SETTINGS_SCHEMA
+    and with defaults filled in. A settings file that cannot be parsed is
+    kept as settings.json.bad and reported; invalid values are reported
+    and replaced by their defaults in ``typed``.
+
+    Several instances of the application can share settings.json: saves
+    hold a ``FileLock`` and first merge in whatever another process saved
+    since, key by key, with this process's unsaved changes winning. Saves
+    by other processes are picked up as they happen through the
+    ``FileWatcher``, and only the subscribers of keys that differ are told.
+    """
+
+    FLUSH_DELAY = 0.5
+    MAX_FLUSH_DELAY = 2.0
+
+    _shared = None
+    _shared_lock = threading.Lock()
+
+    # Sections of settings.json that make up ``typed``.
+    TYPED_SECTIONS = {"openai": OpenAISettings, "chat": ChatSettings, "folders": FolderSettings}
+    # Validators compiled from SETTINGS_SCHEMA once per process, by section ("" for all).
+    _validators: Optional[Dict[str, object]] = None
 
     def __init__(self):
         self.settings = {}
         self.settings_file = Path.home() / '.aiwritingassistant' / 'settings.json'
         self.secure_storage = SecureStorageService()
+        self._lock = threading.RLock()
+        self._changed = threading.Condition(self._lock)
+        # Serializes writes, so an older snapshot never replaces a newer one.
+        self._write_lock = threading.Lock()
+        self._dirty_since: Optional[float] = None
+        self._last_change = 0.0
+        self._transaction_depth = 0
+        self._writer: Optional[threading.Thread] = None
+        self._subscribers: List[Tuple[str, Callable[[str], None]]] = []
+        self._pending_keys: List[str] = []
+        # Keys set since the last save; they win over other processes' changes.
+        self._unsaved_keys: List[str] = []
+        self.settings_file.parent.mkdir(parents=True, exist_ok=True)
+        self._file_lock = FileLock(str(self.settings_file))
+        # Identifies the version of settings.json this instance last read or wrote.
+        self._file_stamp: Optional[tuple] = None
+        self.typed: Settings = None
         self.load_settings()
+        atexit.register(self.flush)
+        self._unwatch = FileWatcher.shared().watch(str(self.settings_file.parent),
+                                                   self._on_file_changed)
+
+    @classmethod
+    def shared(cls) -> 'SettingsManager':
+        """The settings store the whole application reads and writes."""
+        with cls._shared_lock:
+            if cls._shared is None:
+                cls._shared = cls()
+            return cls._shared
+
+    def subscribe(self, prefix: str, callback: Callable[[str], None]) -> Callable[[], None]:
+        """Call ``callback(key)`` when a setting under ``prefix`` changes.
+
+        ``prefix`` is a dotted key such as ``"openai"`` (``"openai.*"`` is
+        accepted too); it also matches when an enclosing key, or ``""`` for
+        all settings, is replaced. Returns a function that unsubscribes.
+        """
+        if prefix.endswith('*'):
+            prefix = prefix[:-1].rstrip('.')
+        subscription = (prefix, callback)
+        with self._lock:
+            self._subscribers.append(subscription)
+
+        def unsubscribe():
+            with self._lock:
+                if subscription in self._subscribers:
+                    self._subscribers.remove(subscription)
+        return unsubscribe
 
     def get(self, key: str, default=None):
         if key == "openai.api_key":
             return self.secure_storage.get_secret("openai_api_key") or default
-        
-        try:
-            value = self.settings
-            for part in key.split('.'):
-                value = value[part]
-            return value
-        except (KeyError, TypeError):
-            return default
+
+        with self._lock:
+            try:
+                value = self.settings
+                for part in key.split('.'):
+                    value = value[part]
+                return value
+            except (KeyError, TypeError):
+                return default
 
     def set(self, key: str, value) -> None:
         if key == "openai.api_key":
-            self.secure_storage.save_secret("openai_api_key", value)
+            if value != self.secure_storage.get_secret("openai_api_key"):
+                self.secure_storage.save_secret("openai_api_key", value)
+                self._changed_key(key)
             return
 
         parts = key.split('.')
-        current = self.settings
-        for part in parts[:-1]:
-            if part not in current:
-                current[part] = {}
-            current = current[part]
-        current[parts[-1]] = value
-        self.save_settings()
+        with self._lock:
+            current = self.settings
+            for part in parts[:-1]:
+                if part not in current:
+                    current[part] = {}
+                current = current[part]
+            existing = current.get(parts[-1], _MISSING)
+            # Setting an equal value is not a change. The same dict or list
+            # is always saved, though: it may have been modified in place.
+            modified_in_place = existing is value and isinstance(value, (dict, list))
+            if existing == value and not modified_in_place:
+                return
+            current[parts[-1]] = value
+            self._mark_dirty(key)
+            if parts[0] in self.TYPED_SECTIONS:
+                invalid = self._validation_errors(parts[0])
+                self._report_invalid(invalid, key)
+                self.typed = replace(self.typed,
+                                     **{parts[0]: self._build_section(parts[0], invalid)})
+        self._changed_key(key)
+
+    @contextmanager
+    def transaction(self):
+        """Group several ``set`` calls into one save, scheduled when the block ends."""
+        with self._lock:
+            self._transaction_depth += 1
+        try:
+            yield self
+        finally:
+            with self._lock:
+                self._transaction_depth -= 1
+                keys = []
+                if self._transaction_depth == 0:
+                    keys, self._pending_keys = self._pending_keys, []
+                    if self._dirty_since is not None:
+                        self._changed.notify()
+            self._notify_all(keys)
+
+    def is_dirty(self) -> bool:
+        with self._lock:
+            return self._dirty_since is not None
+
+    def flush(self) -> None:
+        """Write pending changes now, merged with what other processes saved meanwhile."""
+        with self._write_lock, self._file_lock:
+            with self._lock:
+                if self._dirty_since is None:
+                    return
+                changed = self._merge_from_disk()
+                data = json.dumps(self.settings, indent=4)
+                unsaved_keys, self._unsaved_keys = self._unsaved_keys, []
+                self._dirty_since = None
+            if not self._write(data):
+                with self._lock:
+                    # Keep the changes pending; the writer tries again later.
+                    self._unsaved_keys = unsaved_keys + self._unsaved_keys
+                    self._last_change = time.monotonic()
+                    if self._dirty_since is None:
+                        self._dirty_since = self._last_change
+        self._notify_all(changed)
+
+    def reload(self) -> List[str]:
+        """Take in the changes another process saved; returns the changed keys."""
+        with self._write_lock:
+            with self._lock:
+                changed = self._merge_from_disk()
+        self._notify_all(changed)
+        return changed
 
     def load_settings(self) -> None:
+        config_path = Path(__file__).parent.parent / 'config' / 'settings.json'
         try:
             if self.settings_file.exists():
-                with open(self.settings_file, 'r') as f:
-                    self.settings = json.load(f)
+                stamp = self._stat()
+                self.settings = self._read(self.settings_file)
+                self._file_stamp = stamp
             else:
-                config_path = Path(__file__).parent.parent / 'config' / 'settings.json'
                 if config_path.exists():
-                    with open(config_path, 'r') as f:
-                        self.settings = json.load(f)
-                self.save_settings() 
+                    self.settings = self._read(config_path)
+                self.save_settings()
+        except json.JSONDecodeError as e:
+            print(f"Error loading settings: {self.settings_file} is not valid JSON "
+                  f"(line {e.lineno}, column {e.colno}: {e.msg})")
+            if self.settings_file.exists():
+                self._keep_bad_file()
+            self.settings = {}
+            if config_path.exists():
+                try:
+                    self.settings = self._read(config_path)
+                except Exception as e:
+                    print(f"Error loading default settings: {e}")
         except Exception as e:
             print(f"Error loading settings: {e}")
             self.settings = {}
+        with self._lock:
+            self._report_invalid(self._validation_errors())
+            self.typed = Settings(**{name: self._build_section(name)
+                                     for name in self.TYPED_SECTIONS})
 
     def save_settings(self) -> None:
+        """Write all settings now, whether or not they changed."""
+        with self._lock:
+            self._dirty_since = self._dirty_since or time.monotonic()
+        self.flush()
+
+    def _on_file_changed(self, path: str):
+        if os.path.realpath(path) == os.path.realpath(self.settings_file):
+            self.reload()
+
+    def _stat(self) -> Optional[tuple]:
+        try:
+            stat = os.stat(self.settings_file)
+        except OSError:
+            return None
+        return (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+
+    def _merge_from_disk(self) -> List[str]:
+        """Apply other processes' changes to settings.json, except to unsaved keys.
+
+        Called with the lock held; returns the keys that changed.
+        """
+        stamp = self._stat()
+        if stamp is None or stamp == self._file_stamp:
+            return []
+        try:
+            saved = self._read(self.settings_file)
+        except Exception as e:
+            print(f"Error reading settings saved by another instance: {e}")
+            return []
+        self._file_stamp = stamp
+
+        changed = [key for key in self._differences(self.settings, saved)
+                   if not any(self._matches(unsaved, key) for unsaved in self._unsaved_keys)]
+        for key in changed:
+            self._assign(key, self._lookup(saved, key))
+        for section in {key.split('.')[0] for key in changed} & self.TYPED_SECTIONS.keys():
+            self.typed = replace(self.typed, **{section: self._build_section(section)})
+        return changed
+
+    def _differences(self, old: dict, new: dict, prefix: str = "") -> Iterator[str]:
+        """Dotted keys of the values that differ, descending into nested sections."""
+        for name in list(old) + [name for name in new if name not in old]:
+            key = prefix + name
+            old_value, new_value = old.get(name, _MISSING), new.get(name, _MISSING)
+            if isinstance(old_value, dict) and isinstance(new_value, dict):
+                yield from self._differences(old_value, new_value, key + '.')
+            elif old_value != new_value:
+                yield key
+
+    @staticmethod
+    def _lookup(settings: dict, key: str):
+        value = settings
+        for part in key.split('.'):
+            value = value.get(part, _MISSING)
+            if value is _MISSING:
+                break
+        return value
+
+    def _assign(self, key: str, value):
+        """Set ``key`` to ``value`` without marking it unsaved; ``_MISSING`` removes it."""
+        parts = key.split('.')
+        current = self.settings
+        for part in parts[:-1]:
+            current = current.setdefault(part, {})
+        if value is _MISSING:
+            current.pop(parts[-1], None)
+        else:
+            current[parts[-1]] = value
+
+    def _read(self, path: Path) -> dict:
+        with open(path, 'r') as f:
+            settings = json.load(f)
+        if not isinstance(settings, dict):
+            raise ValueError(f"{path} does not hold a JSON object")
+        return settings
+
+    def _keep_bad_file(self):
+        bad_path = self.settings_file.with_name(self.settings_file.name + '.bad')
+        try:
+            shutil.copyfile(self.settings_file, bad_path)
+            print(f"The unreadable settings were kept as {bad_path}")
+        except OSError as e:
+            print(f"Error keeping unreadable settings: {e}")
+
+    @classmethod
+    def _compiled_validators(cls) -> Dict[str, object]:
+        if cls._validators is None:
+            validators = {}
+            if Draft7Validator is not None:
+                Draft7Validator.check_schema(SETTINGS_SCHEMA)
+                validators[""] = Draft7Validator(SETTINGS_SCHEMA)
+                for name in cls.TYPED_SECTIONS:
+                    validators[name] = Draft7Validator(SETTINGS_SCHEMA["properties"][name])
+            cls._validators = validators
+        return cls._validators
+
+    def _validation_errors(self, section: str = "") -> Dict[str, str]:
+        """Dotted key -> message for each invalid value, empty without jsonschema."""
+        validator = self._compiled_validators().get(section)
+        if validator is None:
+            return {}
+        document = self.settings.get(section, {}) if section else self.settings
+        errors = {}
+        for error in validator.iter_errors(document):
+            key = ".".join([section] * bool(section) + [str(part) for part in error.path])
+            errors.setdefault(key or "settings", error.message)
+        return errors
+
+    def _report_invalid(self, errors: Dict[str, str], key: Optional[str] = None):
+        for invalid_key, message in errors.items():
+            if key is None or invalid_key == key or invalid_key.startswith(key + '.'):
+                print(f"Invalid setting {invalid_key}: {message}; using the default")
+
+    def _build_section(self, name: str, invalid: Optional[Dict[str, str]] = None):
+        """The typed settings of a section, unset, empty and invalid values defaulted."""
+        schema = SETTINGS_SCHEMA["properties"][name]["properties"]
+        raw = self.settings.get(name)
+        if not isinstance(raw, dict):
+            raw = {}
+        if invalid is None:
+            invalid = self._validation_errors(name) if raw else {}
+        values = {}
+        for field in fields(self.TYPED_SECTIONS[name]):
+            value = raw.get(field.name)
+            if value is None or value == "" or f"{name}.{field.name}" in invalid:
+                value = schema[field.name].get("default")
+            values[field.name] = value
+        return self.TYPED_SECTIONS[name](**values)
+
+    def _changed_key(self, key: str):
+        with self._lock:
+            if self._transaction_depth:
+                if key not in self._pending_keys:
+                    self._pending_keys.append(key)
+                return
+        self._notify(key)
+
+    def _notify(self, key: str):
+        self._notify_all([key])
+
+    def _notify_all(self, keys: List[str]):
+        """Call each subscriber once for a batch of changed keys, outside the lock.
+
+        A subscriber matching several of them is given the nearest key
+        enclosing them all, as if that key had been replaced.
+        """
+        with self._lock:
+            calls = []
+            for prefix, callback in self._subscribers:
+                matched = [key for key in keys if self._matches(prefix, key)]
+                if matched:
+                    calls.append((callback, self._enclosing(matched)))
+        for callback, key in calls:
+            try:
+                callback(key)
+            except Exception as e:
+                print(f"Error notifying settings change of {key}: {str(e)}")
+
+    @staticmethod
+    def _enclosing(keys: List[str]) -> str:
+        parts = keys[0].split('.')
+        for key in keys[1:]:
+            other = key.split('.')
+            common = 0
+            while common < min(len(parts), len(other)) and parts[common] == other[common]:
+                common += 1
+            parts = parts[:common]
+        return '.'.join(parts)
+
+    @staticmethod
+    def _matches(prefix: str, key: str) -> bool:
+        return (not prefix or key == prefix or key.startswith(prefix + '.')
+                or prefix.startswith(key + '.'))
+
+    def _mark_dirty(self, key: str):
+        if key not in self._unsaved_keys:
+            self._unsaved_keys.append(key)
+        now = time.monotonic()
+        self._last_change = now
+        if self._dirty_since is None:
+            self._dirty_since = now
+        if self._writer is None:
+            self._writer = threading.Thread(target=self._write_behind, name="settings-writer",
+                                            daemon=True)
+            self._writer.start()
+        self._changed.notify()
+
+    def _write_behind(self):
+        while True:
+            with self._lock:
+                while True:
+                    if self._dirty_since is None or self._transaction_depth:
+                        self._changed.wait()
+                        continue
+                    deadline = min(self._last_change + self.FLUSH_DELAY,
+                                   self._dirty_since + self.MAX_FLUSH_DELAY)
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._changed.wait(remaining)
+            self.flush()
+
+    def _write(self, data: str) -> bool:
+        tmp_path = self.settings_file.with_name(self.settings_file.name + '.tmp')
         try:
             self.settings_file.parent.mkdir(parents=True, exist_ok=True)
-            with open(self.settings_file, 'w') as f:
-                json.dump(self.settings, f, indent=4)
+            with open(tmp_path, 'w') as f:
+                f.write(data)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.settings_file)
+            with self._lock:
+                self._file_stamp = self._stat()
+            return True
         except Exception as e:
             print(f"Error saving settings: {e}")
+            return False
 
     def get_writing_prompts_folder(self) -> Optional[str]:
-        return self.get('folders.writing_prompts')
-    
+        return self.typed.folders.writing_prompts
+
     def set_writing_prompts_folder(self, folder: Optional[str]) -> None:
         self.set('folders.writing_prompts', folder)
@@ -0,0 +1,348 @@
+import os
+import json
+import sqlite3
+import threading
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+from app.models.chat import ChatMessage, ChatSession, Role, ROLE_BY_VALUE, SessionSummary
+from app.services.session_manifest import make_title
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    id TEXT PRIMARY KEY,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL,
+    message_count INTEGER NOT NULL DEFAULT 0,
+    title TEXT NOT NULL DEFAULT '',
+    metadata TEXT NOT NULL DEFAULT '{}'
+);
+CREATE INDEX IF NOT EXISTS idx_sessions_updated_at ON sessions (updated_at);
+
+CREATE TABLE IF NOT EXISTS messages (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    id TEXT NOT NULL,
+    session_id TEXT NOT NULL REFERENCES sessions (id) ON DELETE CASCADE,
+    role TEXT NOT NULL,
+    content TEXT NOT NULL,
+    timestamp REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_messages_session_id ON messages (session_id, seq);
+"""
+
+# ``PRAGMA user_version`` once sessions from the journal store were imported
+# (or there were none to import).
+IMPORTED_VERSION = 1
+
+class SQLiteChatStore:
+    """Chat store backed by a single SQLite database in WAL mode.
+
+    Sessions and messages live in indexed tables, so finding the latest
+    session, deleting a session and clearing history are single queries
+    rather than directory scans. SQLite serializes writers from several
+    processes itself and every read sees what they committed, so there is
+    no file to lock. Other processes' commits change the write-ahead log,
+    which is watched; ``external_changes`` then compares the sessions with
+    those this instance last saw. ``import_once`` copies in the sessions of
+    the store used before the database existed.
+    """
+
+    def __init__(self, base_dir: str, config: dict):
+        os.makedirs(base_dir, exist_ok=True)
+        self.db_path = os.path.join(base_dir, config['sqlite']['file_name'])
+        self.title_length = config['title_length']
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("PRAGMA foreign_keys=ON")
+        self._conn.executescript(SCHEMA)
+        self.watched_file = self.db_path + '-wal'
+        # Changes only when another connection commits.
+        self._data_version = self._conn.execute("PRAGMA data_version").fetchone()[0]
+        # The sessions as this instance last saw them, by id.
+        self._known: Dict[str, SessionSummary] = {}
+        self._remember_all()
+
+    def import_once(self, open_source: Callable[[], Optional[object]]) -> int:
+        """Copy every session of another store into a new database; returns how many.
+
+        ``open_source`` returns the store, or None if there is nothing to
+        import. It is only called the first time, and only while the
+        database holds no sessions; the whole import is one transaction,
+        so other processes starting at the same time never import twice.
+        """
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                imported = 0
+                if self._conn.execute("PRAGMA user_version").fetchone()[0] < IMPORTED_VERSION:
+                    empty = self._conn.execute("SELECT 1 FROM sessions LIMIT 1").fetchone() is None
+                    source = open_source() if empty else None
+                    if source:
+                        # Oldest first, so the most recent keeps the highest seq.
+                        for summary in reversed(source.list_sessions()):
+                            session = source.load_session(summary.id)
+                            if session:
+                                self._insert_session(session)
+                                imported += 1
+                    self._conn.execute(f"PRAGMA user_version = {IMPORTED_VERSION}")
+                self._conn.commit()
+            except BaseException:
+                self._conn.rollback()
+                raise
+            if imported:
+                self._remember_all()
+        return imported
+
+    def create_session(self, session: ChatSession):
+        with self._lock:
+            with self._conn:
+                self._insert_session(session)
+            self._remember(session.id)
+
+    def _insert_session(self, session: ChatSession):
+        title = next(
+            (make_title(msg.content, self.title_length)
+             for msg in session.messages if msg.role == Role.USER),
+            ""
+        )
+        self._conn.execute(
+            "INSERT OR REPLACE INTO sessions "
+            "(id, created_at, updated_at, message_count, title, metadata) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (session.id, session.created_at.timestamp(), session.updated_at.timestamp(),
+             len(session.messages), title, json.dumps(session.metadata))
+        )
+        self._conn.executemany(
+            "INSERT INTO messages (id, session_id, role, content, timestamp) VALUES (?, ?, ?, ?, ?)",
+            [
+                (msg.id, session.id, msg.role.value, msg.content, msg.created)
+                for msg in session.messages
+            ]
+        )
+
+    def append_message(self, session_id: str, message: ChatMessage) -> bool:
+        return self.append_messages(session_id, [message])
+
+    def append_messages(self, session_id: str, messages: List[ChatMessage]) -> bool:
+        """Append a batch of messages in a single transaction."""
+        if not messages:
+            return self.session_stamp(session_id) is not None
+        title = next(
+            (make_title(msg.content, self.title_length)
+             for msg in messages if msg.role == Role.USER),
+            ""
+        )
+        with self._lock:
+            with self._conn:
+                updated = self._conn.execute(
+                    "UPDATE sessions SET updated_at = ?, message_count = message_count + ?, "
+                    "title = CASE WHEN title = '' THEN ? ELSE title END WHERE id = ?",
+                    (messages[-1].created, len(messages), title, session_id)
+                )
+                if updated.rowcount == 0:
+                    return False
+                self._conn.executemany(
+                    "INSERT INTO messages (id, session_id, role, content, timestamp) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    [
+                        (msg.id, session_id, msg.role.value, msg.content, msg.created)
+                        for msg in messages
+                    ]
+                )
+            self._remember(session_id)
+            return True
+
+    def update_metadata(self, session_id: str, values: dict) -> bool:
+        with self._lock, self._conn:
+            row = self._conn.execute(
+                "SELECT metadata FROM sessions WHERE id = ?", (session_id,)
+            ).fetchone()
+            if not row:
+                return False
+            metadata = json.loads(row[0])
+            metadata.update(values)
+            self._conn.execute(
+                "UPDATE sessions SET metadata = ? WHERE id = ?",
+                (json.dumps(metadata), session_id)
+            )
+            return True
+
+    def read_metadata(self, session_id: str) -> Optional[dict]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT metadata FROM sessions WHERE id = ?", (session_id,)
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def load_session(self, session_id: str) -> Optional[ChatSession]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT id, created_at, updated_at, metadata FROM sessions WHERE id = ?",
+                (session_id,)
+            ).fetchone()
+            if not row:
+                return None
+            rows = self._conn.execute(
+                "SELECT id, role, content, timestamp FROM messages "
+                "WHERE session_id = ? ORDER BY seq",
+                (session_id,)
+            ).fetchall()
+        return ChatSession(
+            id=row[0],
+            messages=self._messages_from_rows(rows),
+            created_at=datetime.fromtimestamp(row[1]),
+            updated_at=datetime.fromtimestamp(row[2]),
+            metadata=json.loads(row[3])
+        )
+
+    def message_count(self, session_id: str) -> Optional[int]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT message_count FROM sessions WHERE id = ?", (session_id,)
+            ).fetchone()
+        return row[0] if row else None
+
+    def read_messages(self, session_id: str, offset: int, limit: int) -> List[ChatMessage]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id, role, content, timestamp FROM messages "
+                "WHERE session_id = ? ORDER BY seq LIMIT ? OFFSET ?",
+                (session_id, limit, offset)
+            ).fetchall()
+        return self._messages_from_rows(rows)
+
+    def message_position(self, session_id: str, message_id: str) -> Optional[int]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT seq FROM messages WHERE session_id = ? AND id = ?",
+                (session_id, message_id)
+            ).fetchone()
+            if not row:
+                return None
+            return self._conn.execute(
+                "SELECT COUNT(*) FROM messages WHERE session_id = ? AND seq < ?",
+                (session_id, row[0])
+            ).fetchone()[0]
+
+    def read_tail(self, session_id: str, limit: int) -> List[ChatMessage]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id, role, content, timestamp FROM messages "
+                "WHERE session_id = ? ORDER BY seq DESC LIMIT ?",
+                (session_id, limit)
+            ).fetchall()
+        rows.reverse()
+        return self._messages_from_rows(rows)
+
+    def _messages_from_rows(self, rows: list) -> List[ChatMessage]:
+        return [
+            ChatMessage(msg_id, ROLE_BY_VALUE[role], content, created)
+            for msg_id, role, content, created in rows
+        ]
+
+    def session_stamp(self, session_id: str) -> Optional[tuple]:
+        """Last update time and message count of the session, if it exists."""
+        with self._lock:
+            return self._conn.execute(
+                "SELECT updated_at, message_count FROM sessions WHERE id = ?",
+                (session_id,)
+            ).fetchone()
+
+    def latest_session_id(self) -> Optional[str]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT id FROM sessions ORDER BY updated_at DESC LIMIT 1"
+            ).fetchone()
+        return row[0] if row else None
+
+    def list_sessions(self) -> List[SessionSummary]:
+        return self._summaries("ORDER BY updated_at DESC")
+
+    def _summaries(self, clause: str = "", parameters: tuple = ()) -> List[SessionSummary]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id, created_at, updated_at, message_count, title "
+                f"FROM sessions {clause}", parameters
+            ).fetchall()
+        return [
+            SessionSummary(
+                id=session_id,
+                created_at=datetime.fromtimestamp(created_at),
+                updated_at=datetime.fromtimestamp(updated_at),
+                message_count=message_count,
+                title=title
+            )
+            for session_id, created_at, updated_at, message_count, title in rows
+        ]
+
+    def compaction_due(self, session_id: str) -> bool:
+        return False
+
+    def compact_session(self, session_id: str) -> bool:
+        # Rows are updated in place; there is nothing to rewrite.
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT 1 FROM sessions WHERE id = ?", (session_id,)
+            ).fetchone()
+        return row is not None
+
+    def archive_candidates(self, cutoff: datetime) -> dict:
+        # Everything already lives in one database file; nothing to archive.
+        return {}
+
+    def archive_sessions(self, month: str, session_ids: List[str], cutoff: datetime) -> int:
+        return 0
+
+    def remove_session(self, session_id: str) -> bool:
+        with self._lock:
+            with self._conn:
+                deleted = self._conn.execute("DELETE FROM sessions WHERE id = ?", (session_id,))
+            self._known.pop(session_id, None)
+            return deleted.rowcount > 0
+
+    def clear(self):
+        with self._lock:
+            with self._conn:
+                self._conn.execute("DELETE FROM messages")
+                self._conn.execute("DELETE FROM sessions")
+            self._known.clear()
+
+    def sync(self):
+        """Checkpoint the WAL so committed messages reach the main database file."""
+        with self._lock:
+            self._conn.execute("PRAGMA wal_checkpoint(PASSIVE)")
+
+    def external_changes(self) -> Dict[str, Optional[SessionSummary]]:
+        """Sessions other processes changed since the last call, with their earlier summaries.
+
+        A removed session is reported with its summary, a new one with None.
+        """
+        with self._lock:
+            version = self._conn.execute("PRAGMA data_version").fetchone()[0]
+            if version == self._data_version:
+                return {}
+            self._data_version = version
+            previous = self._known
+            self._remember_all()
+            changes = {session_id: summary for session_id, summary in previous.items()
+                       if session_id not in self._known}
+            for session_id, summary in self._known.items():
+                earlier = previous.get(session_id)
+                if (earlier is None or earlier.updated_at != summary.updated_at
+                        or earlier.message_count != summary.message_count):
+                    changes[session_id] = earlier
+            return changes
+
+    def _remember(self, session_id: str):
+        """Note this instance's own change to a session, so it is not reported as external."""
+        summaries = self._summaries("WHERE id = ?", (session_id,))
+        if summaries:
+            self._known[session_id] = summaries[0]
+
+    def _remember_all(self):
+        self._known = {summary.id: summary for summary in self._summaries()}
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -37,4 +37,3 @@ class LeftPanel(QWidget):
 
     def _on_tab_changed(self, index: int):
         self.settings_manager.set("app.tabs.left_panel.active_tab", index)
-        self.settings_manager.save_settings()
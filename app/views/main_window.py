@@ -1,5 +1,5 @@
 from PyQt6.QtWidgets import QMainWindow, QWidget, QHBoxLayout, QSplitter
-from PyQt6.QtCore import Qt, QSize, QPoint
+from PyQt6.QtCore import Qt, QSize, QPoint, pyqtSignal
 from PyQt6.QtWidgets import QApplication
 from PyQt6.QtGui import QFont, QFontDatabase
 from app.views.left_panel import LeftPanel
@@ -7,11 +7,18 @@ from app.views.middle_panel import MiddlePanel
 from app.views.right_panel import RightPanel
 from app.services.settings_manager import SettingsManager
 from app.services.ui_theme_manager import UIThemeManager
+from app.services.request_scheduler import RequestScheduler
+from app.services.request_executor import RequestExecutor
 import os
 
 class MainWindow(QMainWindow):
     """Main window of the application."""
 
+    # Seconds a request status stays in the status bar.
+    STATUS_TIMEOUT = 10
+    # Request status from a pool thread, e.g. a retry after a rate limit.
+    request_status = pyqtSignal(str)
+
     def __init__(self, app: QApplication, settings_manager: SettingsManager):
         super().__init__()
         self.app = app
@@ -29,6 +36,11 @@ class MainWindow(QMainWindow):
         self._restore_window_state()
         self._restore_panel_sizes()
 
+        self.request_status.connect(
+            lambda message: self.statusBar().showMessage(message, self.STATUS_TIMEOUT * 1000)
+        )
+        self._unsubscribe_status = RequestScheduler.shared().subscribe(self.request_status.emit)
+
     def _configure_fonts(self):
         default_font = QFont("Helvetica", 10)
         self.app.setFont(default_font)
@@ -77,13 +89,20 @@ class MainWindow(QMainWindow):
             self.splitter.setSizes(default_sizes)
 
     def closeEvent(self, event):
+        self._unsubscribe_status()
+        # Stop requests before closing the storage their replies are saved to.
+        if not RequestExecutor.shared().shutdown():
+            print("Error closing: requests still running after the shutdown timeout")
         self._save_window_state()
+        self.settings_manager.flush()
+        self.left_panel.ai_assistant_tab.ai_assistant_service.shutdown()
         super().closeEvent(event)
 
     def _save_window_state(self):
-        self.settings_manager.set("app.window.size", [self.size().width(), self.size().height()])
-        self.settings_manager.set("app.window.pos", [self.pos().x(), self.pos().y()])
-        self.settings_manager.set("app.window.maximized", self.isMaximized())
+        with self.settings_manager.transaction():
+            self.settings_manager.set("app.window.size", [self.size().width(), self.size().height()])
+            self.settings_manager.set("app.window.pos", [self.pos().x(), self.pos().y()])
+            self.settings_manager.set("app.window.maximized", self.isMaximized())
 
     def _restore_window_state(self):
         default_size = [1024, 768]
@@ -1,4 +1,4 @@
-from PyQt6.QtWidgets import QWidget, QVBoxLayout, QPushButton, QTextEdit, QHBoxLayout, QFileDialog, QLabel, QMessageBox
+from PyQt6.QtWidgets import QWidget, QVBoxLayout, QPushButton, QTextEdit, QHBoxLayout, QFileDialog, QLabel, QMessageBox, QCheckBox
 from PyQt6.QtCore import pyqtSignal, Qt
 import os
 from datetime import datetime
@@ -17,12 +17,13 @@ class MiddlePanel(QWidget):
         self.save_location = None
         self.content_combiner = ContentCombinerService()
         self.selected_prompt = None
+        self._feedback_job = None
         self._create_ui()
         self._restore_last_folder()
         self._initialize_services()
 
     def _initialize_services(self):
-        self.ai_feedback_service = AIFeedbackService()
+        self.ai_feedback_service = AIFeedbackService(self.settings_manager)
 
     def _create_ui(self):
         layout = QVBoxLayout()
@@ -52,11 +53,22 @@ class MiddlePanel(QWidget):
         self.submit_button = QPushButton("Submit for Feedback")
         self.submit_button.clicked.connect(self.submit_for_feedback)
 
+        self.cancel_feedback_button = QPushButton("Cancel")
+        self.cancel_feedback_button.clicked.connect(self.cancel_feedback)
+        self.cancel_feedback_button.hide()
+
+        self.refresh_checkbox = QCheckBox("Fresh feedback")
+        self.refresh_checkbox.setToolTip(
+            "Ask the AI again even if this exact submission was reviewed before."
+        )
+
         self.clear_button = QPushButton("Clear")
         self.clear_button.clicked.connect(self.clear_text)
 
         buttons_layout.addWidget(self.save_button)
         buttons_layout.addWidget(self.submit_button)
+        buttons_layout.addWidget(self.cancel_feedback_button)
+        buttons_layout.addWidget(self.refresh_checkbox)
         buttons_layout.addWidget(self.clear_button)
         buttons_layout.addStretch()
 
@@ -135,36 +147,56 @@ class MiddlePanel(QWidget):
             QMessageBox.warning(self, "Error", "Please enter some text before requesting feedback.")
             return
 
-        self.submit_button.setEnabled(False)
-        self.submit_button.setText("Getting Feedback...")
-        self.text_editor.setReadOnly(True)
-        
-        try:
-            right_panel = self.window().right_panel
-            if right_panel:
-                select_criteria_tab = right_panel.select_criteria_tab
-                selected_criteria = select_criteria_tab.get_selected_criteria()
-                if not selected_criteria:
-                    selected_criteria = "Default criteria"
-
-                feedback = self.ai_feedback_service.get_feedback(
-                    submission=submission,
-                    criteria=selected_criteria,
-                    prompt=self.selected_prompt
-                )
-
-                if feedback:
-                    ai_feedback_tab = right_panel.ai_feedback_tab
-                    if ai_feedback_tab:
-                        ai_feedback_tab.display_feedback(feedback)
-                    else:
-                        QMessageBox.warning(self, "Error", "AI Feedback tab not found.")
-                else:
-                    QMessageBox.warning(self, "Error", "Failed to get feedback from AI.")
-        finally:
-            self.submit_button.setEnabled(True)
-            self.submit_button.setText("Submit for Feedback")
-            self.text_editor.setReadOnly(False)
+        right_panel = self.window().right_panel
+        if not right_panel:
+            return
+
+        selected_criteria = right_panel.select_criteria_tab.get_selected_criteria()
+        if not selected_criteria:
+            selected_criteria = "Default criteria"
+
+        self._set_submitting(True)
+        job = self.ai_feedback_service.get_feedback_async(
+            submission=submission,
+            criteria=selected_criteria,
+            prompt=self.selected_prompt,
+            refresh=self.refresh_checkbox.isChecked()
+        )
+        job.signals.result.connect(self._on_feedback)
+        job.signals.error.connect(
+            lambda error: QMessageBox.warning(self, "Error", f"Failed to get feedback from AI: {error}")
+        )
+        job.signals.finished.connect(self._on_feedback_finished)
+        self._feedback_job = job
+
+    def _on_feedback(self, feedback: str):
+        if not feedback:
+            QMessageBox.warning(self, "Error", "Failed to get feedback from AI.")
+            return
+        ai_feedback_tab = self.window().right_panel.ai_feedback_tab
+        if ai_feedback_tab:
+            ai_feedback_tab.display_feedback(feedback)
+        else:
+            QMessageBox.warning(self, "Error", "AI Feedback tab not found.")
+
+    def cancel_feedback(self):
+        if self._feedback_job is None:
+            return
+        self._feedback_job.cancel()
+        self.cancel_feedback_button.setEnabled(False)
+        self.cancel_feedback_button.setText("Cancelling...")
+
+    def _on_feedback_finished(self):
+        self._feedback_job = None
+        self._set_submitting(False)
+
+    def _set_submitting(self, submitting: bool):
+        self.submit_button.setEnabled(not submitting)
+        self.submit_button.setText("Getting Feedback..." if submitting else "Submit for Feedback")
+        self.cancel_feedback_button.setVisible(submitting)
+        self.cancel_feedback_button.setEnabled(True)
+        self.cancel_feedback_button.setText("Cancel")
+        self.text_editor.setReadOnly(submitting)
 
     def clear_text(self, force: bool = False):
         if not force and self.text_editor.toPlainText().strip():
@@ -39,4 +39,3 @@ class RightPanel(QWidget):
 
     def _on_tab_changed(self, index: int):
         self.settings_manager.set("app.tabs.right_panel.active_tab", index)
-        self.settings_manager.save_settings()
@@ -4,9 +4,14 @@ from PyQt6.QtWidgets import (
     QTextBrowser, 
     QLineEdit, 
     QPushButton, 
-    QHBoxLayout
+    QHBoxLayout,
+    QListWidget,
+    QListWidgetItem
 )
+from PyQt6.QtCore import Qt, QTimer, pyqtSignal
+from PyQt6.QtGui import QTextCursor
 from app.models.chat import Role
+from app.config.chat_config import CHAT_CONFIG
 from app.services.ai_assistant_service import AIAssistantService
 from app.services.settings_manager import SettingsManager
 from app.utils.ui_utils import show_warning, show_confirmation, render_markdown
@@ -14,28 +19,162 @@ from app.utils.ui_utils import show_warning, show_confirmation, render_markdown
 class AIAssistantTab(QWidget):
     """AI Assistant tab with chat interface."""
 
+    # Id of a session another instance of the application has changed.
+    session_changed_elsewhere = pyqtSignal(str)
+    # Why chat messages could not be saved; they are retried.
+    storage_error = pyqtSignal(str)
+
     def __init__(self, settings_manager: SettingsManager):
         super().__init__()
         self.setObjectName("AIAssistantTab")
         self.settings_manager = settings_manager
         self.ai_assistant_service = AIAssistantService(self.settings_manager)
         self.current_session_id = None
+        # Offsets of the oldest message rendered in the display and of the
+        # first one after the display; None while it shows the latest messages.
+        self._history_start = 0
+        self._history_end = None
+        self._loading_history = False
+        # Message being sent and the line of its "Processing request..." note.
+        self._pending_message = None
+        self._processing_line = 0
+        # Document positions of the reply being streamed: where its header
+        # starts and where its text starts.
+        self._stream_header_start = 0
+        self._stream_text_start = 0
+        # The request being sent, until it has finished.
+        self._active_job = None
         self._create_ui()
         self._initialize_chat()
+        # Emitted from the file watcher's thread, handled on the UI thread.
+        self.session_changed_elsewhere.connect(self._on_session_changed_elsewhere)
+        self.ai_assistant_service.chat_storage.subscribe(self.session_changed_elsewhere.emit)
+        # Emitted from the chat writer's thread.
+        self.storage_error.connect(self._on_storage_error)
+        self.ai_assistant_service.chat_storage.subscribe_errors(self.storage_error.emit)
 
     def _initialize_chat(self):
         self.current_session_id = self.ai_assistant_service.initialize_chat()
-        messages = self.ai_assistant_service.get_chat_messages(self.current_session_id)
-        
+        self._render_recent_history()
+
+    def _render_recent_history(self):
+        """Render only the most recent messages; older ones load on scroll."""
+        messages = self.ai_assistant_service.get_recent_chat_messages(
+            self.current_session_id,
+            CHAT_CONFIG["history"]["initial_messages"]
+        )
+        total = self.ai_assistant_service.get_chat_message_count(self.current_session_id)
+
+        for message in messages:
+            self._append_message(self._sender_for(message.role), message.content)
+        self._history_start = max(total - len(messages), 0)
+        self._history_end = None
+
+    def _show_latest_messages(self):
+        """Return to the end of the chat after browsing an earlier part of it."""
+        if self._history_end is None:
+            return
+        self._loading_history = True
+        self.chat_display.clear()
+        self._render_recent_history()
+        self._loading_history = False
+
+    def _on_session_changed_elsewhere(self, session_id: str):
+        """Show what another instance added to the open chat, unless a reply is in progress."""
+        if session_id != self.current_session_id or not self.send_button.isEnabled():
+            return
+        self._loading_history = True
+        self.chat_display.clear()
+        self._render_recent_history()
+        self._loading_history = False
+
+    def _on_storage_error(self, error: str):
+        self._append_message("System", f"{error}. Retrying in the background.")
+
+    def _sender_for(self, role: Role) -> str:
+        return "You" if role == Role.USER else "AI Assistant"
+
+    def _on_scroll(self, value: int):
+        scroll_bar = self.chat_display.verticalScrollBar()
+        if self._loading_history or not self.send_button.isEnabled():
+            return
+        if value == scroll_bar.minimum() and self._history_start > 0:
+            self._load_older_messages()
+        elif value == scroll_bar.maximum() and self._history_end is not None:
+            self._load_newer_messages()
+
+    def _load_older_messages(self):
+        page_size = CHAT_CONFIG["history"]["page_size"]
+        offset = max(self._history_start - page_size, 0)
+        messages = self.ai_assistant_service.get_chat_messages(
+            self.current_session_id,
+            offset=offset,
+            limit=self._history_start - offset
+        )
+        if not messages:
+            self._history_start = 0
+            return
+
+        self._loading_history = True
+        scroll_bar = self.chat_display.verticalScrollBar()
+        distance_from_bottom = scroll_bar.maximum() - scroll_bar.value()
+
+        cursor = self.chat_display.textCursor()
+        cursor.movePosition(cursor.MoveOperation.Start)
         for message in messages:
-            sender = "You" if message.role == Role.USER else "AI Assistant"
-            self._append_message(sender, message.content)
+            for fragment in self._message_fragments(self._sender_for(message.role), message.content):
+                cursor.insertHtml(fragment)
+                cursor.insertBlock()
+
+        # Keep the messages the user was looking at in place.
+        scroll_bar.setValue(scroll_bar.maximum() - distance_from_bottom)
+        self._history_start = offset
+        self._loading_history = False
+
+    def _load_newer_messages(self):
+        page_size = CHAT_CONFIG["history"]["page_size"]
+        messages = self.ai_assistant_service.get_chat_messages(
+            self.current_session_id,
+            offset=self._history_end,
+            limit=page_size
+        )
+        self._loading_history = True
+        scroll_bar = self.chat_display.verticalScrollBar()
+        position = scroll_bar.value()
+        for message in messages:
+            for fragment in self._message_fragments(self._sender_for(message.role), message.content):
+                self.chat_display.append(fragment)
+        # The messages were added below the view, which stays where it was.
+        scroll_bar.setValue(position)
+        self._history_end += len(messages)
+        if len(messages) < page_size:
+            self._history_end = None
+        self._loading_history = False
 
     def _create_ui(self):
         layout = QVBoxLayout()
 
+        self.search_input = QLineEdit()
+        self.search_input.setPlaceholderText("Search chat history...")
+        self.search_input.setClearButtonEnabled(True)
+        self.search_input.textChanged.connect(self._on_search_text_changed)
+        layout.addWidget(self.search_input)
+
+        self.search_timer = QTimer(self)
+        self.search_timer.setSingleShot(True)
+        self.search_timer.setInterval(CHAT_CONFIG["search"]["debounce_ms"])
+        self.search_timer.timeout.connect(self._run_search)
+
+        self.search_results = QListWidget()
+        self.search_results.setMaximumHeight(150)
+        self.search_results.itemActivated.connect(self._open_search_hit)
+        self.search_results.itemClicked.connect(self._open_search_hit)
+        self.search_results.hide()
+        layout.addWidget(self.search_results)
+
         self.chat_display = QTextBrowser()
         self.chat_display.setOpenExternalLinks(True)
+        self.chat_display.verticalScrollBar().valueChanged.connect(self._on_scroll)
         layout.addWidget(self.chat_display)
 
         input_layout = QHBoxLayout()
@@ -46,8 +185,13 @@ class AIAssistantTab(QWidget):
         self.send_button = QPushButton("Send")
         self.send_button.clicked.connect(self.send_message)
 
+        self.cancel_button = QPushButton("Cancel")
+        self.cancel_button.clicked.connect(self.cancel_request)
+        self.cancel_button.hide()
+
         input_layout.addWidget(self.message_input)
         input_layout.addWidget(self.send_button)
+        input_layout.addWidget(self.cancel_button)
 
         self.clear_button = QPushButton("Clear Chat")
         self.clear_button.clicked.connect(self.clear_chat)
@@ -57,6 +201,58 @@ class AIAssistantTab(QWidget):
         
         self.setLayout(layout)
 
+    def _on_search_text_changed(self, text: str):
+        if not text.strip():
+            self.search_timer.stop()
+            self.search_results.clear()
+            self.search_results.hide()
+            return
+        self.search_timer.start()
+
+    def _run_search(self):
+        hits = self.ai_assistant_service.search_chats(
+            self.search_input.text(),
+            CHAT_CONFIG["search"]["max_results"]
+        )
+        self.search_results.clear()
+        if not hits:
+            self.search_results.addItem("No matching messages")
+        for hit in hits:
+            item = QListWidgetItem(hit.snippet.replace('\n', ' '))
+            item.setData(Qt.ItemDataRole.UserRole, hit)
+            self.search_results.addItem(item)
+        self.search_results.show()
+
+    def _open_search_hit(self, item: QListWidgetItem):
+        """Show the session a search hit belongs to, a page from the hit on.
+
+        Scrolling loads the messages before and after that page.
+        """
+        hit = item.data(Qt.ItemDataRole.UserRole)
+        if hit is None or not self.send_button.isEnabled():
+            return
+        position = self.ai_assistant_service.get_chat_message_position(hit.session_id,
+                                                                       hit.message_id)
+        if position is None:
+            show_warning(self, "Search", "That message is no longer in the chat history.")
+            return
+
+        page_size = CHAT_CONFIG["history"]["page_size"]
+        messages = self.ai_assistant_service.get_chat_messages(hit.session_id, position, page_size)
+        self.current_session_id = hit.session_id
+        self._loading_history = True
+        self.chat_display.clear()
+        for message in messages:
+            self._append_message(self._sender_for(message.role), message.content)
+        self._history_start = position
+        self._history_end = position + len(messages) if len(messages) == page_size else None
+        scroll_bar = self.chat_display.verticalScrollBar()
+        scroll_bar.setValue(scroll_bar.minimum())
+        self._loading_history = False
+        # Give the user some context above the hit, which stays in view.
+        if self._history_start > 0:
+            self._load_older_messages()
+
     def send_message(self):
         if not self.ai_assistant_service.is_initialized():
             show_warning(
@@ -70,49 +266,145 @@ class AIAssistantTab(QWidget):
         if not message:
             return
 
-        self.message_input.setEnabled(False)
-        self.send_button.setEnabled(False)
-        self.send_button.setText("Sending...")
-        self.clear_button.setEnabled(False)
+        # The reply is shown after the latest messages, not the ones browsed.
+        self._show_latest_messages()
+        if self.ai_assistant_service.stream_responses():
+            self._start_streaming(message)
+            return
+
+        self._set_sending(True)
         
         self._append_message("System", "Processing request...")
-        last_message_index = self.chat_display.document().lineCount() - 2
+        self._processing_line = self.chat_display.document().lineCount() - 2
+        self._pending_message = message
 
-        try:
-            response = self.ai_assistant_service.send_message(
-                message=message,
-                session_id=self.current_session_id
-            )
+        job = self.ai_assistant_service.send_message_async(
+            message=message,
+            session_id=self.current_session_id
+        )
+        job.signals.result.connect(self._on_reply)
+        job.signals.error.connect(self._on_reply_error)
+        job.signals.cancelled.connect(self._on_reply_cancelled)
+        self._track_job(job)
 
-            self._remove_last_message(last_message_index)
+    def _on_reply(self, response: str):
+        self._remove_last_message(self._processing_line)
 
-            if response:
-                self._append_message("You", message)
-                self._append_message("AI Assistant", response)
-                self.message_input.clear()
-            else:
-                self._append_message("System", "Failed to get response from AI.")
+        if response:
+            self._append_message("You", self._pending_message)
+            self._append_message("AI Assistant", response)
+            self.message_input.clear()
+        else:
+            self._append_message("System", "Failed to get response from AI.")
+        self._set_sending(False)
 
-        except Exception as e:
-            self._remove_last_message(last_message_index)
-            self._append_message("System", f"Error: {str(e)}")
-        
-        finally:
-            self.message_input.setEnabled(True)
-            self.send_button.setEnabled(True)
-            self.send_button.setText("Send")
-            self.clear_button.setEnabled(True)
+    def _on_reply_error(self, error: str):
+        self._remove_last_message(self._processing_line)
+        self._append_message("System", f"Error: {error}")
+        self._set_sending(False)
+
+    def _on_reply_cancelled(self):
+        self._remove_last_message(self._processing_line)
+        self._append_message("System", "Request cancelled.")
+        self._set_sending(False)
+
+    def cancel_request(self):
+        if self._active_job is None:
+            return
+        self._active_job.cancel()
+        self.cancel_button.setEnabled(False)
+        self.cancel_button.setText("Cancelling...")
+
+    def _track_job(self, job):
+        self._active_job = job
+        job.signals.finished.connect(self._on_job_finished)
+
+    def _on_job_finished(self):
+        self._active_job = None
+
+    def _set_sending(self, sending: bool):
+        self.message_input.setEnabled(not sending)
+        self.send_button.setEnabled(not sending)
+        self.send_button.setText("Sending..." if sending else "Send")
+        self.cancel_button.setVisible(sending)
+        self.cancel_button.setEnabled(True)
+        self.cancel_button.setText("Cancel")
+        self.clear_button.setEnabled(not sending)
+        if not sending:
             self.message_input.setFocus()
 
-    def _append_message(self, sender: str, message: str):
-        if sender == "AI Assistant":
-            message_html = render_markdown(message)
-            self.chat_display.append(f"<b>{sender}:</b>")
-            self.chat_display.append(message_html)
-        else:
-            self.chat_display.append(f"<b>{sender}:</b> {message}")
+    def _start_streaming(self, message: str):
+        self._set_sending(True)
+        self._append_message("You", message)
 
+        self._stream_header_start = self._end_position()
+        self.chat_display.append("<b>AI Assistant:</b>")
         self.chat_display.append("")
+        self._stream_text_start = self._end_position()
+
+        job = self.ai_assistant_service.stream_message_async(message, self.current_session_id)
+        job.signals.progress.connect(self._on_stream_delta)
+        job.signals.result.connect(lambda pieces: self._on_stream_completed("".join(pieces)))
+        job.signals.error.connect(self._on_stream_error)
+        job.signals.cancelled.connect(self._on_stream_cancelled)
+        self._track_job(job)
+
+    def _end_position(self) -> int:
+        cursor = self.chat_display.textCursor()
+        cursor.movePosition(QTextCursor.MoveOperation.End)
+        return cursor.position()
+
+    def _on_stream_delta(self, text: str):
+        scroll_bar = self.chat_display.verticalScrollBar()
+        at_bottom = scroll_bar.value() == scroll_bar.maximum()
+        cursor = self.chat_display.textCursor()
+        cursor.movePosition(QTextCursor.MoveOperation.End)
+        cursor.insertText(text)
+        if at_bottom:
+            scroll_bar.setValue(scroll_bar.maximum())
+
+    def _on_stream_completed(self, response: str):
+        if not response:
+            self._remove_streamed_reply()
+            self._append_message("System", "Failed to get response from AI.")
+        else:
+            # Replace the raw streamed text with the rendered reply.
+            cursor = self.chat_display.textCursor()
+            cursor.setPosition(self._stream_text_start)
+            cursor.movePosition(QTextCursor.MoveOperation.End, QTextCursor.MoveMode.KeepAnchor)
+            cursor.insertHtml(render_markdown(response))
+            self.chat_display.append("")
+            self._scroll_to_bottom()
+            self.message_input.clear()
+        self._set_sending(False)
+
+    def _on_stream_error(self, error: str):
+        self._remove_streamed_reply()
+        self._append_message("System", f"Error: {error}")
+        self._set_sending(False)
+
+    def _on_stream_cancelled(self):
+        self._remove_streamed_reply()
+        self._append_message("System", "Request cancelled.")
+        self._set_sending(False)
+
+    def _remove_streamed_reply(self):
+        cursor = self.chat_display.textCursor()
+        cursor.setPosition(self._stream_header_start)
+        cursor.movePosition(QTextCursor.MoveOperation.End, QTextCursor.MoveMode.KeepAnchor)
+        cursor.removeSelectedText()
+
+    def _message_fragments(self, sender: str, message: str) -> list[str]:
+        if sender == "AI Assistant":
+            return [f"<b>{sender}:</b>", render_markdown(message), ""]
+        return [f"<b>{sender}:</b> {message}", ""]
+
+    def _append_message(self, sender: str, message: str):
+        for fragment in self._message_fragments(sender, message):
+            self.chat_display.append(fragment)
+        self._scroll_to_bottom()
+
+    def _scroll_to_bottom(self):
         self.chat_display.verticalScrollBar().setValue(
             self.chat_display.verticalScrollBar().maximum()
         )
@@ -123,6 +415,8 @@ class AIAssistantTab(QWidget):
             "Clear Chat",
             "Are you sure you want to clear the chat history?"
         ):
+            self._history_start = 0
+            self._history_end = None
             self.chat_display.clear()
             success = self.ai_assistant_service.clear_all_sessions()
             if not success:
@@ -132,11 +426,7 @@ class AIAssistantTab(QWidget):
                     "Failed to clear chat history from storage."
                 )
             self.current_session_id = self.ai_assistant_service.initialize_chat()
-            
-            messages = self.ai_assistant_service.get_chat_messages(self.current_session_id)
-            for message in messages:
-                sender = "You" if message.role == Role.USER else "AI Assistant"
-                self._append_message(sender, message.content)
+            self._render_recent_history()
 
     def _remove_last_message(self, line_index: int):
         cursor = self.chat_display.textCursor()
@@ -188,7 +188,6 @@ class SelectCriteriaTab(QWidget):
     def _save_and_verify_settings(self, key: str, value: any) -> bool:
         """Save settings and verify they were saved correctly."""
         self.settings_manager.set(key, value)
-        self.settings_manager.save_settings()
         
         # Verify save
         saved_value = self.settings_manager.get(key)
@@ -196,7 +195,6 @@ class SelectCriteriaTab(QWidget):
             logging.warning(f"Settings save verification failed for {key}. Expected {value}, got {saved_value}")
             # Retry save
             self.settings_manager.set(key, value)
-            self.settings_manager.save_settings()
             return False
         return True
 
@@ -216,7 +214,7 @@ class SelectCriteriaTab(QWidget):
     def closeEvent(self, event):
         """Ensure settings are saved before closing."""
         try:
-            self.settings_manager.save_settings()
+            self.settings_manager.flush()
         except Exception as e:
             logging.error(f"Error saving settings on close: {e}")
         super().closeEvent(event)
@@ -1,52 +1,30 @@
-from PyQt6.QtWidgets import QWidget, QVBoxLayout, QLabel, QLineEdit, QPushButton, QComboBox, QMessageBox, QHBoxLayout, QGroupBox, QFormLayout, QCheckBox
-from PyQt6.QtCore import QThread, pyqtSignal
+from PyQt6.QtWidgets import QWidget, QVBoxLayout, QLabel, QLineEdit, QPushButton, QComboBox, QMessageBox, QHBoxLayout, QGroupBox, QFormLayout, QCheckBox, QTableWidget, QTableWidgetItem, QAbstractItemView, QHeaderView
 from app.services.settings_manager import SettingsManager
 from app.services.secure_storage_service import SecureStorageService
 from app.services.ui_theme_manager import UIThemeManager
+from app.services.model_catalog_service import ModelCatalogService
+from app.services.llm_metrics_service import LLMMetricsService
 from app.config.chat_config import CHAT_CONFIG
 import json
 
-class ModelFetchWorker(QThread):
-    finished = pyqtSignal(list)
-    error = pyqtSignal(str)
-
-    def __init__(self, api_key):
-        super().__init__()
-        self.api_key = api_key
-
-    def run(self):
-        try:
-            import openai
-            client = openai.OpenAI(api_key=self.api_key)
-            models_response = client.models.list()
-            
-            model_info = []
-            excluded_terms = {'realtime', 'audio', 'vision'}
-            
-            for model in models_response.data:
-                if (model.id.startswith(('gpt-3.5', 'gpt-4', 'o1')) and 
-                    not any(term in model.id.lower() for term in excluded_terms)):
-                    model_info.append({
-                        'id': model.id,
-                        'name': model.id.replace('-', ' ').title(),
-                        'description': self._get_model_description(model.id)
-                    })
-            self.finished.emit(model_info)
-        except Exception as e:
-            self.error.emit(str(e))
-
-    def _get_model_description(self, model_id: str) -> str:
-        descriptions = {
-            'gpt-4': 'Most capable GPT-4 model, better at complex tasks',
-            'gpt-4-turbo-preview': 'Latest GPT-4 model with improved performance',
-            'gpt-3.5-turbo': 'Fast and efficient for simpler tasks',
-            'gpt-3.5-turbo-16k': 'Same capabilities as standard GPT-3.5 but with 4x the context length'
-        }
-        return descriptions.get(model_id, 'Standard model for general use')
-
 class SettingsTab(QWidget):
     """Settings tab for application configuration."""
 
+    # (header, key in LLMMetricsService.summary()); timings are in seconds.
+    USAGE_COLUMNS = [
+        ("Model", None),
+        ("Requests", "requests"),
+        ("Errors", "errors"),
+        ("Latency p50", "latency_p50"),
+        ("Latency p95", "latency_p95"),
+        ("First token p50", "ttft_p50"),
+        ("First token p95", "ttft_p95"),
+        ("Queued p95", "queue_p95"),
+        ("Tokens/s", "tokens_per_second_p50"),
+        ("Prompt tokens", "prompt_tokens"),
+        ("Completion tokens", "completion_tokens"),
+    ]
+
     def __init__(self, settings_manager: SettingsManager, ui_theme_manager: UIThemeManager):
         super().__init__()
         self.settings_manager = settings_manager
@@ -69,6 +47,11 @@ class SettingsTab(QWidget):
         self.api_key_input.setEchoMode(QLineEdit.EchoMode.Password)
         main_layout.addWidget(self.api_key_input)
 
+        main_layout.addWidget(QLabel("API Base URL (optional):"))
+        self.base_url_input = QLineEdit()
+        self.base_url_input.setPlaceholderText("https://api.openai.com/v1")
+        main_layout.addWidget(self.base_url_input)
+
         main_layout.addWidget(QLabel("OpenAI Model:"))
         model_layout = QHBoxLayout()
         self.model_combo = QComboBox()
@@ -121,7 +104,46 @@ class SettingsTab(QWidget):
         chat_layout.addLayout(welcome_layout)
         chat_group.setLayout(chat_layout)
         main_layout.addWidget(chat_group)
+
+        usage_group = QGroupBox("API Usage")
+        usage_layout = QVBoxLayout()
+        self.usage_table = QTableWidget(0, len(self.USAGE_COLUMNS))
+        self.usage_table.setHorizontalHeaderLabels([title for title, _ in self.USAGE_COLUMNS])
+        self.usage_table.setEditTriggers(QAbstractItemView.EditTrigger.NoEditTriggers)
+        self.usage_table.verticalHeader().setVisible(False)
+        self.usage_table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeMode.ResizeToContents)
+        usage_layout.addWidget(self.usage_table)
+
+        self.refresh_usage_button = QPushButton("Refresh Usage")
+        self.refresh_usage_button.clicked.connect(self.refresh_usage)
+        usage_layout.addWidget(self.refresh_usage_button)
+        usage_group.setLayout(usage_layout)
+        main_layout.addWidget(usage_group)
         main_layout.addStretch()
+        self.refresh_usage()
+
+    def showEvent(self, event):
+        super().showEvent(event)
+        self.refresh_usage()
+        # Pick up a background refresh of the model catalog.
+        if ModelCatalogService.shared().fetched_at != self._models_fetched_at:
+            self._populate_models()
+
+    def refresh_usage(self):
+        summary = LLMMetricsService.shared().summary()
+        self.usage_table.setRowCount(len(summary))
+        for row, (model, stats) in enumerate(summary.items()):
+            for column, (_, key) in enumerate(self.USAGE_COLUMNS):
+                value = model if key is None else stats[key]
+                if value is None:
+                    text = "-"
+                elif key and key.startswith(("latency", "ttft", "queue")):
+                    text = f"{value:.2f} s"
+                elif isinstance(value, float):
+                    text = f"{value:.1f}"
+                else:
+                    text = str(value)
+                self.usage_table.setItem(row, column, QTableWidgetItem(text))
 
     def load_settings(self):
         current_theme = self.settings_manager.get("app.theme", "Clean")
@@ -135,17 +157,24 @@ class SettingsTab(QWidget):
         if api_key:
             self.api_key_input.setText(api_key)
 
-        saved_models = self.settings_manager.get("openai.available_models", [])
-        selected_model = self.settings_manager.get("openai.model", "")
-        
-        if saved_models:
-            self.model_combo.clear()
-            model_ids = [model['id'] for model in saved_models]
-            self.model_combo.addItems(model_ids)
-            if selected_model:
-                index = self.model_combo.findText(selected_model)
-                if index >= 0:
-                    self.model_combo.setCurrentIndex(index)
+        self.base_url_input.setText(self.settings_manager.get("openai.base_url", "") or "")
+
+        self._populate_models()
+
+    def _populate_models(self):
+        catalog = ModelCatalogService.shared()
+        # Lists saved by older versions live in the settings file.
+        models = catalog.models() or self.settings_manager.get("openai.available_models", [])
+        self._models_fetched_at = catalog.fetched_at
+        if not models:
+            return
+        selected_model = self.model_combo.currentText() or self.settings_manager.get("openai.model", "")
+        self.model_combo.clear()
+        self.model_combo.addItems([model['id'] for model in models])
+        if selected_model:
+            index = self.model_combo.findText(selected_model)
+            if index >= 0:
+                self.model_combo.setCurrentIndex(index)
 
     def on_theme_changed(self, theme_name: str):
         if self.ui_theme_manager.apply_theme(theme_name):
@@ -165,20 +194,16 @@ class SettingsTab(QWidget):
             QMessageBox.warning(self, "Error", "Please enter an API key first.")
             return
 
-        self.worker = ModelFetchWorker(api_key)
-        self.worker.finished.connect(self._handle_models_fetched)
-        self.worker.error.connect(self._handle_fetch_error)
+        base_url = self.base_url_input.text().strip() or None
+        job = ModelCatalogService.shared().refresh_async(api_key, base_url)
+        job.signals.result.connect(self._handle_models_fetched)
+        job.signals.error.connect(self._handle_fetch_error)
         
         self.refresh_models_button.setEnabled(False)
         self.refresh_models_button.setText("Fetching...")
-        
-        self.worker.start()
 
     def _handle_models_fetched(self, model_info):
-        self.model_combo.clear()
-        self.model_combo.addItems([model['id'] for model in model_info])
-        
-        self.settings_manager.set("openai.available_models", model_info)
+        self._populate_models()
         self.refresh_models_button.setEnabled(True)
         self.refresh_models_button.setText("Refresh Models")
         QMessageBox.information(self, "Success", "Models updated successfully!")
@@ -196,9 +221,12 @@ class SettingsTab(QWidget):
             QMessageBox.warning(self, "Error", "Please enter an API key.")
             return
 
-        self.settings_manager.set("openai.api_key", api_key)
-        if selected_model:
-            self.settings_manager.set("openai.model", selected_model)
+        # One change: the client is rebuilt once, with the new key and URL.
+        with self.settings_manager.transaction():
+            self.settings_manager.set("openai.api_key", api_key)
+            self.settings_manager.set("openai.base_url", self.base_url_input.text().strip())
+            if selected_model:
+                self.settings_manager.set("openai.model", selected_model)
 
         QMessageBox.information(self, "Success", "Settings saved successfully!")
 
@@ -0,0 +1,159 @@
+"""Compare parse time and memory of the chat storage formats.
+
+Builds one large synthetic session, stores it in the original
+single-document JSON format and in the journal format, then loads each
+one repeatedly. Prints a JSON report with the best parse time, the peak
+allocation during a load and the memory retained by the loaded session.
+
+    python benchmarks/bench_chat_codec.py --messages 10000
+"""
+
+import argparse
+import gc
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+import uuid
+from dataclasses import dataclass
+from datetime import datetime
+from typing import List
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.config.chat_storage_config import CHAT_STORAGE_CONFIG
+from app.models.chat import ChatMessage, ChatSession, Role
+from app.services.journal_chat_store import JournalChatStore
+
+WORDS = ("the quick brown fox jumps over lazy dog writing story draft chapter "
+         "character plot scene voice tone revise edit feedback paragraph").split()
+
+@dataclass
+class LegacyChatMessage:
+    """The message model as it was before the compact representation."""
+    id: str
+    role: Role
+    content: str
+    timestamp: datetime
+    session_id: str
+
+@dataclass
+class LegacyChatSession:
+    id: str
+    messages: List[LegacyChatMessage]
+    created_at: datetime
+    updated_at: datetime
+
+def load_legacy(file_path: str) -> LegacyChatSession:
+    """The original ChatStorageService._load_session."""
+    with open(file_path, 'r') as f:
+        data = json.load(f)
+        return LegacyChatSession(
+            id=data['id'],
+            messages=[
+                LegacyChatMessage(
+                    id=msg['id'],
+                    role=Role(msg['role']),
+                    content=msg['content'],
+                    timestamp=datetime.fromisoformat(msg['timestamp']),
+                    session_id=msg['session_id']
+                )
+                for msg in data['messages']
+            ],
+            created_at=datetime.fromisoformat(data['created_at']),
+            updated_at=datetime.fromisoformat(data['updated_at'])
+        )
+
+def build_session(message_count: int, words_per_message: int) -> ChatSession:
+    rng = random.Random(42)
+    start = time.time() - message_count * 60
+    messages = [
+        ChatMessage(
+            id=str(uuid.uuid4()),
+            role=Role.USER if i % 2 else Role.ASSISTANT,
+            content=" ".join(rng.choice(WORDS) for _ in range(words_per_message)),
+            created=start + i * 60
+        )
+        for i in range(message_count)
+    ]
+    now = datetime.now()
+    return ChatSession(id=str(uuid.uuid4()), messages=messages, created_at=now, updated_at=now)
+
+def write_legacy(session: ChatSession, file_path: str):
+    """Write the session exactly as the original _save_session did."""
+    with open(file_path, 'w') as f:
+        json.dump({
+            'id': session.id,
+            'messages': [
+                {
+                    'id': msg.id,
+                    'role': msg.role.value,
+                    'content': msg.content,
+                    'timestamp': msg.timestamp.isoformat(),
+                    'session_id': session.id
+                }
+                for msg in session.messages
+            ],
+            'created_at': session.created_at.isoformat(),
+            'updated_at': session.updated_at.isoformat()
+        }, f, indent=2)
+
+def measure(load, repeat: int) -> dict:
+    timings = []
+    for _ in range(repeat):
+        gc.collect()
+        started = time.perf_counter()
+        load()
+        timings.append(time.perf_counter() - started)
+
+    gc.collect()
+    tracemalloc.start()
+    result = load()
+    retained, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    return {
+        'best_seconds': min(timings),
+        'median_seconds': sorted(timings)[len(timings) // 2],
+        'peak_bytes': peak,
+        'retained_bytes': retained,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--messages', type=int, default=10000)
+    parser.add_argument('--words', type=int, default=60, help="words per message")
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    session = build_session(args.messages, args.words)
+    with tempfile.TemporaryDirectory() as base_dir:
+        legacy_path = os.path.join(base_dir, 'legacy', f"{session.id}.json")
+        os.makedirs(os.path.dirname(legacy_path))
+        write_legacy(session, legacy_path)
+
+        store = JournalChatStore(os.path.join(base_dir, 'journal'), CHAT_STORAGE_CONFIG)
+        store.create_session(session)
+        journal_path = store._journal_path(session.id)
+
+        legacy = measure(lambda: load_legacy(legacy_path), args.repeat)
+        journal = measure(lambda: store.load_session(session.id), args.repeat)
+        legacy['file_bytes'] = os.path.getsize(legacy_path)
+        journal['file_bytes'] = os.path.getsize(journal_path)
+
+    report = {
+        'messages': args.messages,
+        'words_per_message': args.words,
+        'legacy_json': legacy,
+        'journal': journal,
+        'speedup': legacy['best_seconds'] / journal['best_seconds'],
+        'retained_ratio': journal['retained_bytes'] / legacy['retained_bytes'],
+    }
+    json.dump(report, sys.stdout, indent=2)
+    print()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,266 @@
+"""Measure chat storage operations as the history grows.
+
+For every backend and corpus size, generates a synthetic chat history
+into a temporary base directory and times the ChatStorageService calls
+the app makes: add_message, get_session_messages, get_last_session,
+remove_session and clear_all_sessions. Prints a JSON report with the
+throughput, p50/p99 latency and peak traced memory of each operation.
+
+    python benchmarks/bench_chat_storage.py --sessions 1 1000 100000 --messages 1 100 10000
+"""
+
+import argparse
+import gc
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+import uuid
+from datetime import datetime
+from typing import Callable, List, Sequence
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.config.chat_storage_config import CHAT_STORAGE_CONFIG
+from app.models.chat import ChatMessage, ChatSession, Role
+from app.services.chat_storage_service import ChatStorageService
+
+WORDS = ("the quick brown fox jumps over lazy dog writing story draft chapter "
+         "character plot scene voice tone revise edit feedback paragraph").split()
+# Distinct message texts generated up front; corpora reuse them.
+CONTENT_POOL_SIZE = 1000
+
+def percentile(sorted_values: Sequence[float], fraction: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, round(fraction * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+def summarize(latencies: List[float], extra_seconds: float = 0.0) -> dict:
+    """Throughput and latency percentiles; ``extra_seconds`` counts toward throughput only."""
+    latencies = sorted(latencies)
+    total = sum(latencies) + extra_seconds
+    return {
+        'ops': len(latencies),
+        'throughput_per_second': len(latencies) / total if total else None,
+        'p50_ms': percentile(latencies, 0.50) * 1000,
+        'p99_ms': percentile(latencies, 0.99) * 1000,
+        'max_ms': latencies[-1] * 1000 if latencies else 0.0,
+    }
+
+def timed(calls: List[Callable[[], object]], before: Callable[[], None] = None) -> List[float]:
+    latencies = []
+    for call in calls:
+        if before:
+            before()
+        started = time.perf_counter()
+        call()
+        latencies.append(time.perf_counter() - started)
+    return latencies
+
+def traced_peak(run: Callable[[], object]) -> int:
+    """Peak bytes allocated by ``run`` beyond what was live when it started."""
+    gc.collect()
+    tracemalloc.start()
+    tracemalloc.reset_peak()
+    baseline = tracemalloc.get_traced_memory()[0]
+    run()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak - baseline
+
+def directory_bytes(path: str) -> int:
+    total = 0
+    for root, _, files in os.walk(path):
+        for file in files:
+            try:
+                total += os.path.getsize(os.path.join(root, file))
+            except OSError:
+                pass
+    return total
+
+def generate_corpus(service: ChatStorageService, sessions: int, messages: int,
+                    rng: random.Random, words: int) -> List[str]:
+    """Write ``sessions`` sessions of ``messages`` messages straight to the store.
+
+    Sessions are spread over the last ``sessions`` minutes, oldest first,
+    so the last id returned is the latest session.
+    """
+    pool = [" ".join(rng.choice(WORDS) for _ in range(words)) for _ in range(CONTENT_POOL_SIZE)]
+    start = time.time() - sessions * 60 - messages
+    session_ids = []
+    for i in range(sessions):
+        created = start + i * 60
+        session = ChatSession(
+            id=str(uuid.uuid4()),
+            messages=[
+                ChatMessage(
+                    id=str(uuid.uuid4()),
+                    role=Role.USER if j % 2 else Role.ASSISTANT,
+                    content=pool[rng.randrange(CONTENT_POOL_SIZE)],
+                    created=created + j * 0.001
+                )
+                for j in range(messages)
+            ],
+            created_at=datetime.fromtimestamp(created),
+            updated_at=datetime.fromtimestamp(created + messages * 0.001)
+        )
+        service.store.create_session(session)
+        session_ids.append(session.id)
+    return session_ids
+
+def bench_corpus(backend: str, sessions: int, messages: int, args) -> dict:
+    rng = random.Random(args.seed)
+    with tempfile.TemporaryDirectory() as temp_dir:
+        base_dir = os.path.join(temp_dir, 'chats')
+        service = ChatStorageService(base_dir=base_dir, backend=backend)
+        started = time.perf_counter()
+        session_ids = generate_corpus(service, sessions, messages, rng, args.words)
+        corpus_seconds = time.perf_counter() - started
+        index_seconds = None
+        if args.search:
+            started = time.perf_counter()
+            service.rebuild_search_index()
+            index_seconds = time.perf_counter() - started
+        service.close()
+        disk_bytes = directory_bytes(base_dir)
+        # A pristine copy to measure clear_all_sessions' memory on.
+        shutil.copytree(base_dir, os.path.join(temp_dir, 'copy'))
+
+        started = time.perf_counter()
+        service = ChatStorageService(base_dir=base_dir, backend=backend)
+        open_seconds = time.perf_counter() - started
+
+        def sample(count: int) -> List[str]:
+            return [rng.choice(session_ids) for _ in range(count)]
+
+        def add_messages(targets: List[str]):
+            return [
+                lambda session_id=session_id: service.add_message(
+                    session_id, Role.USER, "benchmark message " * (args.words // 2))
+                for session_id in targets
+            ]
+
+        def read_sessions(targets: List[str]):
+            return [lambda session_id=session_id: service.get_session_messages(session_id)
+                    for session_id in targets]
+
+        def run_all(calls: List[Callable[[], object]], before: Callable[[], None] = None):
+            return lambda: timed(calls, before)
+
+        ops = {}
+        latencies = timed(add_messages(sample(args.ops)))
+        started = time.perf_counter()
+        service.flush()
+        flush_seconds = time.perf_counter() - started
+        ops['add_message'] = summarize(latencies, flush_seconds)
+        ops['add_message']['flush_seconds'] = flush_seconds
+        traced_adds = add_messages(sample(args.memory_ops)) + [service.flush]
+        ops['add_message']['peak_bytes'] = traced_peak(run_all(traced_adds))
+
+        # Cold reads: the session cache is emptied before each call.
+        ops['get_session_messages'] = summarize(
+            timed(read_sessions(sample(args.ops)), before=service.cache.clear)
+        )
+        ops['get_session_messages']['peak_bytes'] = traced_peak(
+            run_all(read_sessions(sample(args.memory_ops)), before=service.cache.clear)
+        )
+
+        cached = sample(1) * args.ops
+        service.get_session_messages(cached[0])
+        ops['get_session_messages_cached'] = summarize(timed(read_sessions(cached)))
+
+        last_session = [service.get_last_session] * args.ops
+        ops['get_last_session'] = summarize(timed(last_session))
+        ops['get_last_session']['peak_bytes'] = traced_peak(run_all(last_session[:args.memory_ops]))
+
+        if args.search:
+            queries = [" ".join(rng.sample(WORDS, 2)) for _ in range(args.ops)]
+            searches = [lambda query=query: service.search(query) for query in queries]
+            ops['search'] = summarize(timed(searches))
+            ops['search']['peak_bytes'] = traced_peak(run_all(searches[:args.memory_ops]))
+
+        # Remove distinct sessions, keeping at least half of the corpus.
+        removable = rng.sample(session_ids, min(sessions // 2, args.ops + args.memory_ops))
+        removals = [lambda session_id=session_id: service.remove_session(session_id)
+                    for session_id in removable]
+        ops['remove_session'] = summarize(timed(removals[:args.ops]))
+        ops['remove_session']['peak_bytes'] = traced_peak(run_all(removals[args.ops:]))
+
+        ops['clear_all_sessions'] = summarize(timed([service.clear_all_sessions]))
+        service.close()
+        copy = ChatStorageService(base_dir=os.path.join(temp_dir, 'copy'), backend=backend)
+        ops['clear_all_sessions']['peak_bytes'] = traced_peak(copy.clear_all_sessions)
+        copy.close()
+
+    return {
+        'backend': backend,
+        'sessions': sessions,
+        'messages_per_session': messages,
+        'corpus_seconds': corpus_seconds,
+        'index_seconds': index_seconds,
+        'open_seconds': open_seconds,
+        'disk_bytes': disk_bytes,
+        'operations': ops,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--backend', nargs='+', default=['journal', 'sqlite'],
+                        choices=sorted(ChatStorageService.STORES))
+    parser.add_argument('--sessions', nargs='+', type=int, default=[1, 100, 1000])
+    parser.add_argument('--messages', nargs='+', type=int, default=[1, 100],
+                        help="messages per session")
+    parser.add_argument('--words', type=int, default=30, help="words per message")
+    parser.add_argument('--ops', type=int, default=200, help="timed calls per operation")
+    parser.add_argument('--memory-ops', type=int, default=20,
+                        help="calls per operation traced for peak memory")
+    parser.add_argument('--max-total-messages', type=int, default=2_000_000,
+                        help="skip corpora larger than this")
+    parser.add_argument('--search', action='store_true',
+                        help="build the full-text index and time search too")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', help="write the report here instead of stdout")
+    args = parser.parse_args()
+
+    # Measure the store itself; background housekeeping would skew timings.
+    CHAT_STORAGE_CONFIG['archive']['enabled'] = False
+    CHAT_STORAGE_CONFIG['search']['enabled'] = args.search
+
+    results, skipped = [], []
+    for backend in args.backend:
+        for sessions in args.sessions:
+            for messages in args.messages:
+                if sessions * messages > args.max_total_messages:
+                    skipped.append({'backend': backend, 'sessions': sessions,
+                                    'messages_per_session': messages})
+                    continue
+                print(f"{backend}: {sessions} sessions x {messages} messages", file=sys.stderr)
+                results.append(bench_corpus(backend, sessions, messages, args))
+
+    report = {
+        'settings': {
+            'words_per_message': args.words,
+            'ops': args.ops,
+            'memory_ops': args.memory_ops,
+            'seed': args.seed,
+            'write_behind': CHAT_STORAGE_CONFIG['write_behind'],
+            'cache': CHAT_STORAGE_CONFIG['cache'],
+        },
+        'results': results,
+        'skipped': skipped,
+    }
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,251 @@
+"""Measure the app's OpenAI request path against the local mock server.
+
+Starts benchmarks/mock_openai_server.py in-process, points the services
+at it through the ``openai.base_url`` setting and drives them from
+``--concurrency`` threads, the way the request executor does. For each
+request path and concurrency it reports end-to-end latency,
+time-to-first-token (streaming paths), throughput and errors as JSON.
+Every request sends a different prompt, so none are coalesced with
+another in flight:
+
+    completion        OpenAIService.get_chat_completion
+    stream            OpenAIService.stream_chat_completion
+    assistant         AIAssistantService.send_message
+    assistant_stream  AIAssistantService.stream_message
+    feedback          AIFeedbackService.get_feedback (cache bypassed)
+
+    python benchmarks/bench_openai_requests.py --requests 100 --concurrency 1 4 8 \\
+        --latency 0.3 --tokens-per-second 80 --rate-limit-rate 0.05
+"""
+
+import argparse
+import atexit
+import contextlib
+import itertools
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+from typing import Iterable, List, Optional
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from mock_openai_server import MockOpenAIServer, add_arguments, settings_from_args
+from bench_chat_storage import percentile
+
+PATHS = ['completion', 'stream', 'assistant', 'assistant_stream', 'feedback']
+MOCK_API_KEY = 'sk-mock'
+FAILED_REPLY = "I'm sorry"
+
+def latency_summary(values: List[float]) -> dict:
+    values = sorted(values)
+    return {
+        'p50_ms': percentile(values, 0.50) * 1000,
+        'p95_ms': percentile(values, 0.95) * 1000,
+        'p99_ms': percentile(values, 0.99) * 1000,
+        'max_ms': values[-1] * 1000 if values else 0.0,
+    }
+
+class Sample:
+    """Timings of one request."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.first_token: Optional[float] = None
+        self.latency: Optional[float] = None
+        self.tokens = 0
+        self.error: Optional[str] = None
+
+    def consume(self, deltas: Iterable[str]):
+        for delta in deltas:
+            if self.first_token is None:
+                self.first_token = time.perf_counter() - self.started
+            self.tokens += len(delta.split())
+
+    def finish(self, reply: Optional[str] = None):
+        self.latency = time.perf_counter() - self.started
+        if reply is not None:
+            self.tokens = len(reply.split())
+
+class Harness:
+    """The services under test, all pointed at the mock server."""
+
+    def __init__(self, args):
+        # Imported late: the services read settings from the temporary home.
+        from app.services.settings_manager import SettingsManager
+        from app.services.openai_service import OpenAIService
+        from app.services.ai_assistant_service import AIAssistantService
+        from app.services.ai_feedback_service import AIFeedbackService
+
+        self.settings_manager = SettingsManager.shared()
+        self.openai_service = OpenAIService(self.settings_manager)
+        self.openai_service.initialize(MOCK_API_KEY)
+        self.assistant = AIAssistantService(self.settings_manager)
+        self.assistant.openai_service.initialize(MOCK_API_KEY)
+        self.feedback = AIFeedbackService(self.settings_manager)
+        self.feedback.openai_service.initialize(MOCK_API_KEY)
+        self.model = args.model
+        self.prompt = "Suggest a stronger opening line for my short story. " * (args.prompt_words // 9 + 1)
+        self._request_numbers = itertools.count(1)
+        self._local = threading.local()
+
+    def next_prompt(self) -> str:
+        """The prompt numbered, so identical requests are not coalesced into one."""
+        return f"Request {next(self._request_numbers)}. {self.prompt}"
+
+    def close(self):
+        """Save settings now, while the temporary home still exists."""
+        self.assistant.shutdown()
+        self.settings_manager.flush()
+        atexit.unregister(self.settings_manager.flush)
+
+    def session_id(self) -> str:
+        """One chat session per worker thread, as each chat tab has its own."""
+        if not hasattr(self._local, 'session_id'):
+            self._local.session_id = self.assistant.chat_storage.create_session().id
+        return self._local.session_id
+
+    def call(self, path: str) -> Sample:
+        sample = Sample()
+        prompt = self.next_prompt()
+        messages = [{'role': 'user', 'content': prompt}]
+        try:
+            if path == 'completion':
+                reply = self.openai_service.get_chat_completion(messages, self.model)
+                if reply is None:
+                    sample.error = "no completion"
+                sample.finish(reply or "")
+            elif path == 'stream':
+                sample.consume(self.openai_service.stream_chat_completion(messages, self.model))
+                sample.finish()
+            elif path == 'assistant':
+                reply = self.assistant.send_message(prompt, self.session_id())
+                if reply.startswith(FAILED_REPLY):
+                    sample.error = "failed reply"
+                sample.finish(reply)
+            elif path == 'assistant_stream':
+                sample.consume(self.assistant.stream_message(prompt, self.session_id()))
+                sample.finish()
+            elif path == 'feedback':
+                reply = self.feedback.get_feedback(prompt, "Clarity and voice", refresh=True)
+                if not reply:
+                    sample.error = "no feedback"
+                sample.finish(reply or "")
+        except Exception as e:
+            sample.finish()
+            sample.error = str(e)
+        return sample
+
+def run(harness: Harness, path: str, requests: int, concurrency: int) -> dict:
+    """``requests`` calls spread over ``concurrency`` threads, each calling back to back."""
+    samples: List[Sample] = []
+    lock = threading.Lock()
+
+    def worker(index: int):
+        for _ in range(index, requests, concurrency):
+            sample = harness.call(path)
+            with lock:
+                samples.append(sample)
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall_seconds = time.perf_counter() - started
+
+    ok = [sample for sample in samples if not sample.error]
+    result = {
+        'path': path,
+        'concurrency': concurrency,
+        'requests': len(samples),
+        'errors': len(samples) - len(ok),
+        'wall_seconds': wall_seconds,
+        'requests_per_second': len(ok) / wall_seconds if wall_seconds else None,
+        'tokens_per_second': sum(s.tokens for s in ok) / wall_seconds if wall_seconds else None,
+        'latency': latency_summary([s.latency for s in ok]),
+    }
+    first_tokens = [s.first_token for s in ok if s.first_token is not None]
+    if first_tokens:
+        result['time_to_first_token'] = latency_summary(first_tokens)
+    error_messages = sorted({s.error for s in samples if s.error})
+    if error_messages:
+        result['error_messages'] = error_messages[:5]
+    return result
+
+def write_settings(home: str, base_url: str, args):
+    settings_dir = os.path.join(home, '.aiwritingassistant')
+    os.makedirs(settings_dir, exist_ok=True)
+    settings = {
+        'openai': {'base_url': base_url, 'model': args.model, 'max_tokens': args.max_tokens,
+                   'temperature': 0.7},
+        'chat': {'stream_responses': True},
+    }
+    with open(os.path.join(settings_dir, 'settings.json'), 'w') as f:
+        json.dump(settings, f)
+
+def configure_limits(args):
+    from app.config.openai_config import OPENAI_CONFIG
+    limits = OPENAI_CONFIG['rate_limits']
+    # Without explicit client limits, only the mock server's limits apply.
+    limits['default'] = {'requests_per_minute': args.client_rpm or 10 ** 9,
+                         'tokens_per_minute': args.client_tpm or 10 ** 12}
+    limits['models'] = {}
+    OPENAI_CONFIG['requests']['max_concurrent'] = max(args.concurrency)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--paths', nargs='+', default=PATHS, choices=PATHS)
+    parser.add_argument('--concurrency', nargs='+', type=int, default=[1, 4])
+    parser.add_argument('--requests', type=int, default=40, help="requests per path and concurrency")
+    parser.add_argument('--model', default='gpt-4')
+    parser.add_argument('--max-tokens', type=int, default=256)
+    parser.add_argument('--prompt-words', type=int, default=50)
+    parser.add_argument('--client-rpm', type=int, default=0,
+                        help="client-side requests per minute; 0 for unlimited")
+    parser.add_argument('--client-tpm', type=int, default=0,
+                        help="client-side tokens per minute; 0 for unlimited")
+    parser.add_argument('--output', help="write the report here instead of stdout")
+    add_arguments(parser)
+    args = parser.parse_args()
+
+    server = MockOpenAIServer(settings_from_args(args)).start()
+    results = []
+    with tempfile.TemporaryDirectory() as home:
+        os.environ['HOME'] = home
+        write_settings(home, server.base_url, args)
+        # The services report retries and errors with print(); keep stdout for the report.
+        with contextlib.redirect_stdout(sys.stderr):
+            configure_limits(args)
+            harness = Harness(args)
+            for path in args.paths:
+                for concurrency in args.concurrency:
+                    print(f"{path}: concurrency {concurrency}")
+                    results.append(run(harness, path, args.requests, concurrency))
+            harness.close()
+    server.stop()
+
+    report = {
+        'settings': {
+            'model': args.model,
+            'max_tokens': args.max_tokens,
+            'requests': args.requests,
+            'mock_server': vars(settings_from_args(args)),
+            'client_rpm': args.client_rpm,
+            'client_tpm': args.client_tpm,
+        },
+        'server_stats': server.stats,
+        'results': results,
+    }
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+
+if __name__ == '__main__':
+    main()
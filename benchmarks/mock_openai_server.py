@@ -0,0 +1,284 @@
+"""Local stand-in for the OpenAI API, for benchmarks and offline testing.
+
+Implements POST /v1/chat/completions (plain and ``stream=True``
+server-sent events) and GET /v1/models. Replies are generated text whose
+timing is configurable: ``--latency`` before the first token, then
+``--tokens-per-second``. Failures can be injected: ``--error-rate`` answers
+with 500s, ``--rate-limit-rate`` with 429s, and ``--requests-per-minute``
+enforces a real sliding-window limit with retry-after and x-ratelimit
+headers.
+
+    python benchmarks/mock_openai_server.py --port 8765 --latency 0.3 --tokens-per-second 80
+
+Then point the app at it by setting ``openai.base_url`` to
+``http://127.0.0.1:8765/v1`` in ~/.aiwritingassistant/settings.json.
+"""
+
+import argparse
+import json
+import random
+import threading
+import time
+import uuid
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import List, Optional
+
+DEFAULT_MODELS = ['gpt-4', 'gpt-4o', 'gpt-3.5-turbo', 'o1-mini']
+REPLY_WORDS = ("your draft reads well but the middle section could use a clearer "
+               "transition and the ending would land harder with a concrete image").split()
+
+class MockSettings:
+    """Behaviour of the mock server; every field maps to a command-line flag."""
+
+    def __init__(self, latency: float = 0.2, jitter: float = 0.0,
+                 tokens_per_second: float = 100.0, reply_tokens: int = 60,
+                 error_rate: float = 0.0, rate_limit_rate: float = 0.0,
+                 requests_per_minute: int = 0, retry_after: float = 1.0,
+                 models: Optional[List[str]] = None, seed: Optional[int] = None):
+        self.latency = latency
+        self.jitter = jitter
+        self.tokens_per_second = tokens_per_second
+        self.reply_tokens = reply_tokens
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.requests_per_minute = requests_per_minute
+        self.retry_after = retry_after
+        self.models = models or DEFAULT_MODELS
+        self.seed = seed
+
+class MockOpenAIServer(ThreadingHTTPServer):
+    """The HTTP server; ``start()`` serves on a daemon thread for in-process use."""
+
+    daemon_threads = True
+
+    def __init__(self, settings: MockSettings, host: str = '127.0.0.1', port: int = 0):
+        super().__init__((host, port), MockRequestHandler)
+        self.settings = settings
+        self.random = random.Random(settings.seed)
+        self._lock = threading.Lock()
+        self._window = deque()  # Start times of requests in the last minute
+        self.stats = {'requests': 0, 'completions': 0, 'rate_limited': 0, 'errors': 0}
+        self._thread = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def start(self) -> 'MockOpenAIServer':
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+    def admit(self) -> Optional[dict]:
+        """Decide the fate of a completion request; returns the failure to send, if any."""
+        settings = self.settings
+        with self._lock:
+            self.stats['requests'] += 1
+            now = time.monotonic()
+            while self._window and now - self._window[0] >= 60:
+                self._window.popleft()
+            limit = settings.requests_per_minute
+            if limit and len(self._window) >= limit:
+                self.stats['rate_limited'] += 1
+                reset = 60 - (now - self._window[0])
+                return {'status': 429, 'message': "Rate limit reached for requests",
+                        'code': 'rate_limit_exceeded',
+                        'headers': self._limit_headers(0, reset)}
+            roll = self.random.random()
+            if roll < settings.rate_limit_rate:
+                self.stats['rate_limited'] += 1
+                return {'status': 429, 'message': "Rate limit reached (injected)",
+                        'code': 'rate_limit_exceeded',
+                        'headers': {'retry-after': f"{settings.retry_after:g}"}}
+            if roll < settings.rate_limit_rate + settings.error_rate:
+                self.stats['errors'] += 1
+                return {'status': 500, 'message': "The server had an error (injected)",
+                        'code': None, 'headers': {}}
+            self._window.append(now)
+            self.stats['completions'] += 1
+            return None
+
+    def success_headers(self) -> dict:
+        limit = self.settings.requests_per_minute
+        if not limit:
+            return {}
+        with self._lock:
+            now = time.monotonic()
+            reset = 60 - (now - self._window[0]) if self._window else 0
+            return self._limit_headers(limit - len(self._window), reset)
+
+    def _limit_headers(self, remaining: int, reset: float) -> dict:
+        return {
+            'x-ratelimit-limit-requests': str(self.settings.requests_per_minute),
+            'x-ratelimit-remaining-requests': str(max(0, remaining)),
+            'x-ratelimit-reset-requests': f"{max(0.0, reset):.3f}s",
+            'retry-after-ms': str(int(max(0.0, reset) * 1000)) if remaining <= 0 else None,
+        }
+
+    def first_token_delay(self) -> float:
+        with self._lock:
+            jitter = self.random.uniform(-self.settings.jitter, self.settings.jitter)
+        return max(0.0, self.settings.latency + jitter)
+
+class MockRequestHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # Keep-alive, like the real API
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        if self.path.rstrip('/') != '/v1/models':
+            return self._send_error(404, f"Unknown path {self.path}")
+        data = [{'id': model, 'object': 'model', 'created': 0, 'owned_by': 'mock'}
+                for model in self.server.settings.models]
+        self._send_json(200, {'object': 'list', 'data': data})
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get('content-length', 0)))
+        if self.path.rstrip('/') != '/v1/chat/completions':
+            return self._send_error(404, f"Unknown path {self.path}")
+        try:
+            request = json.loads(body)
+        except ValueError:
+            return self._send_error(400, "Request body is not JSON")
+
+        failure = self.server.admit()
+        if failure:
+            return self._send_error(failure['status'], failure['message'],
+                                    failure['code'], failure['headers'])
+
+        model = request.get('model', 'gpt-4')
+        limit = request.get('max_tokens') or request.get('max_completion_tokens')
+        count = self.server.settings.reply_tokens
+        if limit:
+            count = min(count, limit)
+        tokens = [(" " if i else "") + REPLY_WORDS[i % len(REPLY_WORDS)] for i in range(count)]
+        prompt_tokens = sum(len(str(m.get('content', ''))) // 4 + 4
+                            for m in request.get('messages', []))
+        usage = {'prompt_tokens': prompt_tokens, 'completion_tokens': count,
+                 'total_tokens': prompt_tokens + count}
+        completion_id = f"chatcmpl-{uuid.uuid4().hex[:24]}"
+        headers = self.server.success_headers()
+
+        time.sleep(self.server.first_token_delay())
+        if request.get('stream'):
+            self._stream(completion_id, model, tokens, usage, headers, request)
+        else:
+            time.sleep(max(0, count - 1) / self.server.settings.tokens_per_second)
+            self._send_json(200, {
+                'id': completion_id, 'object': 'chat.completion', 'created': int(time.time()),
+                'model': model,
+                'choices': [{'index': 0, 'finish_reason': 'stop',
+                             'message': {'role': 'assistant', 'content': ''.join(tokens)}}],
+                'usage': usage,
+            }, headers)
+
+    def _stream(self, completion_id: str, model: str, tokens: List[str], usage: dict,
+                headers: dict, request: dict):
+        self.send_response(200)
+        self.send_header('content-type', 'text/event-stream')
+        self.send_header('cache-control', 'no-cache')
+        self.send_header('connection', 'close')
+        self._send_headers(headers)
+        self.end_headers()
+        self.close_connection = True
+
+        def chunk(delta: dict, finish_reason: Optional[str] = None, chunk_usage=None):
+            payload = {'id': completion_id, 'object': 'chat.completion.chunk',
+                       'created': int(time.time()), 'model': model,
+                       'choices': [{'index': 0, 'delta': delta, 'finish_reason': finish_reason}]}
+            if chunk_usage:
+                payload['choices'] = []
+                payload['usage'] = chunk_usage
+            self.wfile.write(f"data: {json.dumps(payload)}\n\n".encode('utf-8'))
+            self.wfile.flush()
+
+        interval = 1 / self.server.settings.tokens_per_second
+        try:
+            chunk({'role': 'assistant', 'content': ''})
+            for index, token in enumerate(tokens):
+                if index:
+                    time.sleep(interval)
+                chunk({'content': token})
+            chunk({}, 'stop')
+            if (request.get('stream_options') or {}).get('include_usage'):
+                chunk({}, chunk_usage=usage)
+            self.wfile.write(b"data: [DONE]\n\n")
+            self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # The client stopped reading
+
+    def _send_error(self, status: int, message: str, code: Optional[str] = None,
+                    headers: Optional[dict] = None):
+        error_type = 'requests' if status == 429 else 'server_error'
+        self._send_json(status, {'error': {'message': message, 'type': error_type,
+                                           'param': None, 'code': code}}, headers)
+
+    def _send_json(self, status: int, payload: dict, headers: Optional[dict] = None):
+        data = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('content-type', 'application/json')
+        self.send_header('content-length', str(len(data)))
+        self._send_headers(headers)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _send_headers(self, headers: Optional[dict]):
+        for name, value in (headers or {}).items():
+            if value is not None:
+                self.send_header(name, value)
+
+def add_arguments(parser: argparse.ArgumentParser):
+    """The mock server's flags, shared with the benchmark that embeds it."""
+    parser.add_argument('--latency', type=float, default=0.2,
+                        help="seconds before the first token")
+    parser.add_argument('--jitter', type=float, default=0.0,
+                        help="random +/- seconds added to --latency")
+    parser.add_argument('--tokens-per-second', type=float, default=100.0)
+    parser.add_argument('--reply-tokens', type=int, default=60,
+                        help="tokens per reply, capped by the request's max_tokens")
+    parser.add_argument('--error-rate', type=float, default=0.0,
+                        help="share of requests answered with a 500")
+    parser.add_argument('--rate-limit-rate', type=float, default=0.0,
+                        help="share of requests answered with a 429")
+    parser.add_argument('--requests-per-minute', type=int, default=0,
+                        help="enforce a sliding-window limit; 0 for none")
+    parser.add_argument('--retry-after', type=float, default=1.0,
+                        help="retry-after seconds of injected 429s")
+    parser.add_argument('--models', nargs='+', default=DEFAULT_MODELS)
+    parser.add_argument('--seed', type=int, default=None)
+
+def settings_from_args(args) -> MockSettings:
+    return MockSettings(
+        latency=args.latency, jitter=args.jitter,
+        tokens_per_second=args.tokens_per_second, reply_tokens=args.reply_tokens,
+        error_rate=args.error_rate, rate_limit_rate=args.rate_limit_rate,
+        requests_per_minute=args.requests_per_minute, retry_after=args.retry_after,
+        models=args.models, seed=args.seed
+    )
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    add_arguments(parser)
+    args = parser.parse_args()
+
+    server = MockOpenAIServer(settings_from_args(args), args.host, args.port)
+    print(f"Mock OpenAI API on {server.base_url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        print(json.dumps(server.stats))
+
+if __name__ == '__main__':
+    main()
@@ -11,8 +11,8 @@ def main():
     """Main application entry point."""
     app = QApplication(sys.argv)
     
-    # Create a single instance of SettingsManager
-    settings_manager = SettingsManager()
+    # The single SettingsManager every component shares
+    settings_manager = SettingsManager.shared()
     
     # Pass settings_manager to MainWindow
     main_window = MainWindow(app, settings_manager)
@@ -0,0 +1,26 @@
+import atexit
+import pytest
+from app.services.settings_manager import SettingsManager
+
+@pytest.fixture
+def home(tmp_path, monkeypatch):
+    """A fresh home directory, for the services that keep files under ``~``."""
+    monkeypatch.setenv("HOME", str(tmp_path))
+    return tmp_path
+
+@pytest.fixture
+def make_manager(home, monkeypatch):
+    """Creates SettingsManagers on the test's home, as separate processes would."""
+    monkeypatch.setattr(SettingsManager, 'FLUSH_DELAY', 0.05)
+    monkeypatch.setattr(SettingsManager, 'MAX_FLUSH_DELAY', 0.3)
+    managers = []
+
+    def make():
+        manager = SettingsManager()
+        managers.append(manager)
+        return manager
+    yield make
+    for manager in managers:
+        manager._unwatch()
+        manager.flush()
+        atexit.unregister(manager.flush)
@@ -0,0 +1,11 @@
+import time
+import uuid
+from datetime import datetime
+from app.models.chat import ChatMessage, ChatSession, Role
+
+def make_message(content: str, role: Role = Role.USER, created: float = None) -> ChatMessage:
+    return ChatMessage(str(uuid.uuid4()), role, content, created or time.time())
+
+def make_session(messages=()) -> ChatSession:
+    now = datetime.now()
+    return ChatSession(id=str(uuid.uuid4()), messages=list(messages), created_at=now, updated_at=now)
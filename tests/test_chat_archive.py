@@ -0,0 +1,72 @@
+import os
+import zipfile
+from datetime import datetime
+from app.config.chat_storage_config import CHAT_STORAGE_CONFIG
+from app.models.chat import ChatSession
+from app.services.chat_storage_service import ChatStorageService
+from app.services.journal_chat_store import JournalChatStore
+from tests.helpers import make_message, make_session
+
+def old_session(store, when: datetime, *contents) -> ChatSession:
+    messages = [make_message(content, created=when.timestamp()) for content in contents]
+    session = make_session(messages)
+    session.created_at = session.updated_at = when
+    store.create_session(session)
+    return session
+
+def test_old_sessions_are_packed_by_month(tmp_path):
+    store = JournalChatStore(str(tmp_path), CHAT_STORAGE_CONFIG)
+    january = [old_session(store, datetime(2024, 1, day), f"january {day}") for day in (3, 20)]
+    march = old_session(store, datetime(2024, 3, 9), "march")
+    recent = make_session([make_message("today")])
+    store.create_session(recent)
+
+    cutoff = datetime(2024, 6, 1)
+    candidates = store.archive_candidates(cutoff)
+    assert {month: sorted(ids) for month, ids in candidates.items()} == {
+        "2024-01": sorted(session.id for session in january), "2024-03": [march.id]
+    }
+    for month, session_ids in candidates.items():
+        assert store.archive_sessions(month, session_ids, cutoff) == len(session_ids)
+
+    assert store.archive.months() == ["2024-01", "2024-03"]
+    with zipfile.ZipFile(store.archive.path("2024-01")) as archive:
+        assert len(archive.namelist()) == 2
+    for session in january + [march]:
+        assert not os.path.exists(store._journal_path(session.id))
+    assert store.archive_candidates(cutoff) == {}
+    # Archived sessions are still listed and loaded.
+    assert len(store.list_sessions()) == 4
+    loaded = store.load_session(march.id)
+    assert loaded.messages == march.messages
+    assert loaded.created_at == march.created_at
+
+def test_adding_a_message_restores_the_session(tmp_path):
+    store = JournalChatStore(str(tmp_path), CHAT_STORAGE_CONFIG)
+    kept, restored = (old_session(store, datetime(2024, 1, day), f"day {day}") for day in (3, 4))
+    cutoff = datetime(2024, 6, 1)
+    store.archive_sessions("2024-01", [kept.id, restored.id], cutoff)
+
+    reply = make_message("back again")
+    assert store.append_messages(restored.id, [reply])
+    assert os.path.exists(store._journal_path(restored.id))
+    assert store.load_session(restored.id).messages == restored.messages + [reply]
+    assert store.manifest.get(restored.id).archive is None
+    # The other member stays in the month's archive.
+    with zipfile.ZipFile(store.archive.path("2024-01")) as archive:
+        assert archive.namelist() == [f"{kept.id}.jsonl"]
+    assert store.load_session(kept.id).messages == kept.messages
+
+    # A fresh store finds both, from the journal and from the archive.
+    reopened = JournalChatStore(str(tmp_path), CHAT_STORAGE_CONFIG)
+    assert reopened.load_session(restored.id).messages[-1] == reply
+    assert reopened.load_session(kept.id).messages == kept.messages
+
+def test_service_leaves_the_latest_session_alone(tmp_path):
+    service = ChatStorageService(str(tmp_path), 'journal')
+    sessions = [old_session(service.store, datetime(2024, 1, day), f"day {day}") for day in (3, 4)]
+    assert service.archive_stale_sessions(after_days=30) == 1
+    assert service.store.manifest.get(sessions[0].id).archive == "2024-01"
+    assert service.store.manifest.get(sessions[1].id).archive is None
+    assert service.get_session_messages(sessions[0].id) == sessions[0].messages
+    service.close()
@@ -0,0 +1,38 @@
+import json
+from datetime import datetime
+from app.models.chat import Role
+from app.services import chat_codec
+from app.services.chat_codec import decode_message_lines, encode_message, is_message_line
+from tests.helpers import make_message
+
+def test_round_trip_keeps_every_field():
+    messages = [make_message("plain"), make_message("line\nbreak", Role.ASSISTANT),
+                make_message('quotes " \\ and Ünïcødé ✓', Role.SYSTEM, created=1700000000.125)]
+    lines = [encode_message(message) for message in messages]
+    assert all(line.endswith(b'\n') and line.count(b'\n') == 1 for line in lines)
+    assert all(is_message_line(line[:-1]) for line in lines)
+    assert decode_message_lines([line[:-1] for line in lines]) == messages
+
+def test_legacy_records_are_read():
+    created = datetime(2024, 5, 1, 12, 30, 15)
+    legacy = json.dumps({"type": "message", "id": "1", "role": "assistant",
+                         "content": "old format", "timestamp": created.isoformat()}).encode()
+    current = encode_message(make_message("new format"))[:-1]
+    assert is_message_line(legacy)
+    first, second = decode_message_lines([legacy, current])
+    assert (first.id, first.role, first.content) == ("1", Role.ASSISTANT, "old format")
+    assert first.timestamp == created
+    assert second.content == "new format"
+
+def test_damaged_lines_are_skipped(monkeypatch):
+    # Small batches, so the damaged line falls back to line-by-line decoding in one of them.
+    monkeypatch.setattr(chat_codec, 'DECODE_BATCH_SIZE', 2)
+    messages = [make_message(str(n)) for n in range(5)]
+    lines = [encode_message(message)[:-1] for message in messages]
+    lines.insert(3, b'["m","torn","user","cut')
+    lines.insert(1, b'["m","bad","nobody","role",1.0]')
+    assert decode_message_lines(lines) == messages
+
+def test_other_records_are_not_message_lines():
+    assert not is_message_line(b'{"type": "metadata", "values": {}}')
+    assert not is_message_line(b'["m","torn","user","cut')
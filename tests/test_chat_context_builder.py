@@ -0,0 +1,154 @@
+import pytest
+from app.config.openai_config import OPENAI_CONFIG
+from app.models.chat import Role
+from app.services.chat_context_builder import ChatContextBuilder, SUMMARY_KEY
+from app.services.model_catalog_service import ModelCatalogService
+from tests.helpers import make_message
+
+MODEL = "gpt-4"  # 8192-token context window in the catalog
+REPLY_TOKENS = 2000
+
+class FakeStorage:
+    def __init__(self):
+        self.messages = []
+        self.metadata = {}
+        self.read = 0
+
+    def get_message_count(self, session_id):
+        return len(self.messages)
+
+    def get_session_messages(self, session_id, offset=0, limit=None):
+        page = self.messages[offset:None if limit is None else offset + limit]
+        self.read += len(page)
+        return page
+
+    def get_session_metadata(self, session_id):
+        return dict(self.metadata)
+
+    def update_session_metadata(self, session_id, values):
+        self.metadata.update(values)
+        return True
+
+class Summarizer:
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, previous, messages):
+        self.calls.append(messages)
+        return "the story so far"
+
+@pytest.fixture
+def storage():
+    return FakeStorage()
+
+@pytest.fixture
+def summarizer():
+    return Summarizer()
+
+@pytest.fixture
+def builder(home, storage, summarizer):
+    return ChatContextBuilder(storage, summarizer, ModelCatalogService())
+
+def words(count):
+    return "word " * count
+
+def history(turns, words_each=150):
+    messages = [make_message("Welcome!", Role.ASSISTANT)]
+    for n in range(turns):
+        role = Role.USER if n % 2 == 0 else Role.ASSISTANT
+        messages.append(make_message(f"turn {n} " + words(words_each), role))
+    return messages
+
+def build(builder, messages, strategy):
+    builder.chat_storage.messages = list(messages)
+    return builder.build("session", MODEL, strategy, REPLY_TOKENS)
+
+def test_budget_is_the_context_window_less_the_reply(builder, monkeypatch):
+    assert builder.budget_for(MODEL, REPLY_TOKENS) == 8192 - REPLY_TOKENS
+    assert builder.budget_for("gpt-4o", REPLY_TOKENS) == 128000 - REPLY_TOKENS
+    assert builder.budget_for("unknown-model", 1000) == 8192 - 1000
+    # A reply limit as large as the window still leaves half of it.
+    assert builder.budget_for(MODEL, 10000) == 4096
+    assert builder.budget_for(MODEL) == 8192 - builder.config["default_completion_tokens"]
+    monkeypatch.setitem(OPENAI_CONFIG["context"], "max_prompt_tokens", 3000)
+    assert builder.budget_for("gpt-4o", REPLY_TOKENS) == 3000
+
+@pytest.mark.parametrize('strategy', ['recent', 'pinned', 'summary'])
+def test_oversized_latest_message_is_truncated_not_dropped(builder, summarizer, strategy):
+    latest = make_message(words(20000))
+    messages = history(10) + [latest]
+    counter = builder.counter_for(MODEL)
+
+    result = build(builder, messages, strategy)
+    assert len(result) == 1
+    assert result[0].role == Role.USER
+    assert latest.content.startswith(result[0].content) and result[0].content
+    assert counter.total(result) <= builder.budget_for(MODEL, REPLY_TOKENS)
+    # The truncated copy does not change the count of the original.
+    assert counter.count(latest) > builder.budget_for(MODEL, REPLY_TOKENS)
+    for folded in summarizer.calls:
+        assert latest.id not in {message.id for message in folded}
+
+@pytest.mark.parametrize('strategy', ['recent', 'pinned', 'summary'])
+def test_history_fills_the_budget_around_the_latest_message(builder, strategy):
+    latest = make_message(words(3000))
+    messages = history(40) + [latest]
+    budget = builder.budget_for(MODEL, REPLY_TOKENS)
+    counter = builder.counter_for(MODEL)
+
+    result = build(builder, messages, strategy)
+    assert result[-1] == latest
+    assert len(result) > 1
+    assert counter.total(result) <= budget
+
+def test_pinned_strategy_keeps_the_welcome_message(builder):
+    messages = history(60)
+    result = build(builder, messages, 'pinned')
+    assert result[0] == messages[0]
+    assert result[-1] == messages[-1]
+    assert builder.counter_for(MODEL).total(result) <= builder.budget_for(MODEL, REPLY_TOKENS)
+
+def test_summary_folds_older_turns_but_never_the_latest(builder, storage, summarizer):
+    latest = make_message("and now? " + words(2250))
+    messages = history(60) + [latest]
+
+    result = build(builder, messages, 'summary')
+    checkpoint = storage.metadata[SUMMARY_KEY]
+    assert checkpoint["text"] == "the story so far"
+    assert checkpoint["through"] < len(messages) - 1
+    assert len(summarizer.calls) == 1
+    assert latest.id not in {message.id for message in summarizer.calls[0]}
+    assert [message.id for message in result[:2]] == [messages[0].id, f"{SUMMARY_KEY}:{checkpoint['through']}"]
+    assert result[-1] == latest
+    assert builder.counter_for(MODEL).total(result) <= builder.budget_for(MODEL, REPLY_TOKENS)
+
+def test_summary_is_reused_while_the_rest_fits(builder, summarizer):
+    messages = history(60)
+    build(builder, messages, 'summary')
+    messages.append(make_message("a short follow-up"))
+    result = build(builder, messages, 'summary')
+    assert len(summarizer.calls) == 1
+    assert result[-1] == messages[-1]
+
+def test_short_chat_is_sent_whole(builder):
+    messages = history(4)
+    for strategy in ('recent', 'pinned', 'summary'):
+        assert build(builder, messages, strategy) == messages
+    assert build(builder, [], 'summary') == []
+
+@pytest.mark.parametrize('strategy', ['recent', 'pinned'])
+def test_long_session_is_read_only_as_far_as_needed(builder, storage, strategy):
+    messages = history(2000, words_each=20)
+    result = build(builder, messages, strategy)
+    assert result[-1] == messages[-1]
+    # One page from the end, plus the welcome message when it is pinned.
+    assert storage.read <= builder.config["page_size"] + 1
+
+def test_summary_reads_what_it_may_send_or_summarize(builder, storage, summarizer):
+    messages = history(2000, words_each=20)
+    result = build(builder, messages, 'summary')
+    assert storage.read < len(messages) // 2
+    checkpoint = storage.metadata[SUMMARY_KEY]
+    # The checkpoint counts from the start of the session, not of what was read.
+    assert result[2] == messages[checkpoint["through"]]
+    assert summarizer.calls[0][-1] == messages[checkpoint["through"] - 1]
@@ -0,0 +1,57 @@
+import pytest
+from app.config.chat_storage_config import CHAT_STORAGE_CONFIG
+from app.models.chat import Role
+from app.services.chat_storage_service import ChatStorageService
+from app.services.journal_chat_store import JournalChatStore
+from tests.helpers import make_message, make_session
+
+@pytest.fixture(params=['journal', 'sqlite'])
+def storage(request, tmp_path):
+    service = ChatStorageService(str(tmp_path), request.param)
+    yield service
+    service.close()
+
+def fill(storage, count: int, flush_every: int = 7) -> str:
+    session_id = storage.create_session().id
+    for n in range(count):
+        storage.add_message(session_id, Role.USER if n % 2 == 0 else Role.ASSISTANT, f"message {n}")
+        if n % flush_every == flush_every - 1:
+            storage.flush()
+    return session_id
+
+def contents(messages):
+    return [message.content for message in messages]
+
+def test_pages_cover_stored_and_queued_messages(storage):
+    # The last few messages are still queued when the pages are read.
+    session_id = fill(storage, 25)
+    expected = [f"message {n}" for n in range(25)]
+    assert storage.get_message_count(session_id) == 25
+    pages = [storage.get_session_messages(session_id, offset, 10) for offset in range(0, 25, 10)]
+    assert [contents(page) for page in pages] == [expected[0:10], expected[10:20], expected[20:25]]
+    assert contents(storage.get_session_messages(session_id, 18, 5)) == expected[18:23]
+    assert storage.get_session_messages(session_id, 30, 10) == []
+    assert contents(storage.get_session_messages(session_id)) == expected
+
+def test_tail_spans_stored_and_queued_messages(storage):
+    session_id = fill(storage, 25)
+    assert contents(storage.get_session_tail(session_id, 6)) == [f"message {n}" for n in range(19, 25)]
+    assert contents(storage.get_session_tail(session_id, 100)) == [f"message {n}" for n in range(25)]
+    assert storage.get_session_tail(session_id, 0) == []
+
+def test_reads_of_unknown_session_are_empty(storage):
+    assert storage.get_session_messages("missing", 0, 10) == []
+    assert storage.get_session_tail("missing", 5) == []
+    assert storage.get_message_count("missing") == 0
+
+@pytest.mark.parametrize('offset, limit', [(0, 5), (3, 4), (150, 20), (290, 10), (295, 50)])
+def test_journal_reads_a_window_from_either_end(tmp_path, offset, limit):
+    store = JournalChatStore(str(tmp_path), CHAT_STORAGE_CONFIG)
+    # Long messages, so the file spans several read blocks.
+    messages = [make_message(f"{n} " + "x" * 700) for n in range(300)]
+    session = make_session()
+    store.create_session(session)
+    store.append_messages(session.id, messages)
+
+    assert store.read_messages(session.id, offset, limit) == messages[offset:offset + limit]
+    assert store.read_tail(session.id, limit) == messages[-limit:]
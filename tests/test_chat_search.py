@@ -0,0 +1,94 @@
+import time
+import pytest
+from app.config.chat_storage_config import CHAT_STORAGE_CONFIG
+from app.models.chat import Role
+from app.services.chat_storage_service import ChatStorageService
+from app.services.file_watcher import FileWatcher
+from app.services.sqlite_chat_store import SQLiteChatStore
+from tests.helpers import make_message, make_session
+
+@pytest.fixture(params=['journal', 'sqlite'])
+def backend(request):
+    return request.param
+
+@pytest.fixture
+def services(tmp_path, backend):
+    """Opens ChatStorageServices on one directory, as separate processes would."""
+    opened = []
+
+    def open_service():
+        service = ChatStorageService(str(tmp_path), backend)
+        opened.append(service)
+        return service
+    yield open_service
+    for service in opened:
+        service.close()
+
+def wait_until(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.02)
+    return True
+
+def test_hits_are_found_at_their_position(services):
+    storage = services()
+    session_id = storage.create_session().id
+    for n in range(30):
+        storage.add_message(session_id, Role.USER, f"plain message {n}")
+        if n == 11:
+            storage.add_message(session_id, Role.ASSISTANT, "the walrus appears")
+        if n == 19:
+            storage.flush()
+    storage.add_message(session_id, Role.USER, "queued walrus")
+    storage.flush()
+
+    positions = {hit.snippet: storage.get_message_position(session_id, hit.message_id)
+                 for hit in storage.search("walrus")}
+    assert positions == {"the walrus appears": 12, "queued walrus": 31}
+    assert storage.get_message_position(session_id, "missing") is None
+
+def test_queued_message_has_a_position(services):
+    storage = services()
+    session_id = storage.create_session().id
+    storage.add_message(session_id, Role.USER, "stored")
+    storage.flush()
+    storage.add_message(session_id, Role.USER, "queued")
+    queued = storage.get_session_tail(session_id, 1)[0]
+    assert storage.get_message_position(session_id, queued.id) == 1
+
+def test_sessions_changed_by_another_process_are_reported(services):
+    if not FileWatcher.shared().available:
+        pytest.skip("watchdog is not installed")
+    writer, reader = services(), services()
+    changed = []
+    reader.subscribe(changed.append)
+    session_id = writer.create_session().id
+    writer.add_message(session_id, Role.USER, "a message about narwhals")
+    writer.flush()
+    assert wait_until(lambda: session_id in changed)
+    assert reader.search("narwhals")[0].session_id == session_id
+    assert [m.content for m in reader.get_session_messages(session_id)] == ["a message about narwhals"]
+
+def test_sqlite_reports_only_other_processes_changes(tmp_path):
+    mine = SQLiteChatStore(str(tmp_path), CHAT_STORAGE_CONFIG)
+    theirs = SQLiteChatStore(str(tmp_path), CHAT_STORAGE_CONFIG)
+    own, shared, removed = make_session(), make_session(), make_session()
+    for session in (own, shared, removed):
+        mine.create_session(session)
+    mine.append_message(own.id, make_message("mine"))
+    assert mine.external_changes() == {}
+
+    assert theirs.append_messages(shared.id, [make_message("theirs"), make_message("again")])
+    assert theirs.remove_session(removed.id)
+    added = make_session()
+    theirs.create_session(added)
+    changes = mine.external_changes()
+    assert set(changes) == {shared.id, removed.id, added.id}
+    assert changes[shared.id].message_count == 0
+    assert changes[removed.id].id == removed.id
+    assert changes[added.id] is None
+    assert mine.external_changes() == {}
+    mine.close()
+    theirs.close()
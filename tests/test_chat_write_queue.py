@@ -0,0 +1,138 @@
+import threading
+import pytest
+from app.services.chat_write_queue import ChatWriteQueue
+from tests.helpers import make_message
+
+class FlakyStore:
+    """Keeps appended messages in memory; fails while ``failing`` is set."""
+
+    def __init__(self):
+        self.messages = {}
+        self.failing = False
+        self.attempts = 0
+        self.syncs = 0
+
+    def session_stamp(self, session_id):
+        return len(self.messages.get(session_id, ()))
+
+    def append_messages(self, session_id, messages):
+        self.attempts += 1
+        if self.failing:
+            raise OSError("disk full")
+        self.messages.setdefault(session_id, []).extend(messages)
+        return True
+
+    def sync(self):
+        self.syncs += 1
+
+def make_queue(store, enabled=True, errors=None, written=None, lock=None, fsync_interval=None):
+    config = {'enabled': enabled, 'flush_delay': 0.01, 'fsync_interval': fsync_interval,
+              'retry_delay': 0.01, 'max_retry_delay': 0.05}
+    errors = [] if errors is None else errors
+    written = [] if written is None else written
+    return ChatWriteQueue(
+        store, lock or threading.RLock(), config,
+        lambda session_id, messages, before, after: written.append(messages),
+        errors.append
+    )
+
+@pytest.fixture(params=[True, False], ids=['write-behind', 'direct'])
+def enabled(request):
+    return request.param
+
+def test_flush_writes_everything_and_syncs(enabled):
+    store = FlakyStore()
+    queue = make_queue(store, enabled)
+    messages = [make_message(str(n)) for n in range(5)]
+    for message in messages:
+        queue.enqueue("s", message)
+    assert queue.flush(5)
+    assert store.messages["s"] == messages
+    assert queue.pending("s") == []
+    assert store.syncs >= 1
+    queue.close(5)
+
+def test_failed_writes_stay_queued_in_order(enabled):
+    store = FlakyStore()
+    store.failing = True
+    errors = []
+    queue = make_queue(store, enabled, errors)
+    first, second = make_message("first"), make_message("second")
+    queue.enqueue("s", first)
+    queue.enqueue("s", second)
+
+    assert not queue.flush(5)
+    assert queue.failing
+    assert queue.pending("s") == [first, second]
+    assert len(errors) == 1 and "disk full" in errors[0]
+
+    third = make_message("third")
+    queue.enqueue("s", third)
+    store.failing = False
+    assert queue.flush(5)
+    assert store.messages["s"] == [first, second, third]
+    assert not queue.failing
+    queue.close(5)
+
+def test_retries_in_the_background_until_the_write_succeeds():
+    store = FlakyStore()
+    store.failing = True
+    written = []
+    queue = make_queue(store, written=written)
+    queue.enqueue("s", make_message("retried"))
+    while store.attempts < 3:
+        threading.Event().wait(0.01)
+    store.failing = False
+    assert queue.flush(5)
+    assert [m.content for m in store.messages["s"]] == ["retried"]
+    assert len(written) == 1
+    queue.close(5)
+
+def test_backoff_doubles_up_to_the_limit():
+    queue = make_queue(FlakyStore(), enabled=False)
+    delays = []
+    for failures in range(1, 6):
+        queue._failures = failures
+        delays.append(queue._backoff())
+    assert delays == [0.01, 0.02, 0.04, 0.05, 0.05]
+
+def test_one_failing_session_does_not_hold_back_the_others():
+    store = FlakyStore()
+    original = store.append_messages
+
+    def append(session_id, messages):
+        if session_id == "broken":
+            raise OSError("bad file")
+        return original(session_id, messages)
+    store.append_messages = append
+    queue = make_queue(store, enabled=False)
+    queue.enqueue("broken", make_message("kept"))
+    queue.enqueue("fine", make_message("written"))
+
+    assert not queue.flush(1)
+    assert [m.content for m in store.messages["fine"]] == ["written"]
+    assert [m.content for m in queue.pending("broken")] == ["kept"]
+
+def test_syncs_without_holding_the_lock(enabled):
+    lock = threading.RLock()
+    store = FlakyStore()
+    free = []
+
+    def sync():
+        # A reader on another thread can take the lock while we fsync.
+
+        def read():
+            if lock.acquire(timeout=1):
+                lock.release()
+                free.append(True)
+            else:
+                free.append(False)
+        reader = threading.Thread(target=read)
+        reader.start()
+        reader.join()
+    store.sync = sync
+    queue = make_queue(store, enabled, lock=lock, fsync_interval=0)
+    queue.enqueue("s", make_message("synced"))
+    assert queue.flush(5)
+    assert free and all(free)
+    queue.close(5)
@@ -0,0 +1,117 @@
+import copy
+import os
+from app.config.chat_storage_config import CHAT_STORAGE_CONFIG
+from app.models.chat import Role
+from app.services.chat_storage_service import ChatStorageService
+from app.services.journal_chat_store import JournalChatStore
+from tests.helpers import make_message, make_session
+
+def journal_lines(store, session_id):
+    with open(store._journal_path(session_id), 'rb') as f:
+        return f.read().splitlines()
+
+def test_round_trip(tmp_path):
+    store = JournalChatStore(str(tmp_path), CHAT_STORAGE_CONFIG)
+    session = make_session()
+    store.create_session(session)
+    messages = [make_message("Hello\nsecond line"), make_message("Ünïcødé ✓", Role.ASSISTANT),
+                make_message('quotes " and \\ backslashes')]
+    assert store.append_messages(session.id, messages)
+    assert store.update_metadata(session.id, {"summary": "short"})
+
+    loaded = JournalChatStore(str(tmp_path), CHAT_STORAGE_CONFIG).load_session(session.id)
+    assert loaded.messages == messages
+    assert loaded.metadata == {"summary": "short"}
+    assert loaded.created_at == session.created_at
+
+def test_append_writes_one_line_per_message(tmp_path):
+    store = JournalChatStore(str(tmp_path), CHAT_STORAGE_CONFIG)
+    session = make_session()
+    store.create_session(session)
+    store.append_messages(session.id, [make_message("one")])
+    store.append_messages(session.id, [make_message("two"), make_message("three")])
+    # The header, then the messages.
+    assert len(journal_lines(store, session.id)) == 4
+
+def test_append_to_missing_session_fails(tmp_path):
+    store = JournalChatStore(str(tmp_path), CHAT_STORAGE_CONFIG)
+    assert not store.append_messages("missing", [make_message("lost")])
+
+def test_compaction_folds_metadata_and_drops_torn_records(tmp_path):
+    store = JournalChatStore(str(tmp_path), CHAT_STORAGE_CONFIG)
+    session = make_session()
+    store.create_session(session)
+    messages = [make_message(f"message {n}") for n in range(3)]
+    store.append_messages(session.id, messages)
+    store.update_metadata(session.id, {"a": 1})
+    store.update_metadata(session.id, {"b": 2})
+    with open(store._journal_path(session.id), 'ab') as f:
+        f.write(b'["m","torn","user","cut off')
+
+    assert store.compact_session(session.id)
+    lines = journal_lines(store, session.id)
+    assert len(lines) == 1 + len(messages)
+    assert b'"metadata"' in lines[0] and b'"message_count": 3' in lines[0]
+    loaded = store.load_session(session.id)
+    assert loaded.messages == messages
+    assert loaded.metadata == {"a": 1, "b": 2}
+
+def metadata_lines(store, session_id):
+    return [line for line in journal_lines(store, session_id) if line.startswith(b'{"type": "metadata"')]
+
+def test_compaction_is_due_once_metadata_records_outweigh_the_messages(tmp_path):
+    config = copy.deepcopy(CHAT_STORAGE_CONFIG)
+    config['journal'].update(compact_dead_ratio=0.5, compact_min_bytes=1000)
+    store = JournalChatStore(str(tmp_path), config)
+    session = make_session()
+    store.create_session(session)
+    store.append_messages(session.id, [make_message("x" * 3000)])
+    for n in range(5):
+        store.update_metadata(session.id, {"summary": "s" * 400, "n": n})
+    assert not store.compaction_due(session.id)
+
+    for n in range(5, 10):
+        store.update_metadata(session.id, {"summary": "s" * 400, "n": n})
+    assert store.compaction_due(session.id)
+    assert store.compact_session(session.id)
+    assert not store.compaction_due(session.id)
+    assert metadata_lines(store, session.id) == []
+    loaded = store.load_session(session.id)
+    assert loaded.metadata["n"] == 9
+    assert len(loaded.messages) == 1
+
+def test_service_compacts_after_metadata_updates(tmp_path, monkeypatch):
+    monkeypatch.setitem(CHAT_STORAGE_CONFIG['journal'], 'compact_min_bytes', 1000)
+    service = ChatStorageService(str(tmp_path), 'journal')
+    session_id = service.create_session().id
+    for n in range(10):
+        assert service.update_session_metadata(session_id, {"summary": "s" * 400, "n": n})
+    assert len(metadata_lines(service.store, session_id)) < 10
+    assert service.get_session_metadata(session_id)["n"] == 9
+    service.close()
+
+def test_legacy_session_is_migrated_on_first_append(tmp_path):
+    store = JournalChatStore(str(tmp_path), CHAT_STORAGE_CONFIG)
+    session = make_session([make_message("old")])
+    legacy_path = store._legacy_path(session.id)
+    with open(legacy_path, 'w') as f:
+        f.write('{"id": "%s", "created_at": "%s", "updated_at": "%s", "messages": '
+                '[{"id": "1", "role": "user", "content": "old", "timestamp": "%s"}]}'
+                % (session.id, session.created_at.isoformat(), session.updated_at.isoformat(),
+                   session.created_at.isoformat()))
+    store.manifest.rebuild()
+
+    assert store.append_messages(session.id, [make_message("new")])
+    assert not os.path.exists(legacy_path)
+    assert [m.content for m in store.load_session(session.id).messages] == ["old", "new"]
+
+def test_metadata_is_read_without_the_messages(tmp_path):
+    store = JournalChatStore(str(tmp_path), CHAT_STORAGE_CONFIG)
+    session = make_session([make_message("first")])
+    session.metadata = {"title": "kept"}
+    store.create_session(session)
+    store.update_metadata(session.id, {"summary": "one"})
+    store.append_messages(session.id, [make_message('{"type": "metadata" in a message')])
+    store.update_metadata(session.id, {"summary": "two"})
+    assert store.read_metadata(session.id) == {"title": "kept", "summary": "two"}
+    assert store.read_metadata("missing") is None
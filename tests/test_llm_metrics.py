@@ -0,0 +1,73 @@
+import pytest
+from app.models.llm_metrics import RequestMetric
+from app.services.llm_metrics_service import LLMMetricsService, percentile
+from app.services.request_control import RequestCancelled
+
+@pytest.fixture
+def config(tmp_path):
+    return {"enabled": True, "file": str(tmp_path / "metrics.jsonl"),
+            "window": 10, "max_file_records": 30}
+
+def metric(n, model="gpt-4o", outcome="ok", **values):
+    values.setdefault('latency_seconds', float(n))
+    return RequestMetric(started=1000.0 + n, model=model, streamed=False, outcome=outcome, **values)
+
+def file_lines(config):
+    with open(config["file"], encoding='utf-8') as f:
+        return f.read().splitlines()
+
+def test_percentile_is_nearest_rank():
+    values = [float(n) for n in range(1, 101)]
+    assert percentile(values, 0.5) == 50.0
+    assert percentile(values, 0.95) == 95.0
+    assert percentile([3.0], 0.95) == 3.0
+    assert percentile([], 0.5) is None
+
+def test_summary_aggregates_the_window_per_model(config):
+    metrics = LLMMetricsService(config)
+    for n in range(1, 16):
+        metrics.record(metric(n, prompt_tokens=10, completion_tokens=5))
+    metrics.record(metric(16, outcome="error", error="boom"))
+    metrics.record(metric(17, outcome="rate_limited"))
+    metrics.record(metric(1, model="o1-mini", ttft_seconds=0.5))
+
+    summary = metrics.summary()
+    assert list(summary) == ["gpt-4o", "o1-mini"]
+    gpt = summary["gpt-4o"]
+    # Only the last 10 requests of the model count: 8 ok, then the two failures.
+    assert gpt['requests'] == 10
+    assert gpt['errors'] == 2 and gpt['rate_limited'] == 1
+    assert gpt['latency_p50'] == 11.0 and gpt['latency_p95'] == 15.0
+    assert gpt['prompt_tokens'] == 80 and gpt['completion_tokens'] == 40
+    assert summary["o1-mini"]['ttft_p50'] == 0.5
+    assert [m.started for m in metrics.recent(limit=2)] == [1017.0, 1016.0]
+
+def test_timer_records_the_outcome(config):
+    metrics = LLMMetricsService(config)
+    metrics.start("gpt-4o").finish()
+    metrics.start("gpt-4o").finish(RequestCancelled())
+    timer = metrics.start("gpt-4o")
+    timer.finish(ValueError("bad"))
+    timer.finish()  # Recorded once
+    assert [m.outcome for m in reversed(metrics.recent())] == ["ok", "cancelled", "error"]
+
+def test_records_are_reloaded_and_the_file_trimmed(config):
+    metrics = LLMMetricsService(config)
+    for n in range(config["max_file_records"]):
+        metrics.record(metric(n, model="a" if n % 2 else "b"))
+    assert len(file_lines(config)) == 30
+    metrics.record(metric(30, model="a"))
+    # Trimmed back to the records still in the windows, oldest first.
+    assert len(file_lines(config)) == 20
+
+    with open(config["file"], 'a', encoding='utf-8') as f:
+        f.write('{"started": 2000.0, "model": "a", "str')  # Torn by a crash
+    reloaded = LLMMetricsService(config)
+    assert reloaded.summary() == metrics.summary()
+    assert [m.started for m in reloaded.recent("a", 3)] == [1030.0, 1029.0, 1027.0]
+
+def test_disabled_service_records_nothing(config, tmp_path):
+    metrics = LLMMetricsService(dict(config, enabled=False))
+    metrics.record(metric(1))
+    assert metrics.summary() == {}
+    assert not (tmp_path / "metrics.jsonl").exists()
@@ -0,0 +1,84 @@
+import importlib
+import openai
+import pytest
+from app.services import request_scheduler
+from app.services.model_catalog_service import ModelCatalogService
+from app.services.openai_client_provider import OpenAIClientProvider
+from app.services.request_scheduler import RequestScheduler
+
+# The HTTP library openai is built on (httpx or httpx2).
+http = importlib.import_module(type(openai.DEFAULT_CONNECTION_LIMITS).__module__.split('.')[0])
+
+MODELS = {"object": "list", "data": [
+    {"id": model_id, "object": "model", "created": 0, "owned_by": "test"}
+    for model_id in ("gpt-4o", "gpt-4o-realtime-preview", "o1-mini", "whisper-1")
+]}
+
+class FakeServer:
+    """Answers /models, failing with the given statuses first."""
+
+    def __init__(self, *statuses):
+        self.statuses = list(statuses)
+        self.requests = []
+
+    def __call__(self, request):
+        self.requests.append(request)
+        if self.statuses:
+            return http.Response(self.statuses.pop(0), json={"error": {"message": "busy"}})
+        return http.Response(200, json=MODELS)
+
+@pytest.fixture
+def server(monkeypatch):
+    server = FakeServer()
+    created = []
+
+    def create_client(api_key, base_url):
+        client = openai.OpenAI(api_key=api_key, base_url=base_url or "https://api.test/v1",
+                               http_client=http.Client(transport=http.MockTransport(server)),
+                               max_retries=0)
+        created.append(client)
+        return client
+    monkeypatch.setattr(OpenAIClientProvider, '_create_client', classmethod(
+        lambda cls, api_key, base_url: create_client(api_key, base_url)))
+    server.created = created
+    yield server
+    OpenAIClientProvider.reset()
+
+@pytest.fixture
+def scheduler(monkeypatch):
+    scheduler = RequestScheduler()
+    monkeypatch.setattr(RequestScheduler, '_shared', scheduler)
+    monkeypatch.setattr(request_scheduler.time, 'sleep', lambda seconds: None)
+    return scheduler
+
+@pytest.fixture
+def catalog(home):
+    return ModelCatalogService()
+
+def test_refresh_keeps_the_chat_models(catalog, server, scheduler):
+    models = catalog.refresh("key")
+    assert [model['id'] for model in models] == ["gpt-4o", "o1-mini"]
+    assert not catalog.is_stale()
+    assert [model['id'] for model in ModelCatalogService().models()] == ["gpt-4o", "o1-mini"]
+
+def test_unsaved_credentials_do_not_replace_the_shared_client(catalog, server, scheduler):
+    shared = OpenAIClientProvider.get_client("saved", None)
+    catalog.refresh("typed", "https://other.test/v1")
+    assert OpenAIClientProvider.get_client("saved", None) is shared
+    temporary = server.created[-1]
+    assert temporary is not shared and temporary.is_closed()
+    assert server.requests[-1].headers["authorization"] == "Bearer typed"
+
+def test_saved_credentials_use_the_shared_client(catalog, server, scheduler):
+    shared = OpenAIClientProvider.get_client("saved", None)
+    catalog.refresh("saved")
+    assert server.created == [shared]
+    assert not shared.is_closed()
+
+def test_refresh_goes_through_the_scheduler(catalog, server, scheduler):
+    server.statuses = [503, 429]
+    retries = []
+    scheduler.subscribe(retries.append)
+    assert [model['id'] for model in catalog.refresh("key")] == ["gpt-4o", "o1-mini"]
+    assert len(server.requests) == 3
+    assert len(retries) == 2
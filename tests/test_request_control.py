@@ -0,0 +1,109 @@
+import threading
+import time
+import pytest
+from app.services.request_control import CancelToken, RequestCancelled, SingleFlight
+
+class SharedCall:
+    """A call that runs until released or cancelled."""
+
+    def __init__(self, result="shared"):
+        self.result = result
+        self.started = threading.Event()
+        self.release = threading.Event()
+        self.aborted = threading.Event()
+        self.calls = 0
+
+    def __call__(self, token: CancelToken):
+        self.calls += 1
+        self.started.set()
+        token.on_cancel(self.release.set)
+        self.release.wait(10)
+        if token.cancelled:
+            self.aborted.set()
+            raise RequestCancelled()
+        return self.result
+
+def start(flight, call, token, outcomes, name):
+    def run():
+        try:
+            outcomes[name] = flight.do("key", call, token)
+        except RequestCancelled:
+            outcomes[name] = "cancelled"
+    thread = threading.Thread(target=run)
+    thread.start()
+    return thread
+
+def test_concurrent_identical_calls_share_one_result():
+    flight, call, outcomes = SingleFlight(), SharedCall(), {}
+    threads = [start(flight, call, CancelToken(), outcomes, n) for n in range(3)]
+    assert call.started.wait(5)
+    call.release.set()
+    for thread in threads:
+        thread.join(5)
+    assert outcomes == {0: "shared", 1: "shared", 2: "shared"}
+    assert call.calls == 1
+    assert flight.in_flight() == 0
+
+def test_cancelled_leader_returns_at_once_and_the_call_goes_on():
+    flight, call, outcomes = SingleFlight(), SharedCall(), {}
+    leader_token = CancelToken()
+    leader = start(flight, call, leader_token, outcomes, "leader")
+    assert call.started.wait(5)
+    follower = start(flight, call, CancelToken(), outcomes, "follower")
+    time.sleep(0.05)
+
+    cancelled_at = time.monotonic()
+    leader_token.cancel()
+    leader.join(5)
+    assert time.monotonic() - cancelled_at < 0.5
+    assert outcomes == {"leader": "cancelled"}
+    assert not call.aborted.is_set()
+
+    call.release.set()
+    follower.join(5)
+    assert outcomes["follower"] == "shared"
+
+def test_call_is_aborted_once_every_caller_has_cancelled():
+    flight, call, outcomes = SingleFlight(), SharedCall(), {}
+    tokens = [CancelToken(), CancelToken()]
+    threads = [start(flight, call, token, outcomes, n) for n, token in enumerate(tokens)]
+    assert call.started.wait(5)
+    time.sleep(0.05)
+    tokens[0].cancel()
+    threads[0].join(5)
+    assert not call.aborted.is_set()
+    tokens[1].cancel()
+    threads[1].join(5)
+    assert call.aborted.wait(5)
+    assert outcomes == {0: "cancelled", 1: "cancelled"}
+
+def test_caller_without_a_token_keeps_the_call_alive():
+    flight, call, outcomes = SingleFlight(), SharedCall(), {}
+    token = CancelToken()
+    leader = start(flight, call, None, outcomes, "leader")
+    assert call.started.wait(5)
+    follower = start(flight, call, token, outcomes, "follower")
+    time.sleep(0.05)
+    token.cancel()
+    follower.join(5)
+    assert outcomes == {"follower": "cancelled"}
+    call.release.set()
+    leader.join(5)
+    assert outcomes["leader"] == "shared" and not call.aborted.is_set()
+
+def test_errors_are_shared_and_later_calls_run_again():
+    flight = SingleFlight()
+
+    def fail(token):
+        raise ValueError("boom")
+    with pytest.raises(ValueError):
+        flight.do("key", fail, CancelToken())
+    assert flight.do("key", lambda token: 42) == 42
+
+def test_already_cancelled_caller_does_not_wait():
+    flight, call = SingleFlight(), SharedCall()
+    token = CancelToken()
+    token.cancel()
+    with pytest.raises(RequestCancelled):
+        flight.do("key", call, token)
+    assert call.aborted.wait(5)
@@ -0,0 +1,177 @@
+import importlib
+import openai
+import pytest
+from app.services import request_scheduler
+from app.services.request_control import CancelToken, RequestCancelled
+from app.services.request_scheduler import RequestScheduler, TokenBucket, parse_duration, retry_after
+
+# The HTTP library openai is built on (httpx or httpx2).
+http = importlib.import_module(type(openai.DEFAULT_CONNECTION_LIMITS).__module__.split('.')[0])
+
+CONFIG = {
+    "max_attempts": 4,
+    "base_delay": 1.0,
+    "max_delay": 8.0,
+    "completion_reservation": 500,
+    "default": {"requests_per_minute": 10 ** 6, "tokens_per_minute": 10 ** 9},
+    "models": {"small": {"requests_per_minute": 60, "tokens_per_minute": 6000}},
+}
+
+def status_error(status, headers=None, body=None):
+    request = http.Request("POST", "https://api.test/v1/chat/completions")
+    response = http.Response(status, headers=headers or {}, request=request)
+    return openai.APIStatusError(f"status {status}", response=response, body=body)
+
+def connection_error():
+    return openai.APIConnectionError(request=http.Request("POST", "https://api.test/v1"))
+
+class Flaky:
+    """Raises the given errors in turn, then returns "ok"."""
+
+    def __init__(self, *errors):
+        self.errors = list(errors)
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        if self.errors:
+            raise self.errors.pop(0)
+        return "ok"
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    """The delays slept for, on a fake clock that sleeping advances."""
+    delays = []
+    now = [1000.0]
+
+    def sleep(seconds):
+        delays.append(seconds)
+        now[0] += seconds
+    monkeypatch.setattr(request_scheduler.time, 'sleep', sleep)
+    monkeypatch.setattr(request_scheduler.time, 'monotonic', lambda: now[0])
+    return delays
+
+@pytest.fixture
+def scheduler():
+    return RequestScheduler(CONFIG)
+
+@pytest.mark.parametrize('value, seconds', [
+    ("1s", 1.0), ("6m0s", 360.0), ("20ms", 0.02), ("1h2m3.5s", 3723.5), ("2.5", 2.5),
+    ("", None), ("soon", None), ("5x", None),
+])
+def test_parse_duration(value, seconds):
+    assert parse_duration(value) == seconds
+
+def test_retry_after_prefers_milliseconds_then_seconds_then_resets():
+    assert retry_after({'retry-after-ms': '1500', 'retry-after': '9'}) == 1.5
+    assert retry_after({'retry-after': '9'}) == 9.0
+    assert retry_after({'x-ratelimit-reset-requests': '2s', 'x-ratelimit-reset-tokens': '6s'}) == 6.0
+    assert retry_after({}) is None
+
+def test_retries_transient_errors_with_jittered_backoff(scheduler, sleeps, monkeypatch):
+    monkeypatch.setattr(request_scheduler.random, 'uniform', lambda low, high: high)
+    call = Flaky(status_error(500), connection_error(), status_error(429))
+    assert scheduler.execute("gpt", 10, call) == "ok"
+    assert call.calls == 4
+    assert sleeps == [1.0, 2.0, 4.0]
+
+def test_backoff_is_capped(scheduler):
+    for attempt in range(1, 10):
+        assert 0 <= scheduler.backoff(attempt) <= min(CONFIG["max_delay"], 2 ** (attempt - 1))
+
+def test_retry_after_header_sets_the_delay_and_pauses_the_model(scheduler, sleeps):
+    call = Flaky(status_error(429, {'retry-after': '3'}))
+    assert scheduler.execute("gpt", 10, call) == "ok"
+    # The retry waits out the pause instead of also backing off.
+    assert sleeps == [3.0]
+
+def test_gives_up_after_max_attempts(scheduler, sleeps):
+    call = Flaky(*[status_error(503) for _ in range(10)])
+    with pytest.raises(openai.APIStatusError):
+        scheduler.execute("gpt", 10, call)
+    assert call.calls == CONFIG["max_attempts"]
+
+@pytest.mark.parametrize('error', [
+    status_error(400), status_error(401), status_error(429, body={'code': 'insufficient_quota'}),
+])
+def test_does_not_retry_permanent_errors(scheduler, sleeps, error):
+    call = Flaky(error)
+    with pytest.raises(openai.APIStatusError):
+        scheduler.execute("gpt", 10, call)
+    assert call.calls == 1 and sleeps == []
+
+def test_retries_are_reported_to_subscribers(scheduler, sleeps):
+    messages = []
+    unsubscribe = scheduler.subscribe(messages.append)
+    scheduler.execute("gpt", 10, Flaky(status_error(502)))
+    assert len(messages) == 1 and "Retrying gpt request" in messages[0]
+    unsubscribe()
+    scheduler.execute("gpt", 10, Flaky(status_error(502)))
+    assert len(messages) == 1
+
+def test_cancelling_stops_the_wait_for_a_retry(scheduler):
+    token = CancelToken()
+
+    def call():
+        token.cancel()
+        raise status_error(500)
+    with pytest.raises(RequestCancelled):
+        scheduler.execute("gpt", 10, call, cancel_token=token)
+
+def test_reserves_part_of_max_tokens_and_settles_with_usage(scheduler, sleeps):
+    messages = [{'role': 'user', 'content': "x" * 400}]
+    assert scheduler.estimate_tokens(messages, {'max_tokens': 4000}) == 104 + 500
+    assert scheduler.estimate_tokens(messages, {'max_completion_tokens': 200}) == 104 + 200
+
+    bucket = scheduler.limits_for("small").tokens
+    scheduler.execute("small", 600, lambda: "ok")
+    before = bucket.tokens
+    scheduler.settle("small", 600, type("Usage", (), {'total_tokens': 150})())
+    assert bucket.tokens == before + 450
+    scheduler.settle("small", 600, None)  # No usage reported: the reservation stands.
+    assert bucket.tokens == before + 450
+
+def test_token_bucket_waits_for_refill(sleeps):
+    bucket = TokenBucket(60)  # One unit a second
+    bucket.acquire(60)
+    bucket.acquire(3)
+    assert sum(sleeps) == pytest.approx(3.0)
+
+def test_failed_attempts_give_their_tokens_back(scheduler, sleeps):
+    bucket = scheduler.limits_for("small").tokens
+    call = Flaky(status_error(429), status_error(503))
+    assert scheduler.execute("small", 600, call) == "ok"
+    # Only the attempt that went through holds its reservation.
+    assert bucket.tokens == pytest.approx(6000 - 600, abs=1)
+
+    with pytest.raises(openai.APIStatusError):
+        scheduler.execute("small", 600, Flaky(status_error(400)))
+    assert bucket.tokens == pytest.approx(6000 - 600, abs=1)
+
+def test_cancelled_attempt_gives_its_tokens_back(scheduler, sleeps):
+    bucket = scheduler.limits_for("small").tokens
+    token = CancelToken()
+
+    def call():
+        token.cancel()
+        token.check()
+    with pytest.raises(RequestCancelled):
+        scheduler.execute("small", 600, call, cancel_token=token)
+    assert bucket.tokens == pytest.approx(6000, abs=1)
+
+def test_refund_gives_back_unused_tokens(scheduler, sleeps):
+    bucket = scheduler.limits_for("small").tokens
+    scheduler.execute("small", 600, lambda: "ok")
+    scheduler.refund("small", 400)
+    assert bucket.tokens == pytest.approx(6000 - 200, abs=1)
+
+def test_zero_limit_is_no_limit(sleeps):
+    scheduler = RequestScheduler(dict(CONFIG, models={
+        "free": {"requests_per_minute": 0, "tokens_per_minute": 0}
+    }))
+    for _ in range(100):
+        assert scheduler.execute("free", 10 ** 6, lambda: "ok") == "ok"
+    scheduler.refund("free", 500)
+    assert sleeps == []
+    with pytest.raises(ValueError):
+        TokenBucket(-1)
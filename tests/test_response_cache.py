@@ -0,0 +1,42 @@
+import copy
+import pytest
+from app.services.model_catalog_service import ModelCatalogService
+from app.services.response_cache_service import ResponseCacheService
+from app.config.openai_config import OPENAI_CONFIG
+
+@pytest.fixture
+def config(home):
+    return copy.deepcopy(OPENAI_CONFIG["response_cache"])
+
+@pytest.fixture
+def catalog(home):
+    return ModelCatalogService()
+
+def test_o1_samples_even_though_no_temperature_is_sent(config, catalog):
+    cache = ResponseCacheService(config)
+    # What OpenAIService.request_settings sends for o1.
+    settings = {'model': 'o1-preview', 'max_completion_tokens': 4000}
+    assert not cache.is_cacheable(settings, catalog.capabilities('o1-preview'))
+    assert not cache.is_cacheable(settings)
+
+@pytest.mark.parametrize("temperature, cacheable", [(0.7, False), (0, True)])
+def test_only_deterministic_requests_are_cached(config, catalog, temperature, cacheable):
+    cache = ResponseCacheService(config)
+    settings = {'model': 'gpt-4', 'temperature': temperature, 'max_tokens': 4000}
+    assert cache.is_cacheable(settings, catalog.capabilities('gpt-4')) is cacheable
+
+def test_sampled_requests_are_cached_when_allowed(config, catalog):
+    config['cache_sampled'] = True
+    cache = ResponseCacheService(config)
+    settings = {'model': 'o1-preview', 'max_completion_tokens': 4000}
+    assert cache.is_cacheable(settings, catalog.capabilities('o1-preview'))
+
+def test_nothing_is_cached_when_disabled(config):
+    config['enabled'] = False
+    assert not ResponseCacheService(config).is_cacheable({'model': 'gpt-4', 'temperature': 0})
+
+def test_responses_survive_a_restart(config):
+    key = ResponseCacheService.make_key([{"role": "user", "content": "Hi"}],
+                                        {'model': 'gpt-4', 'temperature': 0})
+    ResponseCacheService(config).put(key, "Hello")
+    assert ResponseCacheService(config).get(key) == "Hello"
@@ -0,0 +1,91 @@
+import time
+import keyring
+import pytest
+from app.services.secure_storage_service import SecureStorageService
+
+class FakeKeyring:
+    """In-memory keyring backend counting lookups."""
+
+    def __init__(self):
+        self.passwords = {}
+        self.lookups = 0
+        self.error = None
+
+    def get_password(self, service, key):
+        self.lookups += 1
+        if self.error:
+            raise self.error
+        return self.passwords.get((service, key))
+
+    def set_password(self, service, key, value):
+        if self.error:
+            raise self.error
+        self.passwords[(service, key)] = value
+
+def reset_cache():
+    SecureStorageService.invalidate()
+    # No wipe stays scheduled with another test's timeout.
+    timer = SecureStorageService._wipe_timer
+    if timer is not None:
+        timer.cancel()
+        SecureStorageService._wipe_timer = None
+
+@pytest.fixture
+def backend(monkeypatch):
+    backend = FakeKeyring()
+    monkeypatch.setattr(keyring, 'get_password', backend.get_password)
+    monkeypatch.setattr(keyring, 'set_password', backend.set_password)
+    reset_cache()
+    yield backend
+    reset_cache()
+
+def test_secret_is_looked_up_once(backend):
+    backend.passwords[(SecureStorageService.SERVICE_NAME, "key")] = "secret"
+    assert SecureStorageService.get_secret("key") == "secret"
+    assert SecureStorageService.get_secret("key") == "secret"
+    assert backend.lookups == 1
+    # A missing secret is remembered too.
+    assert SecureStorageService.get_secret("other") is None
+    assert SecureStorageService.get_secret("other") is None
+    assert backend.lookups == 2
+
+def test_save_updates_the_cached_value(backend):
+    assert SecureStorageService.save_secret("key", "new")
+    assert SecureStorageService.get_secret("key") == "new"
+    assert backend.lookups == 0
+
+def test_failed_save_forgets_the_cached_value(backend):
+    SecureStorageService.save_secret("key", "old")
+    backend.error = keyring.errors.PasswordSetError("locked")
+    assert not SecureStorageService.save_secret("key", "new")
+    backend.error = None
+    assert SecureStorageService.get_secret("key") == "old"
+    assert backend.lookups == 1
+
+def test_failed_lookup_is_retried_unless_there_is_no_backend(backend):
+    backend.error = keyring.errors.KeyringLocked("locked")
+    assert SecureStorageService.get_secret("key") == ""
+    assert SecureStorageService.get_secret("key") == ""
+    assert backend.lookups == 2
+
+    backend.error = keyring.errors.NoKeyringError("no backend")
+    SecureStorageService.get_secret("missing")
+    SecureStorageService.get_secret("missing")
+    assert backend.lookups == 3
+
+def test_idle_secrets_are_wiped(backend, monkeypatch):
+    monkeypatch.setattr(SecureStorageService, 'CACHE_IDLE_TIMEOUT', 0.2)
+    backend.passwords[(SecureStorageService.SERVICE_NAME, "idle")] = "a"
+    backend.passwords[(SecureStorageService.SERVICE_NAME, "busy")] = "b"
+    SecureStorageService.get_secret("idle")
+    SecureStorageService.get_secret("busy")
+    deadline = time.monotonic() + 0.35
+    while time.monotonic() < deadline:
+        # Reading a secret keeps it cached.
+        SecureStorageService.get_secret("busy")
+        time.sleep(0.02)
+    assert "idle" not in SecureStorageService._cache
+    assert "busy" in SecureStorageService._cache
+    lookups = backend.lookups
+    assert SecureStorageService.get_secret("idle") == "a"
+    assert backend.lookups == lookups + 1
@@ -0,0 +1,63 @@
+import json
+import time
+from app.config.chat_storage_config import CHAT_STORAGE_CONFIG
+from app.services.journal_chat_store import JournalChatStore
+from app.services.session_manifest import SessionManifest
+from tests.helpers import make_message, make_session
+
+def open_store(tmp_path):
+    return JournalChatStore(str(tmp_path), CHAT_STORAGE_CONFIG)
+
+def test_lists_sessions_without_rebuilding_after_rewrites(tmp_path, monkeypatch):
+    store = open_store(tmp_path)
+    kept, removed = make_session(), make_session()
+    for session in (kept, removed):
+        store.create_session(session)
+        store.append_messages(session.id, [make_message(f"first of {session.id}")])
+    store.remove_session(removed.id)
+    # Rewriting the journal renames a file over it, making the directory newer.
+    store.update_metadata(kept.id, {"a": 1})
+    store.compact_session(kept.id)
+
+    def rebuild(self):
+        raise AssertionError("manifest was rebuilt")
+    monkeypatch.setattr(SessionManifest, 'rebuild', rebuild)
+    summaries = open_store(tmp_path).list_sessions()
+    assert [(s.id, s.message_count) for s in summaries] == [(kept.id, 1)]
+    assert summaries[0].title == f"first of {kept.id}"[:CHAT_STORAGE_CONFIG['title_length']]
+
+def test_rebuilds_when_sessions_change_behind_its_back(tmp_path):
+    store = open_store(tmp_path)
+    session = make_session()
+    store.create_session(session)
+    added = make_session([make_message("copied in")])
+    time.sleep(0.01)
+    with open(store._journal_path(added.id), 'wb') as f:
+        f.write(store._journal_bytes(added))
+
+    ids = {summary.id for summary in open_store(tmp_path).list_sessions()}
+    assert ids == {session.id, added.id}
+
+def test_rebuilds_a_manifest_of_another_version(tmp_path):
+    store = open_store(tmp_path)
+    session = make_session([make_message("hello")])
+    store.create_session(session)
+    with open(store.watched_file, 'w') as f:
+        f.write(json.dumps({'type': 'manifest', 'version': 0}) + '\n')
+
+    summaries = open_store(tmp_path).list_sessions()
+    assert [(s.id, s.message_count) for s in summaries] == [(session.id, 1)]
+
+def test_refresh_reads_only_what_others_appended(tmp_path):
+    ours, theirs = open_store(tmp_path), open_store(tmp_path)
+    session = make_session()
+    theirs.create_session(session)
+    theirs.append_messages(session.id, [make_message("from the other process")])
+
+    changes = ours.external_changes()
+    assert list(changes) == [session.id] and changes[session.id] is None
+    assert ours.message_count(session.id) == 1
+    # Our own writes are not reported back to us.
+    ours.append_messages(session.id, [make_message("ours")])
+    assert ours.external_changes() == {}
+    assert theirs.external_changes()[session.id].message_count == 1
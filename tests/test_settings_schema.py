@@ -0,0 +1,62 @@
+import json
+from app.config.openai_config import OPENAI_CONFIG
+from app.config.chat_config import CHAT_CONFIG
+
+DEFAULTS = OPENAI_CONFIG["default_settings"]
+
+def write_settings(home, settings):
+    path = home / '.aiwritingassistant' / 'settings.json'
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(settings if isinstance(settings, str) else json.dumps(settings))
+    return path
+
+def test_missing_settings_file_uses_the_bundled_defaults(home, make_manager):
+    manager = make_manager()
+    assert manager.typed.openai.model == DEFAULTS["model"]
+    assert manager.typed.openai.max_tokens == DEFAULTS["max_tokens"]
+    assert manager.typed.chat.welcome_style == "formal"
+    assert manager.settings_file.exists()
+
+def test_invalid_values_fall_back_to_their_defaults(home, make_manager, capsys):
+    write_settings(home, {"openai": {"model": "gpt-4o", "temperature": 5,
+                                     "max_tokens": "many"},
+                          "chat": {"welcome_style": "shouting"}})
+    manager = make_manager()
+    assert manager.typed.openai.model == "gpt-4o"
+    assert manager.typed.openai.temperature == DEFAULTS["temperature"]
+    assert manager.typed.openai.max_tokens == DEFAULTS["max_tokens"]
+    assert manager.typed.chat.welcome_style == "formal"
+    output = capsys.readouterr().out
+    assert "Invalid setting openai.temperature" in output
+    assert "Invalid setting chat.welcome_style" in output
+    # The file keeps what the user wrote.
+    assert manager.get("openai.temperature") == 5
+
+def test_unset_and_empty_values_use_their_defaults(home, make_manager):
+    write_settings(home, {"openai": {"model": "", "max_tokens": None},
+                          "chat": {"welcome_message": ""}})
+    manager = make_manager()
+    assert manager.typed.openai.model == DEFAULTS["model"]
+    assert manager.typed.openai.max_tokens == DEFAULTS["max_tokens"]
+    assert manager.typed.chat.welcome_message == CHAT_CONFIG["default_settings"]["welcome_message"]
+
+def test_setting_an_invalid_value_keeps_the_default_in_typed(home, make_manager, capsys):
+    manager = make_manager()
+    manager.set("openai.max_tokens", 0)
+    assert manager.typed.openai.max_tokens == DEFAULTS["max_tokens"]
+    assert "Invalid setting openai.max_tokens" in capsys.readouterr().out
+    manager.set("openai.max_tokens", 256)
+    assert manager.typed.openai.max_tokens == 256
+
+def test_unparsable_file_is_kept_and_the_defaults_used(home, make_manager, capsys):
+    path = write_settings(home, '{"openai": {"model": "gpt-4o",')
+    manager = make_manager()
+    assert manager.typed.openai.model == DEFAULTS["model"]
+    bad = path.with_name('settings.json.bad')
+    assert bad.read_text() == '{"openai": {"model": "gpt-4o",'
+    assert "is not valid JSON" in capsys.readouterr().out
+
+def test_settings_that_are_not_an_object_are_ignored(home, make_manager):
+    write_settings(home, [1, 2, 3])
+    manager = make_manager()
+    assert manager.typed.openai.model == DEFAULTS["model"]
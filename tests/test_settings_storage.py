@@ -1,19 +1,139 @@
-flask==2.0.1 
-openai>=0.27.0 
-python-dotenv==0.19.0 
-keyring==23.5.0 
-PyQt6>=6.4.0 
-markdown2>=2.4.0 
-jsonschema>=4.17.0 
-pathlib>=1.0.1 
-python-dateutil>=2.8.2 
-cryptography>=3.4.7 
-pytest>=7.0.0 
-black>=22.3.0 
-flake8>=4.0.1 
-mypy>=0.950 
-Sphinx>=4.5.0 
-sphinx-rtd-theme>=1.0.0 
-Pygments>=2.10.0 
-simplejson>=3.17.6 
-watchdog>=2.1.7
+import json
+import threading
+import time
+import pytest
+from app.services.file_watcher import FileWatcher
+
+@pytest.fixture
+def writes(monkeypatch):
+    """Counts the saves of a manager."""
+    def count(manager):
+        saved = []
+        original = manager._write
+
+        def write(data):
+            saved.append(json.loads(data))
+            return original(data)
+        monkeypatch.setattr(manager, '_write', write)
+        return saved
+    return count
+
+def saved_settings(manager):
+    with open(manager.settings_file) as f:
+        return json.load(f)
+
+def wait_until(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.01)
+    return True
+
+def wait_for_save(manager):
+    """Wait until the write-behind thread has saved every change."""
+    assert wait_until(lambda: not manager.is_dirty())
+    # A save in progress holds the write lock until the file is replaced.
+    manager.flush()
+
+def test_burst_of_changes_is_saved_once(make_manager, writes):
+    manager = make_manager()
+    saved = writes(manager)
+    for width in range(100, 110):
+        manager.set("app.panel_sizes", [width, 500, 250])
+    assert manager.is_dirty()
+    wait_for_save(manager)
+    assert len(saved) == 1
+    assert saved_settings(manager)["app"]["panel_sizes"] == [109, 500, 250]
+
+def test_continuous_changes_are_saved_within_the_maximum_delay(make_manager, writes):
+    manager = make_manager()
+    saved = writes(manager)
+    started = time.monotonic()
+    while time.monotonic() - started < 0.6:
+        manager.set("app.window.pos", [int((time.monotonic() - started) * 1000), 0])
+        time.sleep(0.01)
+    assert len(saved) >= 1
+
+def test_transaction_is_saved_and_announced_once(make_manager, writes):
+    manager = make_manager()
+    saved = writes(manager)
+    announced = []
+    manager.subscribe("app.window", announced.append)
+    with manager.transaction():
+        manager.set("app.window.size", [800, 600])
+        manager.set("app.window.pos", [10, 20])
+        time.sleep(0.1)
+        assert saved == [] and announced == []
+    assert announced == ["app.window"]
+    wait_for_save(manager)
+    assert len(saved) == 1
+
+def test_setting_an_equal_value_is_not_a_change(make_manager, writes):
+    manager = make_manager()
+    manager.set("app.theme", "dark")
+    manager.flush()
+    saved = writes(manager)
+    manager.set("app.theme", "dark")
+    assert not manager.is_dirty() and saved == []
+
+def test_flush_saves_at_once_and_atomically(make_manager):
+    manager = make_manager()
+    manager.set("app.theme", "light")
+    manager.flush()
+    assert not manager.is_dirty()
+    assert saved_settings(manager)["app"]["theme"] == "light"
+    assert not manager.settings_file.with_name("settings.json.tmp").exists()
+
+def test_concurrent_setters_lose_nothing(make_manager):
+    manager = make_manager()
+
+    def set_many(thread):
+        for n in range(50):
+            manager.set(f"criteria.types.t{thread}_{n}", n)
+    threads = [threading.Thread(target=set_many, args=(t,)) for t in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    manager.flush()
+    assert len(saved_settings(manager)["criteria"]["types"]) == 200
+
+def test_reload_takes_in_changes_saved_by_another_process(make_manager):
+    first, second = make_manager(), make_manager()
+    second._unwatch()
+    announced = []
+    second.subscribe("openai", announced.append)
+    first.set("openai.model", "gpt-4o")
+    first.set("app.theme", "dark")
+    first.flush()
+    assert sorted(second.reload()) == ["app.theme", "openai.model"]
+    assert second.get("openai.model") == "gpt-4o"
+    assert second.typed.openai.model == "gpt-4o"
+    assert announced == ["openai.model"]
+    # Nothing changed since.
+    assert second.reload() == []
+
+def test_unsaved_changes_win_over_another_process(make_manager):
+    first, second = make_manager(), make_manager()
+    second._unwatch()
+    first.set("app.theme", "dark")
+    first.set("openai.model", "gpt-4o")
+    first.flush()
+    second.set("app.theme", "light")
+    second.flush()
+    assert second.get("app.theme") == "light"
+    assert second.get("openai.model") == "gpt-4o"
+    assert saved_settings(second)["app"]["theme"] == "light"
+    assert saved_settings(second)["openai"]["model"] == "gpt-4o"
+
+def test_changes_from_another_process_are_seen_without_reloading(make_manager):
+    if not FileWatcher.shared().available:
+        pytest.skip("watchdog is not installed")
+    first, second = make_manager(), make_manager()
+    announced = []
+    second.subscribe("chat.display_welcome", announced.append)
+    first.set("chat.display_welcome", False)
+    first.flush()
+    assert wait_until(lambda: announced)
+    assert second.typed.chat.display_welcome is False
@@ -0,0 +1,62 @@
+import pytest
+
+@pytest.fixture
+def manager(make_manager):
+    return make_manager()
+
+def subscribe(manager, prefix):
+    keys = []
+    manager.subscribe(prefix, keys.append)
+    return keys
+
+def test_subscribers_hear_about_keys_under_their_prefix(manager):
+    openai = subscribe(manager, "openai")
+    starred = subscribe(manager, "openai.*")
+    model = subscribe(manager, "openai.model")
+    everything = subscribe(manager, "")
+    manager.set("openai.model", "gpt-4o")
+    manager.set("app.theme", "dark")
+    assert openai == starred == model == ["openai.model"]
+    assert everything == ["openai.model", "app.theme"]
+
+def test_replacing_an_enclosing_key_notifies_nested_subscribers(manager):
+    model = subscribe(manager, "openai.model")
+    manager.set("openai", {"model": "o1-mini", "temperature": 1})
+    assert model == ["openai"]
+
+def test_equal_values_notify_nobody(manager):
+    manager.set("app.theme", "dark")
+    theme = subscribe(manager, "app.theme")
+    manager.set("app.theme", "dark")
+    assert theme == []
+
+def test_transaction_notifies_each_subscriber_once(manager):
+    openai = subscribe(manager, "openai")
+    app = subscribe(manager, "app")
+    with manager.transaction():
+        manager.set("openai.model", "gpt-4o")
+        manager.set("openai.temperature", 0.2)
+        with manager.transaction():
+            manager.set("openai.base_url", "http://localhost:8000/v1")
+        assert openai == []
+    # Given the nearest key enclosing every change it matched.
+    assert openai == ["openai"]
+    assert app == []
+
+def test_unsubscribed_callbacks_are_not_called(manager):
+    keys = []
+    unsubscribe = manager.subscribe("app", keys.append)
+    manager.set("app.theme", "dark")
+    unsubscribe()
+    unsubscribe()  # Harmless twice
+    manager.set("app.theme", "light")
+    assert keys == ["app.theme"]
+
+def test_a_failing_subscriber_does_not_stop_the_others(manager, capsys):
+    def fail(key):
+        raise RuntimeError("broken view")
+    manager.subscribe("app", fail)
+    theme = subscribe(manager, "app.theme")
+    manager.set("app.theme", "dark")
+    assert theme == ["app.theme"]
+    assert "broken view" in capsys.readouterr().out
@@ -0,0 +1,122 @@
+import threading
+from datetime import datetime
+import time
+import pytest
+from app.config.chat_storage_config import CHAT_STORAGE_CONFIG
+from app.models.chat import Role
+from app.services.chat_storage_service import ChatStorageService
+from app.services.journal_chat_store import JournalChatStore
+from app.services.sqlite_chat_store import SQLiteChatStore
+from tests.helpers import make_message, make_session
+
+@pytest.fixture
+def chat_dir(home):
+    return str(home / 'chats')
+
+@pytest.fixture
+def store(chat_dir):
+    store = SQLiteChatStore(chat_dir, CHAT_STORAGE_CONFIG)
+    yield store
+    store.close()
+
+def journal_with_sessions(chat_dir, count: int) -> list:
+    journal = JournalChatStore(chat_dir, CHAT_STORAGE_CONFIG)
+    sessions = []
+    for n in range(count):
+        session = make_session([make_message(f"question {n}", created=1000.0 + n),
+                                make_message(f"answer {n}", Role.ASSISTANT, 1000.5 + n)])
+        session.updated_at = datetime.fromtimestamp(1000.5 + n)
+        journal.create_session(session)
+        sessions.append(session)
+    journal.close()
+    return sessions
+
+def test_sessions_round_trip(store):
+    session = make_session([make_message("Hello there", created=1.0)])
+    store.create_session(session)
+    assert store.append_messages(session.id, [make_message("Hi", Role.ASSISTANT, 2.0),
+                                              make_message("Tell me more", created=3.0)])
+    assert store.update_metadata(session.id, {"context_summary": {"text": "x", "through": 1}})
+    loaded = store.load_session(session.id)
+    assert [m.content for m in loaded.messages] == ["Hello there", "Hi", "Tell me more"]
+    assert loaded.metadata == {"context_summary": {"text": "x", "through": 1}}
+    assert store.message_count(session.id) == 3
+    [summary] = store.list_sessions()
+    assert summary.title == "Hello there"
+    assert summary.message_count == 3
+
+def test_appending_to_a_missing_session_fails(store):
+    assert not store.append_messages("missing", [make_message("lost")])
+    assert store.load_session("missing") is None
+    assert store.message_count("missing") is None
+
+def test_latest_session_and_removal(store):
+    older, newer = make_session(), make_session()
+    store.create_session(older)
+    store.create_session(newer)
+    store.append_message(older.id, make_message("bump", created=time.time() + 60))
+    assert store.latest_session_id() == older.id
+    assert store.remove_session(older.id)
+    assert not store.remove_session(older.id)
+    assert store.latest_session_id() == newer.id
+    # The messages went with the session.
+    assert store.read_messages(older.id, 0, 10) == []
+
+def test_journal_sessions_are_imported_once(chat_dir, store):
+    sessions = journal_with_sessions(chat_dir, 3)
+    opened = []
+
+    def open_source():
+        opened.append(True)
+        return JournalChatStore(chat_dir, CHAT_STORAGE_CONFIG)
+    assert store.import_once(open_source) == 3
+    assert store.import_once(open_source) == 0
+    reopened = SQLiteChatStore(chat_dir, CHAT_STORAGE_CONFIG)
+    assert reopened.import_once(open_source) == 0
+    reopened.close()
+    assert len(opened) == 1
+    assert store.latest_session_id() == sessions[-1].id
+    for session in sessions:
+        assert store.load_session(session.id).messages == session.messages
+
+def test_a_database_with_sessions_imports_nothing(chat_dir, store):
+    journal_with_sessions(chat_dir, 2)
+    store.create_session(make_session([make_message("already here")]))
+    assert store.import_once(lambda: pytest.fail("the journal was opened")) == 0
+    assert len(store.list_sessions()) == 1
+
+def test_processes_starting_together_import_once(chat_dir):
+    journal_with_sessions(chat_dir, 4)
+    stores = [SQLiteChatStore(chat_dir, CHAT_STORAGE_CONFIG) for _ in range(3)]
+    start = threading.Barrier(len(stores))
+    results = []
+
+    def open_source():
+        time.sleep(0.1)  # Give the others time to try to import as well.
+        return JournalChatStore(chat_dir, CHAT_STORAGE_CONFIG)
+
+    def run(store):
+        start.wait()
+        results.append(store.import_once(open_source))
+    threads = [threading.Thread(target=run, args=(store,)) for store in stores]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert sorted(results) == [0, 0, 4]
+    assert len(stores[0].list_sessions()) == 4
+    assert stores[0].message_count(stores[0].latest_session_id()) == 2
+    for store in stores:
+        store.close()
+
+def test_service_switching_to_sqlite_keeps_the_history(chat_dir):
+    journal = ChatStorageService(chat_dir, 'journal')
+    session_id = journal.create_session().id
+    journal.add_message(session_id, Role.USER, "Remember me")
+    journal.close()
+    service = ChatStorageService(chat_dir, 'sqlite')
+    try:
+        assert service.get_last_session().id == session_id
+        assert [m.content for m in service.get_session_messages(session_id)] == ["Remember me"]
+    finally:
+        service.close()